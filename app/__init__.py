@@ -29,14 +29,8 @@ def create_app(config_name="development"):
     db.init_app(app)
     migrate.init_app(app, db)  # Initialize Flask-Migrate
 
-    # Initialize cache with app
-    cache.init_app(
-        app,
-        config={
-            "CACHE_TYPE": "SimpleCache",  # Use simple cache for development
-            "CACHE_DEFAULT_TIMEOUT": 300,
-        },
-    )
+    # Initialize cache with app (backend is chosen by CACHE_TYPE in config)
+    cache.init_app(app)
 
     # Add SQLAlchemy configuration
     app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
@@ -46,7 +40,12 @@ def create_app(config_name="development"):
 
     # Initialize CORS only if CORS_RESOURCES is configured
     # Allow all CORS requests for now
-    CORS(app, resources={r"/*": {"origins": "*"}})
+    # Expose the pagination header so browser clients can read it
+    CORS(
+        app,
+        resources={r"/*": {"origins": "*"}},
+        expose_headers=["X-Next-Cursor"],
+    )
 
     # Register blueprints
     from app import properties, users
@@ -24,37 +24,127 @@ python scripts/cleanup_blob_storage.py --execute
 # This will actually delete the orphaned images
 """
 
+import hashlib
 import os
-from uuid import uuid4
+import threading
+from datetime import datetime, timezone
+from base64 import b64encode
 from app.exceptions import BlobStorageError
+from app.image_validation import inspect_image
 from flask import current_app
 
 try:
-    from azure.storage.blob import BlobServiceClient
+    from azure.storage.blob import (
+        BlobBlock,
+        BlobServiceClient,
+        ContentSettings,
+    )
+    from azure.core.exceptions import (
+        ResourceExistsError,
+        ResourceNotFoundError,
+    )
+    from azure.core.pipeline.transport import RequestsTransport
+    import requests
+    from requests.adapters import HTTPAdapter
 
     AZURE_SDK_AVAILABLE = True
 except ImportError:
     AZURE_SDK_AVAILABLE = False
     print("Azure Storage SDK not installed, using mock service")
 
+CONTAINER_NAME = "property-images"
+
+# Streams larger than one block are uploaded as staged blocks, so at most
+# two blocks (the current one and a look-ahead) are held in memory
+BLOCK_SIZE = 4 * 1024 * 1024
+# Most deletes one blob batch request can carry
+DELETE_BATCH_SIZE = 256
+# delete_images result for a blob kept because it was written after the
+# if_unmodified_since time, e.g. reused by a listing still being saved
+RECENTLY_MODIFIED = "recently modified"
+
+_blob_service = None
+_blob_service_pid = None
+_blob_service_lock = threading.Lock()
+
+
+def content_digest(image):
+    """
+    Return the SHA-256 hex digest of an image, which names its blob.
+
+    Args:
+        image: Image bytes, or a seekable binary file object, which is read
+            in blocks and left at the start
+
+    Returns:
+        str: Hex digest of the content
+    """
+    digest = hashlib.sha256()
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        digest.update(image)
+    else:
+        for block in iter(lambda: image.read(BLOCK_SIZE), b""):
+            digest.update(block)
+        image.seek(0)
+    return digest.hexdigest()
+
+
+def get_blob_service():
+    """Return this process's shared BlobStorageService, building it lazily.
+
+    Checked by pid so that workers forked from a preloaded master each
+    open their own connection pool rather than sharing sockets.
+    """
+    global _blob_service, _blob_service_pid
+    if _blob_service_pid != os.getpid():
+        with _blob_service_lock:
+            if _blob_service_pid != os.getpid():
+                _blob_service = BlobStorageService(
+                    pool_size=current_app.config.get(
+                        "BLOB_CONNECTION_POOL_SIZE", 16
+                    )
+                )
+                _blob_service_pid = os.getpid()
+    return _blob_service
+
 
 class BlobStorageService:
-    def __init__(self):
+    def __init__(self, connection_string=None, pool_size=16):
         if not AZURE_SDK_AVAILABLE:
             current_app.logger.warning(
                 "Using Mock Blob Storage Service - Azure SDK not installed"
             )
             raise ValueError("Azure Storage SDK not installed")
 
-        connection_string = os.environ.get("AZURE_STORAGE_CONNECTION_STRING")
+        connection_string = connection_string or os.environ.get(
+            "AZURE_STORAGE_CONNECTION_STRING"
+        )
         if not connection_string:
             raise ValueError("Azure Storage connection string not set")
 
         try:
+            # One keep-alive pool shared by every request and upload thread
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+
             self.blob_service_client = (
-                BlobServiceClient.from_connection_string(connection_string)
+                BlobServiceClient.from_connection_string(
+                    connection_string,
+                    transport=RequestsTransport(
+                        session=session, session_owner=False
+                    ),
+                )
+            )
+            self.container_name = CONTAINER_NAME
+            self.container_client = (
+                self.blob_service_client.get_container_client(
+                    self.container_name
+                )
             )
-            self.container_name = "property-images"
+            self._container_ready = False
+            self._container_lock = threading.Lock()
             current_app.logger.info(
                 "Successfully initialized Azure Blob Storage"
             )
@@ -64,28 +154,85 @@ class BlobStorageService:
             )
             raise Exception(f"Failed to initialize blob service: {str(e)}")
 
-    def upload_image(self, image_data, content_type):
-        """Upload image to blob storage and return URL"""
+    def ensure_container(self):
+        """Create the container if it doesn't exist, once per service"""
+        if self._container_ready:
+            return
+
+        with self._container_lock:
+            if self._container_ready:
+                return
+            if not self.container_client.exists():
+                try:
+                    self.container_client.create_container(
+                        public_access="blob"
+                    )
+                except ResourceExistsError:
+                    # Another worker created it first
+                    pass
+            self._container_ready = True
+
+    def upload_image(self, image, image_info=None, blob_name=None, reuse=True):
+        """
+        Upload image to blob storage and return URL.
+
+        Blobs are named by their content, so uploading a photo that is
+        already stored returns the existing blob without sending it again.
+        The reused blob is touched, so conditional deletes of it that race
+        with the new listing's save leave it alone.
+
+        Args:
+            image: Image bytes, or a seekable binary file object read in
+                blocks
+            image_info: ImageInfo from inspect_image, read from the image's
+                header when not given
+            blob_name: Name to store the blob under, when the caller has
+                already derived it from the content; defaults to the
+                content digest and the image's extension
+            reuse: Whether to look for a stored blob first; False when the
+                caller's own touch_image has just found none
+
+        Returns:
+            str: URL of the stored blob
+        """
         try:
-            # Create container if it doesn't exist
-            container_client = self.blob_service_client.get_container_client(
-                self.container_name
-            )
-            if not container_client.exists():
-                container_client.create_container(public_access="blob")
-
-            # Generate unique blob name
-            blob_name = f"{uuid4()}.jpg"
-            blob_client = container_client.get_blob_client(blob_name)
-
-            # Upload the image
-            blob_client.upload_blob(
-                image_data,
-                blob_type="BlockBlob",
-                content_type=content_type,
-                overwrite=True,
+            if image_info is None:
+                image_info = inspect_image(image)
+            self.ensure_container()
+
+            if blob_name is None:
+                blob_name = f"{content_digest(image)}.{image_info.extension}"
+            blob_client = self.container_client.get_blob_client(blob_name)
+            if reuse and self.touch_image(blob_name) is not None:
+                return blob_client.url
+
+            content_settings = ContentSettings(
+                content_type=image_info.mime_type
             )
 
+            if isinstance(image, (bytes, bytearray, memoryview)):
+                first_block, image = image, None
+            else:
+                first_block = image.read(BLOCK_SIZE)
+
+            next_block = image.read(BLOCK_SIZE) if image else b""
+            if not next_block:
+                # Fits in one request
+                blob_client.upload_blob(
+                    first_block,
+                    blob_type="BlockBlob",
+                    content_settings=content_settings,
+                    overwrite=True,
+                )
+            else:
+                self._upload_blocks(
+                    blob_client,
+                    first_block,
+                    next_block,
+                    image,
+                    content_settings,
+                )
+
             # Return the URL
             return blob_client.url
 
@@ -95,31 +242,148 @@ class BlobStorageService:
                 f"Failed to upload image to blob storage: {str(e)}"
             )
 
+    def _upload_blocks(
+        self, blob_client, first_block, next_block, stream, content_settings
+    ):
+        """Stage a stream block by block, then commit the block list"""
+        block_ids = []
+        block = first_block
+        while block:
+            # Block ids must all be the same length within a blob
+            block_id = b64encode(f"{len(block_ids):08d}".encode()).decode()
+            blob_client.stage_block(block_id, block, length=len(block))
+            block_ids.append(block_id)
+            block, next_block = next_block, stream.read(BLOCK_SIZE)
+
+        blob_client.commit_block_list(
+            [BlobBlock(block_id=block_id) for block_id in block_ids],
+            content_settings=content_settings,
+        )
+
+    def touch_image(self, blob_name):
+        """
+        Mark a stored blob as just used, before reusing it.
+
+        Rewriting its metadata moves its last-modified time to now, so
+        deletes conditional on it being unmodified (delete_images with
+        if_unmodified_since, and the cleanup script's age cutoff) skip it.
+
+        Args:
+            blob_name: Name of the blob
+
+        Returns:
+            str: URL of the blob, or None if there isn't one
+        """
+        try:
+            blob_client = self.container_client.get_blob_client(blob_name)
+            blob_client.set_blob_metadata(
+                {"last_used": datetime.now(timezone.utc).isoformat()}
+            )
+            return blob_client.url
+        except ResourceNotFoundError:
+            return None
+        except Exception as e:
+            raise BlobStorageError(f"Failed to touch image: {str(e)}")
+
+    def download_image(self, image_url):
+        """Return the content of a stored image as bytes"""
+        try:
+            blob_name = image_url.split("/")[-1]
+            blob_client = self.container_client.get_blob_client(blob_name)
+            return blob_client.download_blob().readall()
+        except Exception as e:
+            raise BlobStorageError(f"Failed to download image: {str(e)}")
+
     def delete_image(self, image_url):
-        """Delete image from blob storage"""
+        """Delete image from blob storage; an image already gone is fine"""
         try:
             # Extract blob name from URL
             blob_name = image_url.split("/")[-1]
 
             # Get blob client
-            container_client = self.blob_service_client.get_container_client(
-                self.container_name
-            )
-            blob_client = container_client.get_blob_client(blob_name)
+            blob_client = self.container_client.get_blob_client(blob_name)
 
             # Delete the blob
             blob_client.delete_blob()
 
+        except ResourceNotFoundError:
+            pass
         except Exception as e:
             raise BlobStorageError(f"Failed to delete image: {str(e)}")
 
+    def delete_images(self, image_urls, if_unmodified_since=None):
+        """
+        Delete many images, DELETE_BATCH_SIZE to a request.
+
+        Uses the blob batch API, so a listing's photos go in one round trip
+        instead of one each. An image that's already gone counts as deleted.
+
+        Args:
+            image_urls: Image URLs, or bare blob names
+            if_unmodified_since: Only delete blobs last modified at or
+                before this aware datetime; the check is made by blob
+                storage, so a blob touched after it was chosen is kept
+
+        Returns:
+            dict: URL -> None if it was deleted, RECENTLY_MODIFIED if it
+                was kept by if_unmodified_since, else why it wasn't
+        """
+        blob_names = {
+            image_url: image_url.split("/")[-1]
+            for image_url in dict.fromkeys(image_urls)
+        }
+        urls = list(blob_names)
+        results = {}
+        for start in range(0, len(urls), DELETE_BATCH_SIZE):
+            end = start + DELETE_BATCH_SIZE
+            batch = urls[start:end]
+            try:
+                responses = self.container_client.delete_blobs(
+                    *(blob_names[image_url] for image_url in batch),
+                    raise_on_any_failure=False,
+                    if_unmodified_since=if_unmodified_since,
+                )
+                # Sub-responses come back in request order
+                for image_url, response in zip(batch, responses):
+                    if response.status_code in (202, 404):
+                        results[image_url] = None
+                    elif response.status_code == 412:
+                        results[image_url] = RECENTLY_MODIFIED
+                    else:
+                        results[image_url] = (
+                            f"{response.status_code} {response.reason}"
+                        )
+            except Exception as e:
+                for image_url in batch:
+                    results[image_url] = f"Failed to delete image: {str(e)}"
+        return results
+
+    def list_blob_pages(self, continuation_token=None, page_size=5000):
+        """
+        Page through the container's blobs in name order.
+
+        Holds one page at a time, so it scales to any number of blobs.
+
+        Args:
+            continuation_token: Token from an earlier page to resume after
+            page_size: Blobs per listing request, at most 5000
+
+        Yields:
+            tuple: (blobs, continuation_token) per page, where blobs is a
+                list of (name, last_modified) and the token resumes after
+                this page, or is None after the last one
+        """
+        pages = self.container_client.list_blobs(
+            results_per_page=page_size
+        ).by_page(continuation_token=continuation_token)
+        for page in pages:
+            blobs = [(blob.name, blob.last_modified) for blob in page]
+            yield blobs, pages.continuation_token
+
     def list_all_blobs(self):
         """List all blobs in the container"""
         try:
-            container_client = self.blob_service_client.get_container_client(
-                self.container_name
-            )
-            return [blob.name for blob in container_client.list_blobs()]
+            return [blob.name for blob in self.container_client.list_blobs()]
         except Exception as e:
             current_app.logger.error(f"Error listing blobs: {e}")
             raise
@@ -131,21 +395,56 @@ class MockBlobStorageService:
     def __init__(self):
         """Mock init that doesn't need connection string"""
         current_app.logger.warning("Using Mock Blob Storage Service")
-        pass
+        # URL -> when it was last "uploaded", for conditional deletes
+        self.modified = {}
 
-    def upload_image(self, image_data, content_type):
+    def upload_image(
+        self, image_data, image_info=None, blob_name=None, reuse=True
+    ):
         """Mock upload that returns a consistent URL"""
         current_app.logger.warning("Using mock upload_image method")
-        return (
+        image_url = (
             "https://maisonblobstorage.blob.core.windows.net/"
             "property-images/test-image.jpg"
         )
+        self.modified[image_url] = datetime.now(timezone.utc)
+        return image_url
+
+    def touch_image(self, blob_name):
+        """Mock touch that never finds anything"""
+        return None
+
+    def download_image(self, image_url):
+        """Mock download; nothing is ever stored"""
+        raise BlobStorageError("Mock blob storage holds no images")
 
     def delete_image(self, image_url):
         """Mock delete that does nothing"""
         current_app.logger.warning("Using mock delete_image method")
         pass
 
+    def delete_images(self, image_urls, if_unmodified_since=None):
+        """Mock bulk delete that keeps blobs uploaded since the cutoff"""
+        current_app.logger.warning("Using mock delete_images method")
+        results = {}
+        for image_url in image_urls:
+            modified = self.modified.get(image_url)
+            if (
+                if_unmodified_since is not None
+                and modified is not None
+                and modified > if_unmodified_since
+            ):
+                results[image_url] = RECENTLY_MODIFIED
+            else:
+                self.modified.pop(image_url, None)
+                results[image_url] = None
+        return results
+
+    def list_blob_pages(self, continuation_token=None, page_size=5000):
+        """Mock paged list with no blobs"""
+        current_app.logger.warning("Using mock list_blob_pages method")
+        return iter(())
+
     def list_all_blobs(self):
         """Mock list that returns empty list"""
         current_app.logger.warning("Using mock list_all_blobs method")
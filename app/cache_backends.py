@@ -0,0 +1,242 @@
+"""
+Cache backends for Flask-Caching.
+
+Select one with the CACHE_TYPE setting:
+
+- ``SimpleCache`` - per-process dict, the default and what tests use
+- ``RedisCache`` - shared store at CACHE_REDIS_URL, one copy for all workers
+- ``app.cache_backends.TwoTierCache`` - a small per-process LRU in front of
+  the shared Redis store, with invalidations broadcast to every worker over
+  Redis pub/sub
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+from flask_caching.backends.base import BaseCache
+from flask_caching.backends.rediscache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+# Pub/sub message meaning "drop everything", sent by clear()
+CLEAR_ALL = "*"
+
+
+class LocalLRUCache:
+    """Bounded, thread-safe LRU with a per-entry expiry.
+
+    Values are stored as-is rather than pickled, so callers must treat
+    anything they get back as read-only.
+    """
+
+    def __init__(self, max_size=256, timeout=30):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (found, value) for a key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        # Never keep a local copy longer than the local timeout, so a missed
+        # invalidation can only leave a worker stale for that long
+        if timeout <= 0 or timeout > self.timeout:
+            timeout = self.timeout
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TwoTierCache(BaseCache):
+    """Per-process LRU in front of a shared Redis-compatible store.
+
+    Reads are served from the local tier when possible and fall through to
+    the shared store otherwise. Every write or delete is published on a
+    Redis channel; each worker listens on that channel and drops its local
+    copy of the key, so workers never serve each other's stale entries for
+    longer than it takes the message to arrive.
+    """
+
+    def __init__(
+        self,
+        client,
+        default_timeout=300,
+        key_prefix=None,
+        local_size=256,
+        local_timeout=30,
+        channel="cache-invalidation",
+    ):
+        super().__init__(default_timeout=default_timeout)
+        self.client = client
+        self.channel = f"{key_prefix or ''}{channel}"
+        self.remote = RedisCache(
+            host=client,
+            default_timeout=default_timeout,
+            key_prefix=key_prefix,
+        )
+        self.local = LocalLRUCache(max_size=local_size, timeout=local_timeout)
+        self._listener_lock = threading.Lock()
+        self._listener_pid = None
+        self._node_id = None
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        try:
+            from redis import from_url as redis_from_url
+        except ImportError as e:
+            raise RuntimeError("no redis module found") from e
+
+        redis_url = config.get("CACHE_REDIS_URL")
+        if not redis_url:
+            raise ValueError("CACHE_REDIS_URL must be set for TwoTierCache")
+
+        kwargs.update(
+            dict(
+                client=redis_from_url(redis_url),
+                default_timeout=config.get("CACHE_DEFAULT_TIMEOUT", 300),
+                key_prefix=config.get("CACHE_KEY_PREFIX"),
+                local_size=config.get("CACHE_LOCAL_SIZE", 256),
+                local_timeout=config.get("CACHE_LOCAL_TIMEOUT", 30),
+            )
+        )
+        return cls(*args, **kwargs)
+
+    def _ensure_listener(self):
+        """Start this process's invalidation listener if it isn't running.
+
+        Checked by pid so that workers forked from a preloaded master each
+        start their own listener - threads don't survive fork.
+        """
+        if self._listener_pid == os.getpid():
+            return
+
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                return
+
+            # Anything inherited across a fork may already be stale
+            self.local.clear()
+            self._node_id = uuid4().hex
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(self.channel)
+            thread = threading.Thread(
+                target=self._listen,
+                args=(pubsub,),
+                name="cache-invalidation-listener",
+                daemon=True,
+            )
+            thread.start()
+            self._listener_pid = os.getpid()
+
+    def _listen(self, pubsub):
+        while True:
+            try:
+                message = pubsub.get_message(timeout=1.0)
+            except Exception as e:
+                # Messages may have been lost while disconnected
+                self.local.clear()
+                logger.warning(f"Cache invalidation listener error: {e}")
+                time.sleep(1)
+                continue
+
+            if message is None or message["type"] != "message":
+                continue
+
+            data = message["data"]
+            if isinstance(data, bytes):
+                data = data.decode()
+            node_id, _, key = data.partition(":")
+            if node_id == self._node_id:
+                continue
+            if key == CLEAR_ALL:
+                self.local.clear()
+            else:
+                self.local.delete(key)
+
+    def _broadcast(self, key):
+        try:
+            self.client.publish(self.channel, f"{self._node_id}:{key}")
+        except Exception as e:
+            logger.warning(f"Failed to broadcast cache invalidation: {e}")
+
+    def get(self, key):
+        self._ensure_listener()
+        found, value = self.local.get(key)
+        if found:
+            return value
+
+        value = self.remote.get(key)
+        if value is not None:
+            self.local.set(key, value)
+        return value
+
+    def has(self, key):
+        self._ensure_listener()
+        found, _ = self.local.get(key)
+        return found or self.remote.has(key)
+
+    def set(self, key, value, timeout=None):
+        self._ensure_listener()
+        result = self.remote.set(key, value, timeout=timeout)
+        self.local.set(key, value, timeout=self._normalize_timeout(timeout))
+        self._broadcast(key)
+        return result
+
+    def add(self, key, value, timeout=None):
+        self._ensure_listener()
+        added = self.remote.add(key, value, timeout=timeout)
+        if added:
+            self.local.set(key, value, self._normalize_timeout(timeout))
+        return added
+
+    def delete(self, key):
+        self._ensure_listener()
+        self.local.delete(key)
+        deleted = self.remote.delete(key)
+        self._broadcast(key)
+        return deleted
+
+    def clear(self):
+        self._ensure_listener()
+        self.local.clear()
+        cleared = self.remote.clear()
+        self._broadcast(CLEAR_ALL)
+        return cleared
+
+    def inc(self, key, delta=1):
+        self._ensure_listener()
+        value = self.remote.inc(key, delta=delta)
+        self.local.delete(key)
+        self._broadcast(key)
+        return value
+
+    def dec(self, key, delta=1):
+        return self.inc(key, delta=-delta)
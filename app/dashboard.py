@@ -0,0 +1,297 @@
+import threading
+from sqlalchemy import select, union
+from app import db, cache
+from app.models import (
+    Property,
+    SavedProperty,
+    PropertyNegotiation,
+)
+from app.serializers import (
+    select_property_summaries,
+    property_summary_from_row,
+    property_summary_from_model,
+    negotiation_summary,
+)
+
+
+class DashboardBuilder:
+    """Assemble a user's dashboard in a fixed number of queries.
+
+    Each property is serialised at most once per dashboard and each
+    negotiation's transactions are sorted once, however many of the
+    listed, saved and offered blocks they appear in.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.role_types = {role.role_type for role in user.roles}
+        self._properties = {}
+
+    def build(self):
+        """Return the dashboard payload as a dict"""
+        user = self.user
+        dashboard_data = {
+            "user": {
+                "id": user.id,
+                "first_name": user.first_name,
+                "last_name": user.last_name,
+                "email": user.email,
+                "phone_number": user.phone_number,
+            },
+            "roles": [{"role_type": role.role_type} for role in user.roles],
+            "listed_properties": [],
+            "saved_properties": [],
+            "negotiations_as_buyer": [],
+            "negotiations_as_seller": [],
+            "offered_properties": [],
+        }
+
+        if "seller" in self.role_types:
+            listed = self._listed_properties()
+            dashboard_data["listed_properties"] = listed
+            dashboard_data["total_properties_listed"] = len(listed)
+            dashboard_data["negotiations_as_seller"] = (
+                self._seller_negotiations()
+            )
+
+        if "buyer" in self.role_types:
+            saved = self._saved_properties()
+            dashboard_data["saved_properties"] = saved
+            dashboard_data["total_saved_properties"] = len(saved)
+
+            negotiations, offered = self._buyer_negotiations()
+            dashboard_data["negotiations_as_buyer"] = negotiations
+            dashboard_data["offered_properties"] = offered
+
+        return dashboard_data
+
+    def _property_from_row(self, row):
+        """Serialise a summary row, reusing an earlier dict for the id"""
+        property_id = row[1]
+        if property_id not in self._properties:
+            self._properties[property_id] = property_summary_from_row(row)
+        return self._properties[property_id]
+
+    def _property_from_model(self, property_item):
+        """Serialise a Property instance, reusing an earlier dict for the id"""
+        if property_item.id not in self._properties:
+            self._properties[property_item.id] = property_summary_from_model(
+                property_item
+            )
+        return self._properties[property_item.id]
+
+    def _listed_properties(self):
+        rows = db.session.execute(
+            select_property_summaries().where(
+                Property.seller_id == self.user.id
+            )
+        ).all()
+        return [self._property_from_row(row) for row in rows]
+
+    def _saved_properties(self):
+        # Saved rows and their properties come back in a single join
+        rows = db.session.execute(
+            select_property_summaries(
+                SavedProperty.notes, SavedProperty.created_at
+            )
+            .join(SavedProperty, SavedProperty.property_id == Property.id)
+            .where(SavedProperty.user_id == self.user.id)
+            .order_by(SavedProperty.created_at)
+        ).all()
+
+        saved_properties = []
+        for row in rows:
+            notes, saved_at = row[-2:]
+            saved_properties.append(
+                {
+                    **self._property_from_row(row),
+                    "notes": notes,
+                    "saved_at": saved_at.isoformat() if saved_at else None,
+                }
+            )
+        return saved_properties
+
+    def _seller_negotiations(self):
+        negotiations = (
+            PropertyNegotiation.query.join(Property)
+            .filter(Property.seller_id == self.user.id)
+            .options(
+                db.joinedload(PropertyNegotiation.transactions),
+                db.joinedload(PropertyNegotiation.buyer),
+            )
+            .all()
+        )
+
+        results = []
+        for neg in negotiations:
+            transactions = sorted(neg.transactions, key=lambda x: x.created_at)
+            results.append(
+                {
+                    **negotiation_summary(neg, transactions),
+                    "buyer_id": str(neg.buyer_id),
+                    "buyer_name": (
+                        f"{neg.buyer.first_name} {neg.buyer.last_name}"
+                    ),
+                }
+            )
+        return results
+
+    def _buyer_negotiations(self):
+        negotiations = (
+            PropertyNegotiation.query.filter_by(buyer_id=self.user.id)
+            .options(
+                db.joinedload(PropertyNegotiation.transactions),
+                db.joinedload(PropertyNegotiation.property).joinedload(
+                    Property.seller
+                ),
+            )
+            .all()
+        )
+
+        results = []
+        offered_properties = []
+        for neg in negotiations:
+            transactions = sorted(neg.transactions, key=lambda x: x.created_at)
+            property_item = neg.property
+            seller = property_item.seller if property_item else None
+
+            results.append(
+                {
+                    **negotiation_summary(neg, transactions),
+                    "seller_id": str(property_item.seller_id),
+                    "seller_name": (
+                        f"{seller.first_name} {seller.last_name}"
+                        if seller
+                        else None
+                    ),
+                }
+            )
+
+            if property_item:
+                offered_properties.append(
+                    {
+                        **self._property_from_model(property_item),
+                        "latest_offer": {
+                            "amount": (
+                                transactions[-1].offer_amount
+                                if transactions
+                                else None
+                            ),
+                            "status": neg.status,
+                            "last_updated": (
+                                neg.updated_at.isoformat()
+                                if neg.updated_at
+                                else None
+                            ),
+                        },
+                    }
+                )
+
+        return results, offered_properties
+
+
+# Dashboards are invalidated on every write that changes them; the timeout
+# only bounds how long a missed invalidation can go unnoticed
+DASHBOARD_CACHE_TIMEOUT = 300
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters for this worker process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+dashboard_cache_stats = CacheStats()
+
+
+def dashboard_cache_key(user_id):
+    return f"dashboard:{user_id}"
+
+
+def get_cached_dashboard(user_id):
+    """Return the cached dashboard for a user, or None on a miss"""
+    dashboard_data = cache.get(dashboard_cache_key(user_id))
+    dashboard_cache_stats.record(dashboard_data is not None)
+    return dashboard_data
+
+
+def set_cached_dashboard(user_id, dashboard_data):
+    cache.set(
+        dashboard_cache_key(user_id),
+        dashboard_data,
+        timeout=DASHBOARD_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_dashboards(*user_ids):
+    """Drop the cached dashboards of the given users"""
+    # Not delete_many - Flask-Caching stops at the first key that isn't
+    # cached, which would leave the remaining dashboards stale
+    for user_id in user_ids:
+        if user_id:
+            cache.delete(dashboard_cache_key(user_id))
+
+
+def property_dashboard_user_ids(*property_ids):
+    """
+    Find every user whose dashboard shows any of some properties.
+
+    Args:
+        property_ids: UUIDs of the properties
+
+    Returns:
+        set: The sellers plus every user who saved or negotiated on them
+    """
+    rows = db.session.execute(
+        union(
+            select(Property.seller_id).where(Property.id.in_(property_ids)),
+            select(SavedProperty.user_id).where(
+                SavedProperty.property_id.in_(property_ids)
+            ),
+            select(PropertyNegotiation.buyer_id).where(
+                PropertyNegotiation.property_id.in_(property_ids)
+            ),
+        )
+    ).scalars()
+    return set(rows)
+
+
+def user_dashboard_user_ids(user_id):
+    """
+    Find every user whose dashboard shows a user's name.
+
+    Args:
+        user_id: ID of the user
+
+    Returns:
+        set: The user, the buyers negotiating on their properties and the
+            sellers of properties they negotiate on
+    """
+    rows = db.session.execute(
+        union(
+            select(PropertyNegotiation.buyer_id)
+            .join(Property, PropertyNegotiation.property_id == Property.id)
+            .where(Property.seller_id == user_id),
+            select(Property.seller_id)
+            .join(
+                PropertyNegotiation,
+                PropertyNegotiation.property_id == Property.id,
+            )
+            .where(PropertyNegotiation.buyer_id == user_id),
+        )
+    ).scalars()
+    return {user_id, *rows}
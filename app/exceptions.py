@@ -26,3 +26,9 @@ class BlobStorageError(PropertyAPIError):
     """Raised when blob storage operations fail"""
 
     pass
+
+
+class ImageValidationError(ValidationError):
+    """Raised when an uploaded image is rejected"""
+
+    pass
@@ -0,0 +1,332 @@
+"""
+Geohash indexing and distance helpers for geographic property search.
+
+Every property's coordinates are also stored as a geohash, which has the
+geohash of each larger cell containing the point as a prefix. A search
+area is covered with a handful of cells, so its candidates are read with
+that many prefix scans of the geohash B-tree; only those candidates have
+their exact position and distance checked.
+"""
+
+import math
+from collections import namedtuple
+from sqlalchemy import false, func, or_, tuple_
+from app import db
+from app.pagination import encode_distance_cursor
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+# About 5m x 5m cells, far finer than any search
+GEOHASH_PRECISION = 9
+# Most cells a search area is covered with; fewer, larger cells mean fewer
+# index scans but more candidates outside the area
+MAX_COVER_CELLS = 16
+
+EARTH_RADIUS_KM = 6371.0088
+MAX_RADIUS_KM = 500
+
+# Search area as a box (min_lat, min_lng, max_lat, max_lng), and the point
+# results are ordered by distance from; radius_km is None for a bbox search
+GeoSearch = namedtuple(
+    "GeoSearch", ["latitude", "longitude", "radius_km", "bounds"]
+)
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """
+    Encode coordinates as a geohash.
+
+    Args:
+        latitude: Degrees, -90 to 90
+        longitude: Degrees, -180 to 180
+        precision: Number of characters
+
+    Returns:
+        str: The geohash of the cell containing the point
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    value = bits = 0
+    even = True
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude, longitude first
+        value_range, coordinate = (
+            (lng_range, longitude) if even else (lat_range, latitude)
+        )
+        middle = (value_range[0] + value_range[1]) / 2
+        if coordinate >= middle:
+            value = value * 2 + 1
+            value_range[0] = middle
+        else:
+            value *= 2
+            value_range[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            value = bits = 0
+    return "".join(chars)
+
+
+def geohash_cell_size(precision):
+    """Return the (height, width) in degrees of geohash cells"""
+    lng_bits = (precision * 5 + 1) // 2
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2**lat_bits, 360.0 / 2**lng_bits
+
+
+def geohash_cover(bounds, max_cells=MAX_COVER_CELLS):
+    """
+    Cover a box with the smallest geohash cells that number few enough.
+
+    Uses the finest precision at which the box spans at most max_cells
+    cells.
+
+    Args:
+        bounds: (min_lat, min_lng, max_lat, max_lng)
+        max_cells: Most cells to return
+
+    Returns:
+        list: Geohash prefixes, or None if the box is too big to cover
+    """
+    min_lat, min_lng, max_lat, max_lng = bounds
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = geohash_cell_size(precision)
+        rows = range(
+            _cell_index(min_lat, -90.0, height, 180.0),
+            _cell_index(max_lat, -90.0, height, 180.0) + 1,
+        )
+        cols = range(
+            _cell_index(min_lng, -180.0, width, 360.0),
+            _cell_index(max_lng, -180.0, width, 360.0) + 1,
+        )
+        if len(rows) * len(cols) <= max_cells:
+            return sorted(
+                encode_geohash(
+                    -90.0 + (row + 0.5) * height,
+                    -180.0 + (col + 0.5) * width,
+                    precision,
+                )
+                for row in rows
+                for col in cols
+            )
+    return None
+
+
+def _cell_index(value, origin, size, extent):
+    # The far edge (90 or 180 degrees) belongs to the last cell
+    last = round(extent / size) - 1
+    return min(int((value - origin) // size), last)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Return the great-circle distance between two points in km"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distance_km_sql(latitude_column, longitude_column, latitude, longitude):
+    """Return a SQL expression for haversine_km from a point to columns"""
+    lat1, lng1 = math.radians(latitude), math.radians(longitude)
+    lat2 = func.radians(latitude_column)
+    lng2 = func.radians(longitude_column)
+    sin_dlat = func.sin((lat2 - lat1) / 2)
+    sin_dlng = func.sin((lng2 - lng1) / 2)
+    a = func.power(sin_dlat, 2)
+    a += math.cos(lat1) * func.cos(lat2) * func.power(sin_dlng, 2)
+    return 2 * EARTH_RADIUS_KM * func.asin(func.least(1.0, func.sqrt(a)))
+
+
+def bounds_around(latitude, longitude, radius_km):
+    """
+    Return the smallest (min_lat, min_lng, max_lat, max_lng) box holding
+    every point within radius_km of a point.
+    """
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(latitude - delta_lat, -90.0)
+    max_lat = min(latitude + delta_lat, 90.0)
+    # Circles of longitude shrink towards the poles
+    widest = max(abs(min_lat), abs(max_lat))
+    if widest >= 90.0:
+        return min_lat, -180.0, max_lat, 180.0
+    delta_lng = math.degrees(
+        radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(widest)))
+    )
+    if delta_lng >= 180.0:
+        return min_lat, -180.0, max_lat, 180.0
+    # Clamped rather than wrapped across the antimeridian
+    return (
+        min_lat,
+        max(longitude - delta_lng, -180.0),
+        max_lat,
+        min(longitude + delta_lng, 180.0),
+    )
+
+
+def parse_float_arg(args, name, low, high):
+    """Return a query parameter as a float from low to high"""
+    try:
+        value = float(args.get(name))
+    except (TypeError, ValueError):
+        value = math.nan
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be a number from {low} to {high}")
+    return value
+
+
+def parse_bbox(bbox):
+    """
+    Parse a min_lng,min_lat,max_lng,max_lat query parameter.
+
+    Returns:
+        tuple: (min_lat, min_lng, max_lat, max_lng)
+
+    Raises:
+        ValueError: If it isn't four numbers bounding a box
+    """
+    try:
+        min_lng, min_lat, max_lng, max_lat = map(float, bbox.split(","))
+    except ValueError:
+        raise ValueError("bbox must be min_lng,min_lat,max_lng,max_lat")
+    if not (
+        -90.0 <= min_lat <= max_lat <= 90.0
+        and -180.0 <= min_lng <= max_lng <= 180.0
+    ):
+        raise ValueError(
+            "bbox must be min_lng,min_lat,max_lng,max_lat within "
+            "-180 to 180 and -90 to 90"
+        )
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def parse_geo_search(args):
+    """
+    Parse the geographic filters of the property list.
+
+    lat, lng and radius_km select properties within radius_km of a
+    point; bbox=min_lng,min_lat,max_lng,max_lat selects those inside a
+    box. Given both, properties must match both.
+
+    Args:
+        args: Request query parameters
+
+    Returns:
+        GeoSearch: The search, ordered from the point or the box's
+            centre, or None if no geographic filter was given
+
+    Raises:
+        ValueError: If a filter is incomplete or out of range
+    """
+    has_point = any(args.get(name) for name in ("lat", "lng", "radius_km"))
+    bbox = args.get("bbox")
+    if not has_point and not bbox:
+        return None
+
+    bounds = parse_bbox(bbox) if bbox else None
+
+    if not has_point:
+        min_lat, min_lng, max_lat, max_lng = bounds
+        return GeoSearch(
+            (min_lat + max_lat) / 2, (min_lng + max_lng) / 2, None, bounds
+        )
+
+    if not all(args.get(name) for name in ("lat", "lng", "radius_km")):
+        raise ValueError("lat, lng and radius_km must be given together")
+    latitude = parse_float_arg(args, "lat", -90.0, 90.0)
+    longitude = parse_float_arg(args, "lng", -180.0, 180.0)
+    radius_km = parse_float_arg(args, "radius_km", 0.0, MAX_RADIUS_KM)
+
+    circle = bounds_around(latitude, longitude, radius_km)
+    if bounds is not None:
+        # Only the overlap of the box and the circle's bounds can match
+        circle = (
+            max(circle[0], bounds[0]),
+            max(circle[1], bounds[1]),
+            min(circle[2], bounds[2]),
+            min(circle[3], bounds[3]),
+        )
+    return GeoSearch(latitude, longitude, radius_km, circle)
+
+
+def geo_search_conditions(search):
+    """SQL conditions selecting the properties inside a search's bounds"""
+    # app.models imports this module, so its models are imported here
+    from app.models import Property
+
+    min_lat, min_lng, max_lat, max_lng = search.bounds
+    conditions = [
+        Property.latitude.between(min_lat, max_lat),
+        Property.longitude.between(min_lng, max_lng),
+    ]
+    cover = geohash_cover(search.bounds)
+    if cover is not None:
+        # Candidates come from a few prefix scans of the geohash index
+        conditions.append(
+            or_(
+                false(),
+                *(Property.geohash.like(f"{prefix}%") for prefix in cover),
+            )
+        )
+    return conditions
+
+
+def nearest_properties_page(query, search, after, limit):
+    """
+    Fetch one page of a geographic search, nearest first.
+
+    Postgres orders by distance and pages on (distance, id) itself. Other
+    databases lack the trigonometric functions, so the candidates inside
+    the search's bounds are measured and ordered here instead.
+
+    Args:
+        query: Summary query with the other filters applied
+        search: GeoSearch from parse_geo_search
+        after: (distance, id) of the previous page's last row, or None
+        limit: Page size
+
+    Returns:
+        tuple: (list of (row, distance in km), next cursor or None)
+    """
+    from app.models import Property
+
+    query = query.where(*geo_search_conditions(search))
+    if db.engine.dialect.name == "postgresql":
+        distance = distance_km_sql(
+            Property.latitude,
+            Property.longitude,
+            search.latitude,
+            search.longitude,
+        )
+        if search.radius_km is not None:
+            query = query.where(distance <= search.radius_km)
+        if after:
+            query = query.where(tuple_(distance, Property.id) > after)
+        query = (
+            query.add_columns(distance.label("distance_km"))
+            .order_by(distance, Property.id)
+            .limit(limit + 1)
+        )
+        rows = [(row, row.distance_km) for row in db.session.execute(query)]
+    else:
+        rows = []
+        for row in db.session.execute(query):
+            distance = haversine_km(
+                search.latitude, search.longitude, row.latitude, row.longitude
+            )
+            if search.radius_km is not None and distance > search.radius_km:
+                continue
+            if after and (distance, row.id) <= after:
+                continue
+            rows.append((row, distance))
+        rows.sort(key=lambda pair: (pair[1], pair[0].id))
+        rows = rows[: limit + 1]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_distance_cursor(rows[-1][1], rows[-1][0].id)
+    return rows, next_cursor
@@ -0,0 +1,352 @@
+"""
+Geocoding, cached per address.
+
+Coordinates are cached by normalised address in a per-process LRU in
+front of the geocode_cache table, so a repeat address is answered
+without a network call. Addresses the geocoder can't find are cached as
+misses too, and fall back to their postcode - itself cached, since many
+listings share one.
+
+Requests that do reach Nominatim are spaced GEOCODE_MIN_INTERVAL apart
+per process, to stay within its policy of one request a second.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from geopy.extra.rate_limiter import RateLimiter
+from geopy.geocoders import Nominatim
+from sqlalchemy import or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.cache_backends import LocalLRUCache
+from app.dashboard import invalidate_dashboards, property_dashboard_user_ids
+from app.exceptions import GeocodeError
+from app.geo import encode_geohash
+from app.models import GeocodeCacheEntry, Property
+from app.spatial_index import update_spatial_index
+
+CACHE_TTL = timedelta(days=90)
+# Misses are retried sooner, in case the geocoder's data catches up
+NEGATIVE_CACHE_TTL = timedelta(days=1)
+LOCAL_CACHE_SIZE = 4096
+LOCAL_CACHE_TIMEOUT = 3600
+
+Location = namedtuple("Location", ["latitude", "longitude"])
+
+# Values are (latitude, longitude), or None for a cached miss
+local_cache = LocalLRUCache(
+    max_size=LOCAL_CACHE_SIZE, timeout=LOCAL_CACHE_TIMEOUT
+)
+
+_geocoder = None
+_geocoder_pid = None
+_geocoder_lock = threading.Lock()
+
+
+class NominatimGeocoder:
+    """Nominatim client that waits min_interval seconds between requests"""
+
+    def __init__(self, user_agent="maison_property_api", min_interval=1.0):
+        self.client = Nominatim(user_agent=user_agent)
+        # Errors are raised rather than retried here; the job that asked
+        # is retried with backoff instead
+        self._geocode = RateLimiter(
+            self.client.geocode,
+            min_delay_seconds=min_interval,
+            max_retries=0,
+            swallow_exceptions=False,
+        )
+
+    def geocode(self, query):
+        return self._geocode(query)
+
+
+class LocalGeocoder:
+    """Offline stand-in for Nominatim, for tests and development.
+
+    Resolves queries from a dict of known locations when one is given,
+    and otherwise to a point in Great Britain derived from the query, so
+    the same address always lands in the same place. Every query is
+    recorded in queries.
+    """
+
+    def __init__(self, locations=None):
+        self.locations = locations
+        self.queries = []
+
+    def geocode(self, query):
+        self.queries.append(query)
+        if self.locations is not None:
+            coordinates = self.locations.get(query)
+            return None if coordinates is None else Location(*coordinates)
+
+        digest = hashlib.sha256(query.encode()).digest()
+        latitude = 50.0 + 8.0 * int.from_bytes(digest[:4], "big") / 2**32
+        longitude = -5.5 + 7.0 * int.from_bytes(digest[4:8], "big") / 2**32
+        return Location(round(latitude, 6), round(longitude, 6))
+
+
+def get_geocoder():
+    """Return this process's shared geocoder, building it lazily.
+
+    Set GEOCODER to "local" to use LocalGeocoder instead of Nominatim.
+    Checked by pid so that each forked worker keeps its own request
+    spacing and connections.
+    """
+    global _geocoder, _geocoder_pid
+    if _geocoder_pid != os.getpid():
+        with _geocoder_lock:
+            if _geocoder_pid != os.getpid():
+                if current_app.config.get("GEOCODER") == "local":
+                    _geocoder = LocalGeocoder()
+                else:
+                    _geocoder = NominatimGeocoder(
+                        min_interval=current_app.config.get(
+                            "GEOCODE_MIN_INTERVAL", 1.0
+                        )
+                    )
+                _geocoder_pid = os.getpid()
+    return _geocoder
+
+
+def normalise_postcode(postcode):
+    """Return a postcode in upper case without spaces, e.g. SW1A1AA"""
+    return re.sub(r"\s+", "", postcode or "").upper()
+
+
+def normalise_address(address):
+    """
+    Return the cache key for an address.
+
+    Case, punctuation and spacing are ignored, so "12 High St." and
+    "12  high st" share an entry.
+
+    Args:
+        address: Object with house_number, street, city and postcode
+
+    Returns:
+        str: Cache key
+    """
+    parts = [address.house_number, address.street, address.city]
+    text = re.sub(r"[^\w\s]", " ", " ".join(p for p in parts if p).lower())
+    return (
+        f"address:{' '.join(text.split())}"
+        f"|{normalise_postcode(address.postcode)}"
+    )
+
+
+def _cache_get(key):
+    """Return (found, coordinates) from the local cache, then the table"""
+    found, coordinates = local_cache.get(key)
+    if found:
+        return True, coordinates
+
+    now = datetime.now(timezone.utc)
+    row = db.session.execute(
+        select(
+            GeocodeCacheEntry.latitude,
+            GeocodeCacheEntry.longitude,
+            GeocodeCacheEntry.expires_at,
+        ).where(
+            GeocodeCacheEntry.key == key,
+            GeocodeCacheEntry.expires_at > now,
+        )
+    ).first()
+    if row is None:
+        return False, None
+
+    coordinates = None
+    if row.latitude is not None:
+        coordinates = (row.latitude, row.longitude)
+    expires_at = row.expires_at
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    local_cache.set(key, coordinates, (expires_at - now).total_seconds())
+    return True, coordinates
+
+
+def _cache_set(key, coordinates, ttl):
+    """Cache coordinates, or None for a miss, for ttl"""
+    local_cache.set(key, coordinates, ttl.total_seconds())
+
+    now = datetime.now(timezone.utc)
+    latitude, longitude = coordinates or (None, None)
+    values = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "expires_at": now + ttl,
+        "created_at": now,
+    }
+    if db.engine.dialect.name == "postgresql":
+        insert = postgresql.insert
+    else:
+        insert = sqlite.insert
+    statement = (
+        insert(GeocodeCacheEntry)
+        .values(key=key, **values)
+        .on_conflict_do_update(
+            index_elements=[GeocodeCacheEntry.key], set_=values
+        )
+    )
+    try:
+        # On its own connection, so the entry is kept even when the
+        # caller's transaction rolls back after a miss
+        with db.engine.begin() as connection:
+            connection.execute(statement)
+    except Exception as e:
+        current_app.logger.warning(f"Failed to cache geocode result: {e}")
+
+
+def _lookup(key, query):
+    """Geocode a query through the cache, returning coordinates or None"""
+    found, coordinates = _cache_get(key)
+    if found:
+        return coordinates
+
+    location = get_geocoder().geocode(query)
+    if location is None:
+        _cache_set(key, None, NEGATIVE_CACHE_TTL)
+        return None
+
+    coordinates = (location.latitude, location.longitude)
+    _cache_set(key, coordinates, CACHE_TTL)
+    return coordinates
+
+
+def geocode_address(address):
+    """
+    Geocode an address, falling back to its postcode.
+
+    Args:
+        address: Address object with street, city, and postcode attributes
+
+    Returns:
+        tuple: (latitude, longitude)
+
+    Raises:
+        GeocodeError: If geocoding fails; service errors aren't cached
+    """
+    # Format address string (on one line)
+    address_str = (
+        f"{address.house_number} {address.street}, "
+        f"{address.city}, {address.postcode}"
+    )
+    postcode = (address.postcode or "").strip()
+
+    try:
+        coordinates = _lookup(normalise_address(address), address_str)
+        if coordinates is None and postcode:
+            coordinates = _lookup(
+                f"postcode:{normalise_postcode(postcode)}", postcode
+            )
+    except (GeocoderTimedOut, GeocoderServiceError) as e:
+        raise GeocodeError(f"Geocoding service error: {str(e)}")
+    except Exception as e:
+        raise GeocodeError(f"Unexpected error during geocoding: {str(e)}")
+
+    if coordinates is None:
+        raise GeocodeError(f"Could not geocode address: {address_str}")
+    return coordinates
+
+
+def backfill_coordinates(batch_size=500, after=None, report=None):
+    """
+    Geocode every property saved without coordinates, a batch at a time.
+
+    Properties are read in id order, a page after the last id, so a run
+    can be resumed from the id it last reported. Addresses shared within
+    a batch are geocoded once, and each batch is written back with one
+    executemany UPDATE and committed. Then, like the geocode_property
+    job, the dashboards showing the batch's properties are invalidated
+    and this process's spatial index is updated.
+
+    Args:
+        batch_size: Properties read per batch
+        after: Only properties with an id after this UUID
+        report: Called with (stats, last_id) after each batch
+
+    Returns:
+        dict: Counts of properties scanned, updated and failed, and of
+            distinct addresses looked up
+    """
+    stats = {"scanned": 0, "updated": 0, "failed": 0, "addresses": 0}
+    while True:
+        query = (
+            select(
+                Property.id,
+                Property.house_number,
+                Property.street,
+                Property.city,
+                Property.postcode,
+                Property.price,
+                Property.status,
+            )
+            .where(
+                or_(Property.latitude.is_(None), Property.longitude.is_(None))
+            )
+            .order_by(Property.id)
+            .limit(batch_size)
+        )
+        if after is not None:
+            query = query.where(Property.id > after)
+        rows = db.session.execute(query).all()
+        if not rows:
+            return stats
+
+        by_address = {}
+        for row in rows:
+            by_address.setdefault(normalise_address(row), []).append(row)
+
+        updates = []
+        for address_rows in by_address.values():
+            try:
+                latitude, longitude = geocode_address(address_rows[0])
+            except GeocodeError as e:
+                stats["failed"] += len(address_rows)
+                current_app.logger.warning(
+                    f"Failed to geocode property {address_rows[0].id}: {e}"
+                )
+                continue
+            # Bulk updates skip mapper events, so set the geohash here
+            geohash = encode_geohash(latitude, longitude)
+            updates.extend(
+                {
+                    "id": row.id,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "geohash": geohash,
+                }
+                for row in address_rows
+            )
+
+        if updates:
+            # Also bumps last_updated, so cached detail payloads miss
+            db.session.execute(update(Property), updates)
+        db.session.commit()
+
+        if updates:
+            updated_ids = [values["id"] for values in updates]
+            invalidate_dashboards(*property_dashboard_user_ids(*updated_ids))
+            rows_by_id = {row.id: row for row in rows}
+            for values in updates:
+                row = rows_by_id[values["id"]]
+                update_spatial_index(
+                    row.id,
+                    values["latitude"],
+                    values["longitude"],
+                    row.price,
+                    row.status,
+                )
+
+        stats["scanned"] += len(rows)
+        stats["updated"] += len(updates)
+        stats["addresses"] += len(by_address)
+        after = rows[-1].id
+        if report is not None:
+            report(stats, after)
@@ -0,0 +1,53 @@
+"""
+Resized WebP renditions of uploaded photos.
+
+Rendering runs in the background job worker (see app.tasks): decoding and
+resampling a large photo is CPU-bound and holds the GIL, so in a web
+worker it would stall every other request.
+"""
+
+from io import BytesIO
+from PIL import Image, ImageOps
+
+# Name and bounding box (longest edge, in pixels) of each rendition,
+# largest first so each one can be resized from the previous
+RENDITIONS = (
+    ("full", 1920),
+    ("card", 800),
+    ("thumbnail", 320),
+)
+WEBP_QUALITY = 80
+# Encoder effort, 0-6; above 2 costs more time than it saves in bytes
+WEBP_METHOD = 2
+
+
+def render_derivatives(image_data):
+    """
+    Render every rendition of an image as WebP.
+
+    Args:
+        image_data: Encoded source image, already validated
+
+    Returns:
+        dict: Rendition name -> (webp_bytes, width, height)
+    """
+    largest = RENDITIONS[0][1]
+    with Image.open(BytesIO(image_data)) as img:
+        # Let the JPEG decoder scale down by up to 8x while decoding, as
+        # far as the largest rendition allows
+        scale = min(1, largest / max(img.size))
+        img.draft("RGB", (int(img.width * scale), int(img.height * scale)))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+        renditions = {}
+        for name, size in RENDITIONS:
+            # Never upscale; thumbnail() only ever shrinks
+            img.thumbnail((size, size), Image.LANCZOS)
+            buffer = BytesIO()
+            img.save(
+                buffer, format="WEBP", quality=WEBP_QUALITY, method=WEBP_METHOD
+            )
+            renditions[name] = (buffer.getvalue(), img.width, img.height)
+        return renditions
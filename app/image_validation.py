@@ -1,21 +1,168 @@
-from PIL import Image
+"""
+Header-only image validation.
+
+Size, format and dimensions are read straight from the JPEG, PNG, GIF or
+WebP header, so no pixel data is ever decoded. Rejecting oversized
+dimensions here is what protects the derivative pipeline from
+decompression bombs: a tiny file that claims to be 50000x50000 never
+reaches a decoder.
+"""
+
+import struct
+from collections import namedtuple
 from io import BytesIO
+from app.exceptions import ImageValidationError
+
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MAX_IMAGE_DIMENSION = 8192
+
+# Enough for every fixed-position header; JPEG is walked segment by segment
+HEADER_BYTES = 32
+
+ImageInfo = namedtuple(
+    "ImageInfo", ["mime_type", "extension", "width", "height"]
+)
+
+# JPEG start-of-frame markers carry the dimensions; C4, C8 and CC share
+# the range but are other segment types
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers with no length field after them
+JPEG_STANDALONE_MARKERS = set(range(0xD0, 0xD8)) | {0x01}
+
+
+def _read_png(header, stream):
+    # Signature, then IHDR is always the first chunk
+    if header[12:16] != b"IHDR":
+        raise ValueError("missing IHDR chunk")
+    width, height = struct.unpack(">II", header[16:24])
+    return ImageInfo("image/png", "png", width, height)
+
+
+def _read_gif(header, stream):
+    width, height = struct.unpack("<HH", header[6:10])
+    return ImageInfo("image/gif", "gif", width, height)
+
+
+def _read_webp(header, stream):
+    chunk = header[12:16]
+    if chunk == b"VP8 ":
+        # Lossy: 3-byte frame tag, start code, then 14-bit sizes
+        if header[23:26] != b"\x9d\x01\x2a":
+            raise ValueError("bad VP8 start code")
+        width, height = struct.unpack("<HH", header[26:30])
+        width, height = width & 0x3FFF, height & 0x3FFF
+    elif chunk == b"VP8L":
+        # Lossless: signature byte, then 14-bit width-1 and height-1
+        if header[20] != 0x2F:
+            raise ValueError("bad VP8L signature")
+        bits = struct.unpack("<I", header[21:25])[0]
+        width = (bits & 0x3FFF) + 1
+        height = ((bits >> 14) & 0x3FFF) + 1
+    elif chunk == b"VP8X":
+        # Extended: flags, then 24-bit canvas width-1 and height-1
+        width = int.from_bytes(header[24:27], "little") + 1
+        height = int.from_bytes(header[27:30], "little") + 1
+    else:
+        raise ValueError("unknown WebP chunk")
+    return ImageInfo("image/webp", "webp", width, height)
+
+
+def _read_jpeg(header, stream):
+    # Walk the marker segments from just after SOI until a frame header
+    stream.seek(2)
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            raise ValueError("no frame header")
+        if byte != b"\xff":
+            continue
+        marker = stream.read(1)
+        # Skip fill bytes between segments
+        while marker == b"\xff":
+            marker = stream.read(1)
+        if not marker:
+            raise ValueError("no frame header")
 
+        marker = marker[0]
+        if marker in JPEG_STANDALONE_MARKERS or marker == 0x00:
+            continue
+        if marker == 0xDA:
+            # Start of scan - compressed data follows, no frame seen
+            raise ValueError("no frame header")
+
+        (length,) = struct.unpack(">H", stream.read(2))
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">xHH", stream.read(5))
+            return ImageInfo("image/jpeg", "jpg", width, height)
+        stream.seek(length - 2, 1)
+
+
+def _detect(header):
+    if header.startswith(b"\xff\xd8"):
+        return _read_jpeg
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return _read_png
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return _read_gif
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return _read_webp
+    return None
+
+
+def inspect_image(image):
+    """
+    Check an image's size, format and dimensions from its header.
+
+    Args:
+        image: Image bytes, or a seekable binary file
+
+    Returns:
+        ImageInfo: Detected MIME type, file extension and dimensions
+
+    Raises:
+        ImageValidationError: If the image is too large, of an unsupported
+            format or unreadable
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        image = BytesIO(image)
 
-def validate_image(image_data):
-    """Validate image size and dimensions"""
     try:
         # Check file size (max 10MB)
-        if len(image_data) > 10 * 1024 * 1024:
-            return False, "Image size exceeds 10MB limit"
+        image.seek(0, 2)
+        if image.tell() > MAX_IMAGE_BYTES:
+            raise ImageValidationError("Image size exceeds 10MB limit")
+        image.seek(0)
 
-        # Check dimensions
-        img = Image.open(BytesIO(image_data))
-        width, height = img.size
-        if width > 8192 or height > 8192:
-            return False, "Image dimensions exceed 8192x8192 limit"
+        header = image.read(HEADER_BYTES)
+        reader = _detect(header)
+        if reader is None:
+            raise ImageValidationError(
+                "Invalid image: unsupported image format"
+            )
+        try:
+            info = reader(header, image)
+        except (ValueError, IndexError, struct.error) as e:
+            raise ImageValidationError(f"Invalid image: {str(e)}")
 
-        return True, None
+        if info.width < 1 or info.height < 1:
+            raise ImageValidationError("Invalid image: empty dimensions")
+        if (
+            info.width > MAX_IMAGE_DIMENSION
+            or info.height > MAX_IMAGE_DIMENSION
+        ):
+            raise ImageValidationError(
+                "Image dimensions exceed 8192x8192 limit"
+            )
+        return info
+
+    finally:
+        image.seek(0)
 
-    except Exception as e:
-        return False, f"Invalid image: {str(e)}"
+
+def validate_image(image):
+    """Validate image size and dimensions, returning (is_valid, error)"""
+    try:
+        inspect_image(image)
+        return True, None
+    except ImageValidationError as e:
+        return False, str(e)
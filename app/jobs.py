@@ -0,0 +1,165 @@
+"""
+Durable background jobs, queued in the jobs table.
+
+A job is added to the session of the write that needs it, so it is
+committed or rolled back with that write and never lost in between.
+Workers claim due jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any
+number of them can poll the table without blocking on each other or
+running the same job twice.
+
+Handlers must be idempotent: a job whose worker dies before recording
+the outcome is run again once its lease expires.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import and_, or_, select
+from app import db
+from app.models import Job
+
+MAX_ATTEMPTS = 5
+# Retries wait RETRY_BASE_DELAY, then twice as long each time after
+RETRY_BASE_DELAY = timedelta(seconds=10)
+RETRY_MAX_DELAY = timedelta(hours=1)
+# A job still running after this long is taken to have lost its worker
+LEASE_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue(kind, **payload):
+    """
+    Queue a job with the current session's write.
+
+    Args:
+        kind: Name of the handler to run
+        **payload: JSON-serializable keyword arguments for the handler
+
+    Returns:
+        Job: The pending job, saved when the session commits
+    """
+    job = Job(kind=kind, payload=payload, run_at=datetime.now(timezone.utc))
+    db.session.add(job)
+    return job
+
+
+def retry_delay(attempts):
+    """Return how long to wait before running a job again"""
+    # Stop doubling well past the cap rather than overflow timedelta
+    doublings = min(attempts - 1, 16)
+    return min(RETRY_BASE_DELAY * 2**doublings, RETRY_MAX_DELAY)
+
+
+def claim_job():
+    """
+    Claim the earliest due job, skipping any another worker has locked.
+
+    Returns:
+        Job: The claimed job, marked running, or None if none is due
+    """
+    now = datetime.now(timezone.utc)
+    job = db.session.scalars(
+        select(Job)
+        .where(
+            or_(
+                and_(Job.status == "pending", Job.run_at <= now),
+                and_(
+                    Job.status == "running",
+                    Job.locked_at <= now - LEASE_TIMEOUT,
+                ),
+            )
+        )
+        .order_by(Job.run_at, Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).first()
+
+    if job is not None:
+        job.status = "running"
+        job.locked_at = now
+        job.attempts += 1
+    db.session.commit()
+    return job
+
+
+def run_job(job, handlers):
+    """
+    Run a claimed job, then delete it or schedule its retry.
+
+    Args:
+        job: Job returned by claim_job
+        handlers: Dict of job kind -> handler function
+
+    Returns:
+        bool: Whether the handler succeeded
+    """
+    job_id, kind = job.id, job.kind
+    try:
+        handler = handlers.get(kind)
+        if handler is None:
+            raise ValueError(f"No handler for job kind {kind}")
+        handler(**job.payload)
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.last_error = str(e)
+        job.locked_at = None
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = "failed"
+            current_app.logger.error(
+                f"Job {job_id} ({kind}) failed for good: {str(e)}"
+            )
+        else:
+            job.status = "pending"
+            job.run_at = datetime.now(timezone.utc) + retry_delay(job.attempts)
+            current_app.logger.warning(
+                f"Job {job_id} ({kind}) failed, will retry: {str(e)}"
+            )
+        db.session.commit()
+        return False
+
+    db.session.delete(db.session.get(Job, job_id))
+    db.session.commit()
+    return True
+
+
+def run_pending(handlers):
+    """
+    Run jobs until none are due.
+
+    Args:
+        handlers: Dict of job kind -> handler function
+
+    Returns:
+        int: Number of jobs run, successfully or not
+    """
+    count = 0
+    while True:
+        job = claim_job()
+        if job is None:
+            return count
+        run_job(job, handlers)
+        count += 1
+
+
+def work(handlers, poll_interval=1.0, burst=False):
+    """
+    Run jobs as they come due, until interrupted.
+
+    Args:
+        handlers: Dict of job kind -> handler function
+        poll_interval: Seconds to sleep when no job is due
+        burst: Return as soon as no job is due instead of polling
+    """
+    while True:
+        try:
+            count = run_pending(handlers)
+        except Exception as e:
+            # Keep polling through database outages
+            db.session.rollback()
+            current_app.logger.error(f"Job worker error: {str(e)}")
+            count = 0
+
+        if burst and not count:
+            return
+        if not count:
+            time.sleep(poll_interval)
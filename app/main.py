@@ -3,6 +3,7 @@ import os
 import markdown2
 from sqlalchemy import text
 from app import db  # Import db from app package
+from app.dashboard import dashboard_cache_stats
 
 bp = Blueprint("main", __name__)  # No url_prefix
 
@@ -127,6 +128,12 @@ def health_check():
         )
 
 
+@bp.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    """Return cache hit/miss counters for this worker process."""
+    return jsonify({"dashboard": dashboard_cache_stats.as_dict()})
+
+
 @bp.route("/docs", methods=["GET"])
 def api_docs():
     """List all available API endpoints."""
@@ -1,5 +1,11 @@
+import time
+from uuid import UUID
+import click
 from flask.cli import FlaskGroup
 from app import create_app, db
+from app.geocoding import backfill_coordinates
+from app.jobs import work
+from app.tasks import HANDLERS
 
 cli = FlaskGroup(create_app=create_app)
 
@@ -10,5 +16,52 @@ def create_db():
     db.session.commit()
 
 
+@cli.command("worker")
+@click.option(
+    "--poll-interval",
+    default=1.0,
+    show_default=True,
+    help="Seconds to wait between polls when no job is due.",
+)
+@click.option("--burst", is_flag=True, help="Exit once no job is due.")
+def worker(poll_interval, burst):
+    """Run background jobs: geocoding, image renditions, blob deletion."""
+    work(HANDLERS, poll_interval=poll_interval, burst=burst)
+
+
+@cli.command("geocode_backfill")
+@click.option(
+    "--batch-size",
+    default=500,
+    show_default=True,
+    help="Properties read and updated per batch.",
+)
+@click.option(
+    "--after",
+    default=None,
+    help="Resume after this property id, as reported by an earlier run.",
+)
+def geocode_backfill(batch_size, after):
+    """Geocode properties that were saved without coordinates."""
+    started = time.monotonic()
+
+    def report(stats, last_id):
+        elapsed = time.monotonic() - started
+        click.echo(
+            f"{stats['scanned']} scanned, {stats['updated']} updated, "
+            f"{stats['failed']} failed, {stats['addresses']} addresses "
+            f"({stats['scanned'] / elapsed:.1f} properties/s), "
+            f"last id {last_id}"
+        )
+
+    stats = backfill_coordinates(
+        batch_size, UUID(after) if after else None, report
+    )
+    click.echo(
+        f"Done: {stats['updated']} of {stats['scanned']} properties "
+        f"geocoded in {time.monotonic() - started:.1f}s"
+    )
+
+
 if __name__ == "__main__":
     cli()
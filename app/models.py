@@ -3,9 +3,16 @@ from dataclasses import dataclass
 from datetime import datetime, timezone
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import ForeignKey, String, event
 from sqlalchemy.types import TypeDecorator, CHAR
 import uuid
+from app.geo import encode_geohash
+from app.search import (
+    SearchDocument,
+    create_pg_trgm,
+    pg_trgm_available,
+    search_document,
+)
 
 
 class GUID(TypeDecorator):
@@ -92,6 +99,7 @@ class UserRole(db.Model):
         db.CheckConstraint(
             "role_type IN ('buyer', 'seller')", name="valid_role_types"
         ),
+        db.Index("ix_user_roles_user_id", user_id),
     )
 
 
@@ -107,16 +115,19 @@ class Property(db.Model):
     bedrooms = db.Column(db.Integer)
     bathrooms = db.Column(db.Float)
     main_image_url = db.Column(db.String(500))
+    # Resized WebP rendition of the main image for list views
+    main_image_card_url = db.Column(db.String(500))
     seller_id = db.Column(
         String(128), db.ForeignKey("users.id"), nullable=False
     )
     created_at = db.Column(
-        db.DateTime(timezone=True), default=datetime.now(timezone.utc)
+        db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+    # Bumped on every update; the detail endpoint's ETag is derived from it
     last_updated = db.Column(
         db.DateTime(timezone=True),
-        default=datetime.now(timezone.utc),
-        onupdate=datetime.now(timezone.utc),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
     )
     status = db.Column(db.String(20), nullable=False, default="for_sale")
 
@@ -127,6 +138,13 @@ class Property(db.Model):
     postcode = db.Column(db.String, nullable=True)
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
+    # Set from latitude/longitude on flush; indexed for geographic search
+    geohash = db.Column(db.String(12), nullable=True)
+    # Generated by the database, for the list's q search; see app.search
+    search_document = db.Column(
+        SearchDocument,
+        db.Computed(search_document("A", street, city, postcode)),
+    )
 
     # Specs fields (from PropertySpecs model)
     reception_rooms = db.Column(db.Integer, nullable=True)
@@ -168,6 +186,56 @@ class Property(db.Model):
         db.CheckConstraint(
             f"status IN {tuple(VALID_STATUSES)}", name="valid_property_status"
         ),
+        # Search indexes - each matches the (price, id) keyset order used by
+        # the list endpoint so filtered pages are read straight off the index
+        db.Index("ix_properties_price_id", price.desc(), id.desc()),
+        db.Index(
+            "ix_properties_for_sale_price_id",
+            price.desc(),
+            id.desc(),
+            postgresql_where=db.text("status = 'for_sale'"),
+        ),
+        db.Index(
+            "ix_properties_status_price_id", status, price.desc(), id.desc()
+        ),
+        db.Index(
+            "ix_properties_bedrooms_price_id",
+            bedrooms,
+            price.desc(),
+            id.desc(),
+        ),
+        db.Index(
+            "ix_properties_property_type_price_id",
+            property_type,
+            price.desc(),
+            id.desc(),
+        ),
+        db.Index("ix_properties_seller_id", seller_id),
+        # Spatial indexes catch up on the rows changed since they last read
+        db.Index("ix_properties_last_updated", last_updated),
+        # Pattern ops, so geohash prefix searches (LIKE 'gcpv%') use it
+        db.Index(
+            "ix_properties_geohash",
+            geohash,
+            postgresql_ops={"geohash": "varchar_pattern_ops"},
+        ),
+        db.Index(
+            "ix_properties_search_document",
+            search_document,
+            postgresql_using="gin",
+        ),
+        # Partial street and postcode matches, where pg_trgm is available
+        db.Index(
+            "ix_properties_street_trgm",
+            street,
+            postgresql_using="gin",
+            postgresql_ops={"street": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql", callable_=pg_trgm_available),
+        db.Index(
+            "ix_properties_postcode_trgm",
+            db.text("replace(postcode, ' ', '') gin_trgm_ops"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql", callable_=pg_trgm_available),
     )
 
     def get_address_dict(self):
@@ -193,6 +261,19 @@ class Property(db.Model):
         }
 
 
+@event.listens_for(Property, "before_insert")
+@event.listens_for(Property, "before_update")
+def set_property_geohash(mapper, connection, target):
+    """Keep a property's geohash in step with its coordinates"""
+    if target.latitude is None or target.longitude is None:
+        target.geohash = None
+    else:
+        target.geohash = encode_geohash(target.latitude, target.longitude)
+
+
+event.listen(db.metadata, "before_create", create_pg_trgm)
+
+
 @dataclass
 class PropertyDetail(db.Model):
     __tablename__ = "property_details"
@@ -202,11 +283,23 @@ class PropertyDetail(db.Model):
         GUID(), ForeignKey("properties.id", ondelete="CASCADE"), nullable=False
     )
     description = db.Column(db.String, nullable=True)
+    search_document = db.Column(
+        SearchDocument, db.Computed(search_document("B", description))
+    )
     construction_year = db.Column(db.Integer, nullable=True)
     heating_type = db.Column(db.String, nullable=True)
 
     property = relationship("Property", back_populates="details")
 
+    __table_args__ = (
+        db.Index("ix_property_details_property_id", property_id),
+        db.Index(
+            "ix_property_details_search_document",
+            search_document,
+            postgresql_using="gin",
+        ),
+    )
+
 
 @dataclass
 class PropertyFeatures(db.Model):
@@ -223,6 +316,10 @@ class PropertyFeatures(db.Model):
 
     property = relationship("Property", back_populates="features")
 
+    __table_args__ = (
+        db.Index("ix_property_features_property_id", property_id),
+    )
+
 
 @dataclass
 class PropertyMedia(db.Model):
@@ -235,9 +332,23 @@ class PropertyMedia(db.Model):
     image_url = db.Column(db.String, nullable=False)
     image_type = db.Column(db.String, nullable=False, default="image")
     display_order = db.Column(db.Integer, nullable=True)
+    # Resized WebP renditions of image_url; null if rendering failed
+    thumbnail_url = db.Column(db.String, nullable=True)
+    card_url = db.Column(db.String, nullable=True)
+    full_url = db.Column(db.String, nullable=True)
 
     property = relationship("Property", back_populates="media")
 
+    __table_args__ = (
+        db.Index(
+            "ix_property_media_property_id_display_order",
+            property_id,
+            display_order,
+        ),
+        # Blobs are shared by content; this counts references to one
+        db.Index("ix_property_media_image_url", image_url),
+    )
+
 
 @dataclass
 class SavedProperty(db.Model):
@@ -260,6 +371,9 @@ class SavedProperty(db.Model):
         db.UniqueConstraint(
             "property_id", "user_id", name="uq_user_saved_property"
         ),
+        db.Index(
+            "ix_saved_properties_user_id_created_at", user_id, created_at
+        ),
     )
 
 
@@ -333,6 +447,8 @@ class PropertyNegotiation(db.Model):
             f"status IN {tuple(VALID_STATUSES)}",
             name="valid_negotiation_status",
         ),
+        db.Index("ix_property_negotiations_buyer_id", buyer_id),
+        db.Index("ix_property_negotiations_property_id", property_id),
     )
 
 
@@ -359,6 +475,14 @@ class OfferTransaction(db.Model):
     )
     user = relationship("User")
 
+    __table_args__ = (
+        db.Index(
+            "ix_offer_transactions_negotiation_id_created_at",
+            negotiation_id,
+            created_at,
+        ),
+    )
+
 
 class TransactionProgress(db.Model):
     """Model for tracking transaction progress after offer acceptance"""
@@ -447,4 +571,60 @@ class TransactionProgress(db.Model):
             "survey_approval IN ('pending', 'approved', 'rejected')",
             name="valid_survey_approval",
         ),
+        # One progress record per negotiation
+        db.Index(
+            "ix_transaction_progress_negotiation_id",
+            negotiation_id,
+            unique=True,
+        ),
+    )
+
+
+class Job(db.Model):
+    """Background work queued alongside a write, run by app.jobs workers"""
+
+    __tablename__ = "jobs"
+
+    VALID_STATUSES = ["pending", "running", "failed"]
+
+    id = db.Column(
+        db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True
+    )
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(10), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+    locked_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(
+        db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (
+        db.CheckConstraint(
+            f"status IN {tuple(VALID_STATUSES)}", name="valid_job_status"
+        ),
+        # Workers poll for the earliest due job
+        db.Index("ix_jobs_status_run_at", status, run_at),
+    )
+
+
+class GeocodeCacheEntry(db.Model):
+    """Cached geocoder answer for an address or postcode, see app.geocoding"""
+
+    __tablename__ = "geocode_cache"
+
+    # "address:<normalised address>|<postcode>" or "postcode:<postcode>"
+    key = db.Column(db.String, primary_key=True)
+    # Both null for an address the geocoder couldn't find
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    created_at = db.Column(
+        db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
@@ -0,0 +1,103 @@
+import base64
+import json
+from uuid import UUID
+
+# Page size used when the client doesn't ask for one
+DEFAULT_PAGE_SIZE = 50
+
+# Hard ceiling on rows per page, whatever the client asks for
+MAX_PAGE_SIZE = 100
+
+
+def parse_page_size(value):
+    """
+    Parse the ``limit`` query parameter.
+
+    Args:
+        value: Raw query string value, or None if not supplied
+
+    Returns:
+        int: Page size clamped to MAX_PAGE_SIZE
+
+    Raises:
+        ValueError: If the value is not a positive integer
+    """
+    if value is None or value == "":
+        return DEFAULT_PAGE_SIZE
+
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        limit = 0
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _encode_key(value, property_id):
+    """Encode a (value, id) sort key of a page's last row into a token"""
+    payload = json.dumps([value, str(property_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_key(token, check):
+    """
+    Decode a token produced by _encode_key.
+
+    Args:
+        token: Opaque cursor string from a previous response
+        check: Returns whether the decoded sort value has the right type
+
+    Returns:
+        tuple: (value, property_id)
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        value, property_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not check(value):
+            raise ValueError("bad sort value")
+        return value, UUID(property_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_float(value):
+    return isinstance(value, float)
+
+
+def encode_cursor(price, property_id):
+    """Encode the (price, id) sort key of the last row into a token"""
+    return _encode_key(price, property_id)
+
+
+def decode_cursor(token):
+    """Decode an encode_cursor token to (price, id), see _decode_key"""
+    return _decode_key(token, _is_int)
+
+
+def encode_distance_cursor(distance, property_id):
+    """Encode the (distance, id) sort key of a geographic search's last row"""
+    return _encode_key(distance, property_id)
+
+
+def decode_distance_cursor(token):
+    """Decode an encode_distance_cursor token, see _decode_key"""
+    return _decode_key(token, _is_float)
+
+
+def encode_rank_cursor(rank, property_id):
+    """Encode the (rank, id) sort key of a text search's last row"""
+    return _encode_key(rank, property_id)
+
+
+def decode_rank_cursor(token):
+    """Decode an encode_rank_cursor token to (rank, id), see _decode_key"""
+    return _decode_key(token, _is_float)
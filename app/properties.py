@@ -6,26 +6,59 @@ from app.models import (
     User,
 )
 from datetime import datetime, UTC
-from sqlalchemy.sql import select
-from flask_caching import Cache
-from app.utils import geocode_address
-from app.exceptions import GeocodeError
+from sqlalchemy.sql import select, tuple_
+from app.exceptions import ImageValidationError
 from uuid import uuid4
-from app.blob_storage import BlobStorageService
+from app.blob_storage import get_blob_service
 import json
 from marshmallow import ValidationError
 from app.schemas import PropertyCreateSchema, PropertyUpdateSchema
-from app.image_validation import validate_image
+from app.uploads import UploadBatch, spool_upload, stored_image
+from app.image_validation import inspect_image
+from app.jobs import enqueue
+from app.geo import (
+    MAX_RADIUS_KM,
+    nearest_properties_page,
+    parse_bbox,
+    parse_float_arg,
+    parse_geo_search,
+)
+from app.search import parse_search_text, text_search
+from app.spatial_index import (
+    MAX_CLUSTER_CELLS,
+    MAX_ZOOM,
+    cluster_cell_count,
+    cluster_degrees,
+    get_spatial_index,
+    update_spatial_index,
+)
+from app.pagination import (
+    parse_page_size,
+    encode_cursor,
+    decode_cursor,
+    decode_distance_cursor,
+    encode_rank_cursor,
+    decode_rank_cursor,
+)
+from app.serializers import (
+    select_property_summaries,
+    property_summary_from_row,
+)
+from app.dashboard import invalidate_dashboards, property_dashboard_user_ids
+from app.property_detail import (
+    load_property_detail,
+    property_detail_from_model,
+    get_property_version,
+    property_etag,
+    get_cached_property,
+    set_cached_property,
+    invalidate_cached_property,
+)
 
 bp = Blueprint("properties", __name__)
 
-# Initialize cache in __init__.py
-cache = Cache(
-    config={
-        "CACHE_TYPE": "simple",  # For development
-        "CACHE_DEFAULT_TIMEOUT": 300,  # 5 minutes
-    }
-)
+# Neighbours returned by the nearby endpoint when no limit is given
+NEARBY_DEFAULT_LIMIT = 10
 
 
 def validate_property_data(data):
@@ -108,9 +141,33 @@ def validate_property_data(data):
 
 @bp.route("", methods=["GET"])
 def get_properties():
-    """List view - returns basic property info."""
+    """List view - returns one page of basic property info.
+
+    Pages are keyset-paginated on (price, id); the token for the next page
+    is returned in the X-Next-Cursor header. With lat, lng and radius_km
+    or bbox, only properties in that area are listed, nearest first and
+    paginated on (distance, id). With q, only properties matching the
+    text are listed, best match first and paginated on (rank, id), unless
+    they're already ordered by distance.
+    """
     try:
-        query = select(Property)
+        try:
+            limit = parse_page_size(request.args.get("limit"))
+            geo_search = parse_geo_search(request.args)
+            search_text = parse_search_text(request.args)
+            cursor = request.args.get("cursor")
+            after = None
+            if cursor and geo_search:
+                after = decode_distance_cursor(cursor)
+            elif cursor and search_text:
+                after = decode_rank_cursor(cursor)
+            elif cursor:
+                after = decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Select only the list-view columns; rows are never hydrated
+        query = select_property_summaries()
 
         # Only filter by status if explicitly requested
         if request.args.get("status"):
@@ -134,137 +191,248 @@ def get_properties():
                 Property.property_type == request.args.get("property_type")
             )
 
-        query = query.order_by(Property.price.desc())
-        properties = list(db.session.execute(query).unique().scalars())
+        rank = None
+        if search_text is not None:
+            condition, rank = text_search(search_text)
+            query = query.where(condition)
 
-        return jsonify(
-            [
-                {
-                    "property_id": str(p.id),
-                    "price": p.price,
-                    "main_image_url": p.main_image_url,
-                    "created_at": p.created_at.isoformat(),
-                    "seller_id": str(p.seller_id),
-                    "status": p.status,
-                    # Return address as a nested dictionary with lat/long
-                    "address": {
-                        "house_number": p.house_number,
-                        "street": p.street,
-                        "city": p.city,
-                        "postcode": p.postcode,
-                        "latitude": p.latitude,
-                        "longitude": p.longitude,
-                    },
-                    "specs": {
-                        "bedrooms": p.bedrooms,
-                        "bathrooms": p.bathrooms,
-                        "property_type": p.property_type,
-                        "square_footage": p.square_footage,
-                    },
-                }
-                for p in properties
-            ]
-        )
+        if geo_search is not None:
+            rows, next_cursor = nearest_properties_page(
+                query, geo_search, after, limit
+            )
+            summaries = []
+            for row, distance in rows:
+                summary = property_summary_from_row(row)
+                summary["distance_km"] = round(distance, 3)
+                summaries.append(summary)
+            response = jsonify(summaries)
+            if next_cursor:
+                response.headers["X-Next-Cursor"] = next_cursor
+            return response
+
+        if rank is not None:
+            query = query.add_columns(rank.label("search_rank"))
+            if after:
+                query = query.where(tuple_(rank, Property.id) < after)
+            query = query.order_by(rank.desc(), Property.id.desc())
+        else:
+            # Resume strictly after the last row of the previous page
+            if after:
+                query = query.where(
+                    tuple_(Property.price, Property.id) < after
+                )
+            query = query.order_by(Property.price.desc(), Property.id.desc())
+
+        # Fetch one extra row to find out whether another page exists
+        query = query.limit(limit + 1)
+        rows = db.session.execute(query).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            if rank is not None:
+                next_cursor = encode_rank_cursor(
+                    rows[-1].search_rank, rows[-1].id
+                )
+            else:
+                next_cursor = encode_cursor(rows[-1].price, rows[-1].id)
+
+        response = jsonify([property_summary_from_row(row) for row in rows])
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
 
     except Exception as e:
         current_app.logger.error(f"Error in get_properties: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
-@bp.route("/<uuid:property_id>", methods=["GET"])
-def get_property(property_id):
-    """Get a specific property."""
+@bp.route("/clusters", methods=["GET"])
+def get_property_clusters():
+    """Properties in a map view, grouped into clusters.
+
+    Takes bbox=min_lng,min_lat,max_lng,max_lat, the map's zoom level and
+    an optional status. Clusters are squares of a fixed size on screen,
+    aggregated from this worker's in-process spatial index, so the
+    response grows with the map's size rather than the number of
+    listings.
+    """
     try:
-        property_item = db.session.get(Property, property_id)
-        if property_item is None:
-            return jsonify({"error": "Property not found"}), 404
+        try:
+            if not request.args.get("bbox"):
+                raise ValueError("bbox is required")
+            bounds = parse_bbox(request.args["bbox"])
+            zoom = parse_float_arg(request.args, "zoom", 0, MAX_ZOOM)
+            status = request.args.get("status")
+            if status and status not in Property.VALID_STATUSES:
+                raise ValueError(
+                    "status must be one of "
+                    f"{', '.join(sorted(Property.VALID_STATUSES))}"
+                )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        degrees = cluster_degrees(zoom)
+        if cluster_cell_count(bounds, degrees) > MAX_CLUSTER_CELLS:
+            return (
+                jsonify({"error": "bbox is too large for the zoom level"}),
+                400,
+            )
 
+        clusters = get_spatial_index().grid.clusters(
+            bounds, degrees, status or None
+        )
+        clusters.sort(key=lambda c: (-c.count, c.latitude, c.longitude))
         return jsonify(
             {
-                "property_id": str(property_item.id),
-                "price": property_item.price,
-                "main_image_url": property_item.main_image_url,
-                "created_at": property_item.created_at.isoformat(),
-                "status": property_item.status,
-                "details": {
-                    "description": (
-                        property_item.details.description
-                        if property_item.details
-                        else None
-                    ),
-                    "construction_year": (
-                        property_item.details.construction_year
-                        if property_item.details
-                        else None
-                    ),
-                    "heating_type": (
-                        property_item.details.heating_type
-                        if property_item.details
-                        else None
-                    ),
-                },
-                "features": {
-                    "has_garden": (
-                        property_item.features.has_garden
-                        if property_item.features
-                        else False
-                    ),
-                    "garden_size": (
-                        property_item.features.garden_size
-                        if property_item.features
-                        else None
-                    ),
-                    "parking_spaces": (
-                        property_item.features.parking_spaces
-                        if property_item.features
-                        else 0
-                    ),
-                    "has_garage": (
-                        property_item.features.has_garage
-                        if property_item.features
-                        else False
-                    ),
-                },
-                "image_urls": [
-                    media.image_url
-                    for media in property_item.media
-                    if media.image_type != "floorplan"
+                "cell_degrees": degrees,
+                "total": sum(cluster.count for cluster in clusters),
+                "clusters": [
+                    {
+                        "count": cluster.count,
+                        "latitude": round(cluster.latitude, 6),
+                        "longitude": round(cluster.longitude, 6),
+                        "min_price": cluster.min_price,
+                        "max_price": cluster.max_price,
+                        "median_price": cluster.median_price,
+                        "property_id": (
+                            str(cluster.property_id)
+                            if cluster.property_id
+                            else None
+                        ),
+                    }
+                    for cluster in clusters
                 ],
-                "floorplan_url": next(
-                    (
-                        media.image_url
-                        for media in property_item.media
-                        if media.image_type == "floorplan"
-                    ),
-                    None,
-                ),
-                "seller_id": str(property_item.seller_id),
-                # Return address as a nested dictionary with lat/long
-                "address": {
-                    "house_number": property_item.house_number,
-                    "street": property_item.street,
-                    "city": property_item.city,
-                    "postcode": property_item.postcode,
-                    "latitude": property_item.latitude,
-                    "longitude": property_item.longitude,
-                },
-                "specs": {
-                    "bedrooms": property_item.bedrooms,
-                    "bathrooms": property_item.bathrooms,
-                    "reception_rooms": property_item.reception_rooms,
-                    "square_footage": property_item.square_footage,
-                    "property_type": property_item.property_type,
-                    "epc_rating": property_item.epc_rating,
-                },
-                "last_updated": property_item.last_updated.isoformat(),
             }
         )
 
+    except Exception as e:
+        current_app.logger.error(f"Error getting property clusters: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/<uuid:property_id>", methods=["GET"])
+def get_property(property_id):
+    """Get a specific property.
+
+    Responses carry an ETag and Last-Modified derived from the property's
+    last_updated, and conditional requests are answered with 304 after a
+    single-column lookup.
+    """
+    try:
+        row = get_property_version(property_id)
+        if row is None:
+            return jsonify({"error": "Property not found"}), 404
+
+        version = row[0]
+        if version is None:
+            # No validators to offer; serve it uncached
+            property_item = load_property_detail(property_id)
+            return jsonify(property_detail_from_model(property_item))
+
+        etag = property_etag(property_id, version)
+        # HTTP dates have whole-second precision
+        last_modified = version.replace(microsecond=0)
+
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            not_modified = (
+                request.if_modified_since is not None
+                and last_modified <= request.if_modified_since
+            )
+
+        if not_modified:
+            response = current_app.response_class(status=304)
+        else:
+            property_data = get_cached_property(property_id, version)
+            if property_data is None:
+                property_item = load_property_detail(property_id)
+                property_data = property_detail_from_model(property_item)
+                set_cached_property(property_id, version, property_data)
+            response = jsonify(property_data)
+
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        # Let clients keep a copy but revalidate it on every use
+        response.cache_control.no_cache = True
+        return response
+
     except Exception as e:
         current_app.logger.error(f"Error getting property: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@bp.route("/<uuid:property_id>/nearby", methods=["GET"])
+def get_nearby_properties(property_id):
+    """Nearest properties to a property, nearest first.
+
+    Neighbours come from this worker's in-process spatial index rather
+    than a distance query; only their list-view rows are read, by id.
+    Takes limit (default 10) and an optional radius_km.
+    """
+    try:
+        try:
+            limit = NEARBY_DEFAULT_LIMIT
+            if request.args.get("limit"):
+                limit = parse_page_size(request.args.get("limit"))
+            radius_km = None
+            if request.args.get("radius_km"):
+                radius_km = parse_float_arg(
+                    request.args, "radius_km", 0.0, MAX_RADIUS_KM
+                )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        index = get_spatial_index()
+        position = index.grid.position(property_id)
+        if position is None:
+            row = db.session.execute(
+                select(Property.latitude, Property.longitude).where(
+                    Property.id == property_id
+                )
+            ).first()
+            if row is None:
+                return jsonify({"error": "Property not found"}), 404
+            if row.latitude is None or row.longitude is None:
+                return (
+                    jsonify({"error": "Property has not been geocoded yet"}),
+                    400,
+                )
+            position = (row.latitude, row.longitude)
+
+        neighbours = index.grid.nearest(
+            *position, limit, max_km=radius_km, exclude=property_id
+        )
+        rows = {}
+        if neighbours:
+            rows = {
+                row.id: row
+                for row in db.session.execute(
+                    select_property_summaries().where(
+                        Property.id.in_([n_id for _, n_id in neighbours])
+                    )
+                )
+            }
+
+        summaries = []
+        for distance, neighbour_id in neighbours:
+            row = rows.get(neighbour_id)
+            if row is None:
+                # Deleted by another worker since the index last caught up
+                index.update(neighbour_id, None, None)
+                continue
+            summary = property_summary_from_row(row)
+            summary["distance_km"] = round(distance, 3)
+            summaries.append(summary)
+        return jsonify(summaries)
+
+    except Exception as e:
+        current_app.logger.error(f"Error getting nearby properties: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
 def preprocess_property_data(data):
     """Convert string numbers to proper types"""
     if "specs" in data:
@@ -290,9 +458,10 @@ def preprocess_property_data(data):
 @bp.route("", methods=["POST"])
 def create_property():
     """Create a new property listing."""
+    uploads = None
+    committed = False
     try:
         warnings = []
-        image_urls = []
 
         # Handle multipart form data with images
         if request.content_type and request.content_type.startswith(
@@ -309,7 +478,7 @@ def create_property():
 
             # Initialize blob service
             try:
-                blob_service = BlobStorageService()
+                blob_service = get_blob_service()
             except Exception as e:
                 current_app.logger.error(
                     f"Failed to initialize blob service: {str(e)}"
@@ -319,38 +488,14 @@ def create_property():
                     500,
                 )
 
+            # Validate and upload in the background while the rest of the
+            # request is processed; results are collected in file order
+            uploads = UploadBatch(blob_service)
             for file in files:
                 if file and allowed_file(file.filename):
-                    # Read the file data
-                    image_data = file.read()
-
-                    # Validate image
-                    is_valid, error_message = validate_image(image_data)
-                    if not is_valid:
-                        warnings.append(
-                            f"Skipped image {file.filename}: {error_message}"
-                        )
-                        continue
-
-                    try:
-                        # Upload to blob storage
-                        current_app.logger.debug(
-                            f"Uploading file: {file.filename}"
-                        )
-                        image_url = blob_service.upload_image(
-                            image_data, file.content_type
-                        )
-                        current_app.logger.debug(
-                            f"Upload successful, URL: {image_url}"
-                        )
-                        image_urls.append(image_url)
-                    except Exception as e:
-                        current_app.logger.error(f"Upload failed: {str(e)}")
-                        warnings.append(
-                            f"Failed to upload {file.filename}: {str(e)}"
-                        )
+                    uploads.submit(file)
                 else:
-                    warnings.append(f"Skipped invalid file: {file.filename}")
+                    uploads.skip(f"Skipped invalid file: {file.filename}")
 
             try:
                 data = json.loads(request.form.get("data", "{}"))
@@ -394,7 +539,6 @@ def create_property():
             price=int(data["price"]),
             bedrooms=int(data["specs"]["bedrooms"]),
             bathrooms=float(data["specs"]["bathrooms"]),
-            main_image_url=image_urls[0] if image_urls else None,
             seller_id=data["seller_id"],
             created_at=datetime.now(UTC),
             status=data.get("status", "for_sale"),
@@ -410,30 +554,27 @@ def create_property():
             epc_rating=data["specs"]["epc_rating"],
         )
 
-        # Try to geocode the address
-        try:
-            lat, lon = geocode_address(
-                {
-                    "house_number": property.house_number,
-                    "street": property.street,
-                    "city": property.city,
-                    "postcode": property.postcode,
-                }
-            )
-            property.latitude = lat
-            property.longitude = lon
-        except GeocodeError:
-            warnings.append("Could not geocode address")
+        uploaded = []
+        if uploads is not None:
+            uploaded, upload_warnings = uploads.results()
+            warnings = upload_warnings + warnings
+        image_urls = [image.url for image in uploaded]
+        if uploaded:
+            property.main_image_url = uploaded[0].url
+            property.main_image_card_url = uploaded[0].renditions.get("card")
 
         db.session.add(property)
 
         # Create media entries for all images
-        for idx, image_url in enumerate(image_urls):
+        for idx, image in enumerate(uploaded):
             media = PropertyMedia(
                 property_id=property_id,
-                image_url=image_url,
+                image_url=image.url,
                 image_type="main" if idx == 0 else "interior",
                 display_order=idx,
+                thumbnail_url=image.renditions.get("thumbnail"),
+                card_url=image.renditions.get("card"),
+                full_url=image.renditions.get("full"),
             )
             db.session.add(media)
 
@@ -462,7 +603,25 @@ def create_property():
             )
             db.session.add(features)
 
+        # Geocoding and rendering run in the background; the jobs are
+        # saved with the listing, so neither is lost if a worker is down
+        enqueue("geocode_property", property_id=str(property_id))
+        for image_url in dict.fromkeys(
+            image.url for image in uploaded if not image.renditions
+        ):
+            enqueue("render_image", image_url=image_url)
+
         db.session.commit()
+        committed = True
+        invalidate_dashboards(property.seller_id)
+        # Usually not geocoded yet; the index picks it up once it is
+        update_spatial_index(
+            property_id,
+            property.latitude,
+            property.longitude,
+            property.price,
+            property.status,
+        )
         return (
             jsonify(
                 {
@@ -483,6 +642,11 @@ def create_property():
             500,
         )
 
+    finally:
+        # Don't leave blobs behind for a listing that was never saved
+        if uploads is not None and not committed:
+            uploads.discard()
+
 
 def allowed_file(filename):
     """Check if file type is allowed"""
@@ -569,7 +733,19 @@ def update_property(property_id):
             if "epc_rating" in specs_data:
                 property_item.epc_rating = specs_data["epc_rating"]
 
+        previous_version = (
+            property_item.last_updated or property_item.created_at
+        )
         db.session.commit()
+        invalidate_cached_property(property_id, previous_version)
+        invalidate_dashboards(*property_dashboard_user_ids(property_id))
+        update_spatial_index(
+            property_id,
+            property_item.latitude,
+            property_item.longitude,
+            property_item.price,
+            property_item.status,
+        )
         return jsonify(
             {
                 "message": "Property updated successfully",
@@ -591,16 +767,25 @@ def delete_property(property_id):
         if property_item is None:
             return jsonify({"error": "Property not found"}), 404
 
-        # Delete images from blob storage
-        blob_service = BlobStorageService()
-        for media in property_item.media:
-            try:
-                blob_service.delete_image(media.image_url)
-            except Exception as e:
-                current_app.logger.error(f"Failed to delete image: {str(e)}")
+        images = [stored_image(media) for media in property_item.media]
+
+        # Collect affected dashboards before the rows referencing them go
+        dashboard_user_ids = property_dashboard_user_ids(property_id)
+        previous_version = (
+            property_item.last_updated or property_item.created_at
+        )
 
         db.session.delete(property_item)
+        if images:
+            # Run once the rows are gone and stop counting as references
+            enqueue(
+                "delete_images",
+                images=[[image.url, image.renditions] for image in images],
+            )
         db.session.commit()
+        invalidate_cached_property(property_id, previous_version)
+        invalidate_dashboards(*dashboard_user_ids)
+        update_spatial_index(property_id, None, None)
         return jsonify({"message": "Property deleted successfully"})
 
     except Exception as e:
@@ -646,10 +831,19 @@ def test_upload():
             return jsonify({"error": "No selected file"}), 400
 
         if file and allowed_file(file.filename):
-            blob_service = BlobStorageService()
-            image_url = blob_service.upload_image(
-                file.read(), file.content_type
-            )
+            try:
+                spool = spool_upload(file)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            with spool:
+                try:
+                    image_info = inspect_image(spool)
+                except ImageValidationError as e:
+                    return jsonify({"error": str(e)}), 400
+
+                blob_service = get_blob_service()
+                image_url = blob_service.upload_image(spool, image_info)
             return jsonify({"message": "Upload successful", "url": image_url})
 
     except Exception as e:
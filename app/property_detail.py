@@ -0,0 +1,154 @@
+import hashlib
+from sqlalchemy import func, select
+from app import db, cache
+from app.models import Property
+
+# Entries are keyed by the property's version, so an update never serves a
+# stale entry; the timeout only bounds how long superseded versions linger
+PROPERTY_CACHE_TIMEOUT = 3600
+
+
+def load_property_detail(property_id):
+    """
+    Load a property with everything the detail view reads.
+
+    details and features are one-to-one and ride along in a join; media is
+    one-to-many and comes from a second SELECT ... IN, so the property row
+    isn't repeated per image.
+
+    Args:
+        property_id: UUID of the property
+
+    Returns:
+        Property: Instance with relations loaded, or None if not found
+    """
+    return (
+        db.session.execute(
+            select(Property)
+            .where(Property.id == property_id)
+            .options(
+                db.joinedload(Property.details),
+                db.joinedload(Property.features),
+                db.selectinload(Property.media),
+            )
+        )
+        .unique()
+        .scalar_one_or_none()
+    )
+
+
+def split_media(media):
+    """
+    Partition media into gallery images and a floorplan in one pass.
+
+    Args:
+        media: PropertyMedia instances in any order
+
+    Returns:
+        tuple: (image_urls in display order, floorplan_url or None)
+    """
+    image_urls = []
+    floorplan_url = None
+    for item in sorted(media, key=lambda m: m.display_order or 0):
+        if item.image_type != "floorplan":
+            image_urls.append(item.image_url)
+        elif floorplan_url is None:
+            floorplan_url = item.image_url
+    return image_urls, floorplan_url
+
+
+def property_detail_from_model(property_item):
+    """Build the detail-view property dict from a loaded Property instance"""
+    details = property_item.details
+    features = property_item.features
+    image_urls, floorplan_url = split_media(property_item.media)
+    return {
+        "property_id": str(property_item.id),
+        "price": property_item.price,
+        "main_image_url": property_item.main_image_url,
+        "created_at": property_item.created_at.isoformat(),
+        "status": property_item.status,
+        "details": {
+            "description": details.description if details else None,
+            "construction_year": (
+                details.construction_year if details else None
+            ),
+            "heating_type": details.heating_type if details else None,
+        },
+        "features": {
+            "has_garden": features.has_garden if features else False,
+            "garden_size": features.garden_size if features else None,
+            "parking_spaces": features.parking_spaces if features else 0,
+            "has_garage": features.has_garage if features else False,
+        },
+        "image_urls": image_urls,
+        "floorplan_url": floorplan_url,
+        "seller_id": str(property_item.seller_id),
+        # Return address as a nested dictionary with lat/long
+        "address": {
+            "house_number": property_item.house_number,
+            "street": property_item.street,
+            "city": property_item.city,
+            "postcode": property_item.postcode,
+            "latitude": property_item.latitude,
+            "longitude": property_item.longitude,
+        },
+        "specs": {
+            "bedrooms": property_item.bedrooms,
+            "bathrooms": property_item.bathrooms,
+            "reception_rooms": property_item.reception_rooms,
+            "square_footage": property_item.square_footage,
+            "property_type": property_item.property_type,
+            "epc_rating": property_item.epc_rating,
+        },
+        "last_updated": property_item.last_updated.isoformat(),
+    }
+
+
+def get_property_version(property_id):
+    """
+    Look up when a property last changed, without loading anything else.
+
+    Args:
+        property_id: UUID of the property
+
+    Returns:
+        Row: (version,) where version is last_updated, falling back to
+            created_at for rows that predate it; None if the property
+            doesn't exist
+    """
+    return db.session.execute(
+        select(
+            func.coalesce(Property.last_updated, Property.created_at)
+        ).where(Property.id == property_id)
+    ).first()
+
+
+def property_etag(property_id, version):
+    """Strong validator for one version of a property's detail payload"""
+    return hashlib.sha1(
+        f"{property_id}:{version.isoformat()}".encode()
+    ).hexdigest()
+
+
+def property_cache_key(property_id, version):
+    return f"property:{property_id}:{version.isoformat()}"
+
+
+def get_cached_property(property_id, version):
+    """Return the cached detail payload for a version, or None on a miss"""
+    return cache.get(property_cache_key(property_id, version))
+
+
+def set_cached_property(property_id, version, property_data):
+    cache.set(
+        property_cache_key(property_id, version),
+        property_data,
+        timeout=PROPERTY_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_cached_property(property_id, version):
+    """Drop a superseded version's payload rather than waiting for expiry"""
+    if version is not None:
+        cache.delete(property_cache_key(property_id, version))
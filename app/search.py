@@ -0,0 +1,233 @@
+"""
+Full-text search documents for the property list's q parameter.
+
+Properties and their details each store a search document generated from
+their text columns. On Postgres it is a weighted tsvector with a GIN
+index, matched with websearch_to_tsquery and ranked with ts_rank. Parts
+of words - the start of a postcode, a fragment of a street name - don't
+match a tsvector, so they are matched with ILIKE, backed by pg_trgm
+trigram indexes where the extension is available.
+
+Elsewhere (SQLite, in tests) the document is its columns' lower-cased
+text, and each word of q must appear in it.
+"""
+
+from sqlalchemy import DDL, Float, Text, text
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION, TSVECTOR
+from sqlalchemy.sql import (
+    and_,
+    case,
+    cast,
+    exists,
+    func,
+    intersect,
+    or_,
+    select,
+    true,
+    union,
+)
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import TypeDecorator
+from app import db
+
+SEARCH_CONFIG = "english"
+MAX_QUERY_LENGTH = 200
+# Shorter fragments can't use a trigram index, so would scan every row
+MIN_PARTIAL_LENGTH = 3
+
+
+class SearchDocument(TypeDecorator):
+    """tsvector on Postgres, plain text on other databases"""
+
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(TSVECTOR())
+        return dialect.type_descriptor(Text())
+
+
+class search_document(FunctionElement):
+    """
+    Generation expression of a search document.
+
+    search_document("A", street, city) weights its matches A, the
+    highest of Postgres's A-D; the weight is ignored elsewhere.
+    """
+
+    type = SearchDocument()
+    inherit_cache = True
+    name = "search_document"
+
+
+def _document_text(element, compiler, **kw):
+    _, *columns = element.clauses
+    return " || ' ' || ".join(
+        f"coalesce({compiler.process(column, **kw)}, '')" for column in columns
+    )
+
+
+@compiles(search_document, "postgresql")
+def _compile_search_document_postgresql(element, compiler, **kw):
+    weight = compiler.process(element.clauses.clauses[0], **kw)
+    document = _document_text(element, compiler, **kw)
+    return f"setweight(to_tsvector('{SEARCH_CONFIG}', {document}), {weight})"
+
+
+@compiles(search_document)
+def _compile_search_document(element, compiler, **kw):
+    return f"lower({_document_text(element, compiler, **kw)})"
+
+
+def pg_trgm_available(ddl, target, bind, **kw):
+    """Whether the database can use pg_trgm, for DDL(...).execute_if"""
+    return (
+        bind is not None
+        and bind.execute(
+            text(
+                "SELECT 1 FROM pg_available_extensions "
+                "WHERE name = 'pg_trgm'"
+            )
+        ).first()
+        is not None
+    )
+
+
+create_pg_trgm = DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(
+    dialect="postgresql", callable_=pg_trgm_available
+)
+
+
+def like_pattern(value):
+    """Return an ILIKE pattern matching value anywhere, escaped with \\"""
+    escaped = (
+        value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    )
+    return f"%{escaped}%"
+
+
+def search_words(q):
+    """
+    Return the words of search text that a match must contain.
+
+    Quotes are dropped, as are the "or"s and -negated words of
+    websearch_to_tsquery syntax.
+    """
+    return [
+        word
+        for word in q.replace('"', " ").split()
+        if word.lower() != "or" and not word.startswith("-")
+    ]
+
+
+def parse_search_text(args):
+    """
+    Parse the list's q parameter.
+
+    Args:
+        args: Request query parameters
+
+    Returns:
+        str: The search text, or None if there is none
+
+    Raises:
+        ValueError: If it's longer than MAX_QUERY_LENGTH
+    """
+    q = " ".join(args.get("q", "").split())
+    if not q:
+        return None
+    if len(q) > MAX_QUERY_LENGTH:
+        raise ValueError(f"q must be at most {MAX_QUERY_LENGTH} characters")
+    return q
+
+
+def text_search(q):
+    """
+    Build the condition and rank of the list's free-text search.
+
+    On Postgres, q is parsed with websearch_to_tsquery and matched against
+    a property's search document joined with its details', with the
+    candidates read from each document's GIN index first. Street and
+    postcode fragments of MIN_PARTIAL_LENGTH or more also match, with a
+    rank of zero. Elsewhere, each word of q must appear in one of the
+    documents' text.
+
+    Args:
+        q: Search text from parse_search_text
+
+    Returns:
+        tuple: (condition, rank) SQL expressions over Property, a higher
+            rank being a better match
+    """
+    # app.models imports this module, so its models are imported here
+    from app.models import Property, PropertyDetail
+
+    words = search_words(q)
+    if db.engine.dialect.name != "postgresql":
+        conditions = []
+        rank = 0
+        for word in words:
+            pattern = like_pattern(word.lower())
+            in_address = Property.search_document.like(pattern, escape="\\")
+            in_details = exists().where(
+                PropertyDetail.property_id == Property.id,
+                PropertyDetail.search_document.like(pattern, escape="\\"),
+            )
+            conditions.append(or_(in_address, in_details))
+            # Weighted like the Postgres documents: address above description
+            rank = (
+                rank
+                + case((in_address, 2), else_=0)
+                + case((in_details, 1), else_=0)
+            )
+        return and_(true(), *conditions), cast(rank, Float)
+
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    details = (
+        select(PropertyDetail.search_document)
+        .where(PropertyDetail.property_id == Property.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    document = Property.search_document.op("||")(
+        func.coalesce(details, cast("", TSVECTOR))
+    )
+    condition = document.bool_op("@@")(query)
+    # A property matches if one of its documents does, or else each has
+    # some of q's words; each side is read from its document's GIN index
+    candidates = [
+        select(Property.id).where(
+            Property.search_document.bool_op("@@")(query)
+        ),
+        select(PropertyDetail.property_id).where(
+            PropertyDetail.search_document.bool_op("@@")(query)
+        ),
+    ]
+    if len(words) > 1:
+        any_word = func.websearch_to_tsquery(SEARCH_CONFIG, " or ".join(words))
+        candidates.append(
+            intersect(
+                select(Property.id).where(
+                    Property.search_document.bool_op("@@")(any_word)
+                ),
+                select(PropertyDetail.property_id).where(
+                    PropertyDetail.search_document.bool_op("@@")(any_word)
+                ),
+            )
+        )
+    if len(q) >= MIN_PARTIAL_LENGTH:
+        partial = or_(
+            Property.street.ilike(like_pattern(q), escape="\\"),
+            func.replace(Property.postcode, " ", "").ilike(
+                like_pattern(q.replace(" ", "")), escape="\\"
+            ),
+        )
+        condition = or_(condition, partial)
+        candidates.append(select(Property.id).where(partial))
+    condition = and_(Property.id.in_(union(*candidates)), condition)
+
+    # ts_rank is a real; as a double it pages exactly by cursor
+    rank = cast(func.ts_rank(document, query), DOUBLE_PRECISION)
+    return condition, rank
@@ -0,0 +1,147 @@
+from sqlalchemy.sql import select
+from app.models import Property
+
+# Columns emitted by the property list view, in row-tuple order
+PROPERTY_SUMMARY_COLUMNS = (
+    Property.price,
+    Property.id,
+    Property.main_image_url,
+    Property.main_image_card_url,
+    Property.created_at,
+    Property.seller_id,
+    Property.status,
+    Property.house_number,
+    Property.street,
+    Property.city,
+    Property.postcode,
+    Property.latitude,
+    Property.longitude,
+    Property.bedrooms,
+    Property.bathrooms,
+    Property.property_type,
+    Property.square_footage,
+)
+
+
+def select_property_summaries(*extra_columns):
+    """
+    Build a SELECT of the list-view columns without ORM entity hydration.
+
+    Args:
+        *extra_columns: Additional columns appended after the summary ones
+
+    Returns:
+        Select: Query yielding plain row tuples
+    """
+    return select(*PROPERTY_SUMMARY_COLUMNS, *extra_columns)
+
+
+def property_summary_from_row(row):
+    """Build the list-view property dict from a summary row tuple"""
+    (
+        price,
+        property_id,
+        main_image_url,
+        main_image_card_url,
+        created_at,
+        seller_id,
+        status,
+        house_number,
+        street,
+        city,
+        postcode,
+        latitude,
+        longitude,
+        bedrooms,
+        bathrooms,
+        property_type,
+        square_footage,
+    ) = row[: len(PROPERTY_SUMMARY_COLUMNS)]
+
+    return {
+        "property_id": str(property_id),
+        "price": price,
+        "main_image_url": main_image_url,
+        # Small rendition for list cards, the original until one exists
+        "main_image_card_url": main_image_card_url or main_image_url,
+        "created_at": created_at.isoformat() if created_at else None,
+        "seller_id": seller_id,
+        "status": status,
+        "address": {
+            "house_number": house_number,
+            "street": street,
+            "city": city,
+            "postcode": postcode,
+            "latitude": latitude,
+            "longitude": longitude,
+        },
+        "specs": {
+            "bedrooms": bedrooms,
+            "bathrooms": bathrooms,
+            "property_type": property_type,
+            "square_footage": square_footage,
+        },
+    }
+
+
+def property_summary_from_model(property_item):
+    """Build the list-view property dict from a loaded Property instance"""
+    return property_summary_from_row(
+        tuple(
+            getattr(property_item, column.key)
+            for column in PROPERTY_SUMMARY_COLUMNS
+        )
+    )
+
+
+def transaction_history(transactions):
+    """Serialise offer transactions that are already sorted by created_at"""
+    return [
+        {
+            "offer_amount": trans.offer_amount,
+            "made_by": str(trans.made_by),
+            "created_at": (
+                trans.created_at.isoformat() if trans.created_at else None
+            ),
+        }
+        for trans in transactions
+    ]
+
+
+def negotiation_summary(negotiation, transactions):
+    """
+    Build the dashboard fields shared by buyer and seller negotiations.
+
+    Args:
+        negotiation: PropertyNegotiation instance
+        transactions: The negotiation's transactions sorted by created_at
+
+    Returns:
+        dict: Negotiation fields without the counterparty details
+    """
+    return {
+        "negotiation_id": str(negotiation.id),
+        "property_id": str(negotiation.property_id),
+        "status": negotiation.status,
+        "created_at": (
+            negotiation.created_at.isoformat()
+            if negotiation.created_at
+            else None
+        ),
+        "last_offer_by": str(negotiation.last_offer_by),
+        "current_offer": (
+            transactions[-1].offer_amount if transactions else None
+        ),
+        "last_updated": (
+            negotiation.updated_at.isoformat()
+            if negotiation.updated_at
+            else None
+        ),
+        # Buyer information fields
+        "buyer_status": negotiation.buyer_status,
+        "preferred_move_in_date": negotiation.preferred_move_in_date,
+        "payment_method": negotiation.payment_method,
+        "mortgage_status": negotiation.mortgage_status,
+        "additional_notes": negotiation.additional_notes,
+        "transaction_history": transaction_history(transactions),
+    }
@@ -0,0 +1,491 @@
+"""
+In-process spatial index of property positions, for nearest-neighbour
+lookups that don't query the database.
+
+Each worker process builds its own index from the properties table on
+first use. Writes it handles itself are applied straight away; changes
+made elsewhere (other API workers, the geocoding job) are caught up by
+re-reading the rows updated since the last read, at most every
+REFRESH_INTERVAL seconds. A property another process deleted is dropped
+when a lookup finds its row gone, or at the latest when the whole table
+is re-read, every REBUILD_INTERVAL seconds.
+
+The index also holds each property's price and status, so that map
+clusters can be aggregated from it. Each cell keeps a summary of its
+properties per status, built on first use and dropped when the cell
+changes; a cluster made of whole cells merges their summaries rather than
+visiting every property.
+"""
+
+import heapq
+import itertools
+import math
+import os
+import statistics
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.geo import EARTH_RADIUS_KM, haversine_km
+from app.models import Property
+
+# Cells are this many degrees on a side, about 5.5km x 3.5km in the UK
+CELL_DEGREES = 0.05
+REFRESH_INTERVAL = 30
+# Changes are re-read from this long before the newest one seen, so rows
+# committed late with an earlier last_updated aren't missed
+REFRESH_OVERLAP = timedelta(minutes=1)
+# Seconds between re-reads of the whole table
+REBUILD_INTERVAL = 600
+
+# A map tile is this many pixels square at every zoom level, and each
+# cluster covers about this many pixels square of it, so a screenful of
+# map holds the same number of clusters however many properties it shows
+TILE_PIXELS = 256
+CLUSTER_PIXELS = 64
+MAX_ZOOM = 20
+# Most grid squares a clusters request may span
+MAX_CLUSTER_CELLS = 4096
+
+# price and status are the cluster's, property_id only for a lone property
+Cluster = namedtuple(
+    "Cluster",
+    [
+        "count",
+        "latitude",
+        "longitude",
+        "min_price",
+        "max_price",
+        "median_price",
+        "property_id",
+    ],
+)
+
+
+def cluster_degrees(zoom):
+    """
+    Return the side in degrees of the squares clusters are grouped by.
+
+    Sizes from CELL_DEGREES up are rounded down to CELL_DEGREES times a
+    power of two, so each index cell lies inside a single square.
+
+    Args:
+        zoom: Web map zoom level, 0 (the whole world) to MAX_ZOOM
+
+    Returns:
+        float: Degrees of longitude, used for latitude too
+    """
+    degrees = 360.0 / 2**zoom * CLUSTER_PIXELS / TILE_PIXELS
+    if degrees < CELL_DEGREES:
+        return degrees
+    return CELL_DEGREES * 2 ** math.floor(math.log2(degrees / CELL_DEGREES))
+
+
+def cluster_cell_count(bounds, degrees):
+    """Return how many cluster squares a box spans"""
+    min_lat, min_lng, max_lat, max_lng = bounds
+    rows = int((max_lat + 90) // degrees) - int((min_lat + 90) // degrees)
+    cols = int((max_lng + 180) // degrees) - int((min_lng + 180) // degrees)
+    return (rows + 1) * (cols + 1)
+
+
+class GridIndex:
+    """Property positions bucketed in a uniform latitude/longitude grid.
+
+    A lookup only visits the cells around its point, so its cost depends
+    on how many properties are nearby rather than on the total.
+    Thread-safe.
+    """
+
+    def __init__(self, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.rows = math.ceil(180 / cell_degrees)
+        self.cols = math.ceil(360 / cell_degrees)
+        # (row, col) -> {property id: (latitude, longitude, price, status)}
+        self._cells = {}
+        self._positions = {}
+        # (row, col) -> {status: [count, latitude sum, longitude sum,
+        # prices, property id]}, for the cells summarised since they last
+        # changed
+        self._summaries = {}
+        self._lock = threading.Lock()
+
+    def _cell(self, latitude, longitude):
+        row = min(int((latitude + 90) // self.cell_degrees), self.rows - 1)
+        col = int((longitude + 180) // self.cell_degrees) % self.cols
+        return row, col
+
+    def add(self, property_id, latitude, longitude, price=None, status=None):
+        """Add a property, or move or update it if it's already indexed"""
+        with self._lock:
+            self._discard(property_id)
+            cell = self._cell(latitude, longitude)
+            self._cells.setdefault(cell, {})[property_id] = (
+                latitude,
+                longitude,
+                price,
+                status,
+            )
+            self._summaries.pop(cell, None)
+            self._positions[property_id] = (latitude, longitude)
+
+    def remove(self, property_id):
+        with self._lock:
+            self._discard(property_id)
+
+    def _discard(self, property_id):
+        position = self._positions.pop(property_id, None)
+        if position is None:
+            return
+        cell = self._cell(*position)
+        members = self._cells[cell]
+        del members[property_id]
+        if not members:
+            del self._cells[cell]
+        self._summaries.pop(cell, None)
+
+    def position(self, property_id):
+        """Return a property's (latitude, longitude), or None"""
+        return self._positions.get(property_id)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _ring(self, row, col, ring):
+        """Yield the cells exactly ring cells from (row, col)"""
+        for d_row in range(-ring, ring + 1):
+            cell_row = row + d_row
+            if not 0 <= cell_row < self.rows:
+                continue
+            if abs(d_row) == ring:
+                d_cols = range(-ring, ring + 1)
+            else:
+                d_cols = (-ring, ring) if ring else (0,)
+            for d_col in d_cols:
+                yield cell_row, (col + d_col) % self.cols
+
+    def _ring_distance(self, latitude, ring):
+        """Lower bound in km on the distance to anything ring cells away"""
+        gap = math.radians((ring - 1) * self.cell_degrees)
+        # Cells in the ring's rows are at most this far from the equator
+        widest = math.radians(
+            min(abs(latitude) + ring * self.cell_degrees, 90.0)
+        )
+        across = 2 * math.asin(
+            min(1.0, math.cos(widest) * math.sin(min(gap, math.pi) / 2))
+        )
+        return EARTH_RADIUS_KM * min(gap, across)
+
+    def nearest(self, latitude, longitude, k, max_km=None, exclude=None):
+        """
+        Find the k properties closest to a point.
+
+        Visits rings of cells outwards from the point's cell, and stops
+        once no cell further out could hold anything closer than the
+        k-th nearest found.
+
+        Args:
+            latitude: Latitude of the point
+            longitude: Longitude of the point
+            k: Most properties to return
+            max_km: Only properties within this distance
+            exclude: Property id to leave out, e.g. the one searched from
+
+        Returns:
+            list: (distance_km, property_id) pairs, nearest first
+        """
+        row, col = self._cell(latitude, longitude)
+        # Max-heap of the k nearest so far, as (-distance, id)
+        best = []
+        visited = set()
+        with self._lock:
+            candidates = len(self._positions) - (exclude in self._positions)
+            k = min(k, candidates)
+            for ring in itertools.count():
+                if k == 0:
+                    break
+                if ring > 1:
+                    bound = self._ring_distance(latitude, ring)
+                    if max_km is not None and bound > max_km:
+                        break
+                    if len(best) == k and bound >= -best[0][0]:
+                        break
+
+                last = (2 * ring + 1) ** 2 >= len(self._cells)
+                if last:
+                    # Far from everything, or near a pole where the bound
+                    # is weak: rather than visit more cells than are
+                    # occupied, check every occupied cell left
+                    cells = [c for c in self._cells if c not in visited]
+                else:
+                    cells = self._ring(row, col, ring)
+
+                for cell in cells:
+                    if cell in visited:
+                        continue
+                    visited.add(cell)
+                    for property_id, (lat, lng, _, _) in self._cells.get(
+                        cell, {}
+                    ).items():
+                        if property_id == exclude:
+                            continue
+                        distance = haversine_km(latitude, longitude, lat, lng)
+                        if max_km is not None and distance > max_km:
+                            continue
+                        if len(best) < k:
+                            heapq.heappush(best, (-distance, property_id))
+                        elif distance < -best[0][0]:
+                            heapq.heapreplace(best, (-distance, property_id))
+                if last:
+                    break
+        return sorted(
+            (-distance, property_id) for distance, property_id in best
+        )
+
+    def _summary(self, cell):
+        summary = self._summaries.get(cell)
+        if summary is None:
+            summary = {}
+            for property_id, (lat, lng, price, status) in self._cells[
+                cell
+            ].items():
+                totals = summary.get(status)
+                if totals is None:
+                    summary[status] = [1, lat, lng, [price], property_id]
+                else:
+                    totals[0] += 1
+                    totals[1] += lat
+                    totals[2] += lng
+                    totals[3].append(price)
+            self._summaries[cell] = summary
+        return summary
+
+    def clusters(self, bounds, degrees, status=None):
+        """
+        Group the properties inside a box by the squares of a grid.
+
+        Squares are counted from latitude -90 and longitude -180. Cells
+        wholly inside the box and inside one square are taken from their
+        summaries; only the properties of cells on the box's edges, or of
+        cells split between squares, are visited one by one.
+
+        Args:
+            bounds: (min_lat, min_lng, max_lat, max_lng)
+            degrees: Side of the squares, e.g. from cluster_degrees
+            status: Only properties with this status
+
+        Returns:
+            list: A Cluster for each square holding any properties
+        """
+        min_lat, min_lng, max_lat, max_lng = bounds
+        ratio = round(degrees / self.cell_degrees)
+        aligned = ratio >= 1 and math.isclose(
+            ratio * self.cell_degrees, degrees
+        )
+        first_row = self._cell(min_lat, min_lng)[0]
+        last_row = self._cell(max_lat, max_lng)[0]
+        first_col, last_col = (
+            min(int((lng + 180) // self.cell_degrees), self.cols - 1)
+            for lng in (min_lng, max_lng)
+        )
+
+        # square -> [count, latitude sum, longitude sum, prices, id]
+        totals = {}
+        with self._lock:
+            span = (last_row - first_row + 1) * (last_col - first_col + 1)
+            if span <= len(self._cells):
+                cells = (
+                    (row, col)
+                    for row in range(first_row, last_row + 1)
+                    for col in range(first_col, last_col + 1)
+                )
+            else:
+                cells = (
+                    (row, col)
+                    for row, col in self._cells
+                    if first_row <= row <= last_row
+                    and first_col <= col <= last_col
+                )
+
+            for row, col in cells:
+                members = self._cells.get((row, col))
+                if members is None:
+                    continue
+                if aligned and (
+                    first_row < row < last_row and first_col < col < last_col
+                ):
+                    key = (row // ratio, col // ratio)
+                    for cell_status, summary in self._summary(
+                        (row, col)
+                    ).items():
+                        if status is not None and cell_status != status:
+                            continue
+                        merged = totals.get(key)
+                        if merged is None:
+                            # Copied, as the summary's prices are cached
+                            totals[key] = summary[:3] + [
+                                list(summary[3]),
+                                summary[4],
+                            ]
+                        else:
+                            merged[0] += summary[0]
+                            merged[1] += summary[1]
+                            merged[2] += summary[2]
+                            merged[3].extend(summary[3])
+                    continue
+
+                for property_id, (
+                    lat,
+                    lng,
+                    price,
+                    prop_status,
+                ) in members.items():
+                    if status is not None and prop_status != status:
+                        continue
+                    if not (
+                        min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+                    ):
+                        continue
+                    if aligned:
+                        key = (row // ratio, col // ratio)
+                    else:
+                        key = (
+                            int((lat + 90) // degrees),
+                            int((lng + 180) // degrees),
+                        )
+                    merged = totals.get(key)
+                    if merged is None:
+                        totals[key] = [1, lat, lng, [price], property_id]
+                    else:
+                        merged[0] += 1
+                        merged[1] += lat
+                        merged[2] += lng
+                        merged[3].append(price)
+
+        clusters = []
+        for count, lat_sum, lng_sum, prices, property_id in totals.values():
+            prices.sort()
+            clusters.append(
+                Cluster(
+                    count,
+                    lat_sum / count,
+                    lng_sum / count,
+                    prices[0],
+                    prices[-1],
+                    statistics.median(prices),
+                    property_id if count == 1 else None,
+                )
+            )
+        return clusters
+
+
+class PropertySpatialIndex:
+    """A GridIndex of every geocoded property, kept in step with the table"""
+
+    def __init__(self):
+        self.grid = GridIndex()
+        self.pid = os.getpid()
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = None
+        self._rebuilt_at = None
+        self._watermark = None
+
+    def refresh(self, force=False):
+        """Read the rows changed since the last refresh, if one is due"""
+        if not force and self._refreshed_at is not None:
+            if time.monotonic() - self._refreshed_at < REFRESH_INTERVAL:
+                return
+        with self._refresh_lock:
+            if not force and self._refreshed_at is not None:
+                if time.monotonic() - self._refreshed_at < REFRESH_INTERVAL:
+                    return
+            try:
+                self._load()
+            except Exception as e:
+                # Keep serving what's indexed; try again next interval
+                db.session.rollback()
+                current_app.logger.warning(
+                    f"Failed to refresh spatial index: {e}"
+                )
+            self._refreshed_at = time.monotonic()
+
+    def _load(self):
+        if (
+            self._rebuilt_at is None
+            or time.monotonic() - self._rebuilt_at >= REBUILD_INTERVAL
+        ):
+            # Rows other processes delete never show up as changes, and
+            # clusters can't check each of theirs is still there, so every
+            # so often start again from the whole table
+            grid = GridIndex()
+            self._watermark = self._read(grid, None)
+            self.grid = grid
+            self._rebuilt_at = time.monotonic()
+        else:
+            self._watermark = self._read(self.grid, self._watermark)
+
+    def _read(self, grid, watermark):
+        """Index the rows changed since watermark; return the newest"""
+        query = select(
+            Property.id,
+            Property.latitude,
+            Property.longitude,
+            Property.price,
+            Property.status,
+            Property.last_updated,
+        )
+        if watermark is not None:
+            query = query.where(
+                Property.last_updated > watermark - REFRESH_OVERLAP
+            )
+
+        rows = db.session.execute(
+            query, execution_options={"yield_per": 10000}
+        )
+        for row in rows:
+            if row.latitude is None or row.longitude is None:
+                grid.remove(row.id)
+            else:
+                grid.add(
+                    row.id, row.latitude, row.longitude, row.price, row.status
+                )
+            if row.last_updated is not None and (
+                watermark is None or row.last_updated > watermark
+            ):
+                watermark = row.last_updated
+        return watermark
+
+    def update(
+        self, property_id, latitude, longitude, price=None, status=None
+    ):
+        """Index a property's current position; None removes it"""
+        if latitude is None or longitude is None:
+            self.grid.remove(property_id)
+        else:
+            self.grid.add(property_id, latitude, longitude, price, status)
+
+
+def get_spatial_index():
+    """Return this process's PropertySpatialIndex, caught up if due.
+
+    Held on the app and checked by pid, so that workers forked from a
+    preloaded master each build their own.
+    """
+    index = current_app.extensions.get("spatial_index")
+    if index is None or index.pid != os.getpid():
+        index = PropertySpatialIndex()
+        current_app.extensions["spatial_index"] = index
+    index.refresh()
+    return index
+
+
+def update_spatial_index(
+    property_id, latitude, longitude, price=None, status=None
+):
+    """Apply a committed write to this process's index, if it has one"""
+    index = current_app.extensions.get("spatial_index")
+    if index is not None and index.pid == os.getpid():
+        index.update(property_id, latitude, longitude, price, status)
@@ -0,0 +1,126 @@
+"""
+Handlers for the background jobs queued by the properties API.
+
+Each takes its job's payload as keyword arguments and is safe to run
+more than once; see app.jobs.
+"""
+
+from uuid import UUID
+from sqlalchemy import select
+from app import db
+from app.models import Property, PropertyMedia
+from app.blob_storage import get_blob_service
+from app.image_derivatives import render_derivatives
+from app.image_validation import ImageInfo
+from app.uploads import (
+    UploadedImage,
+    delete_unreferenced_images,
+    rendition_blob_names,
+)
+from app.geocoding import geocode_address
+from app.dashboard import invalidate_dashboards, property_dashboard_user_ids
+from app.property_detail import invalidate_cached_property
+from app.spatial_index import update_spatial_index
+
+
+def _invalidate_property(property_item, previous_version):
+    invalidate_cached_property(property_item.id, previous_version)
+    invalidate_dashboards(*property_dashboard_user_ids(property_item.id))
+
+
+def geocode_property(property_id):
+    """Look up and store a property's coordinates from its address"""
+    property_item = db.session.get(Property, UUID(property_id))
+    if property_item is None:
+        # Deleted since the job was queued
+        return
+
+    # Raises GeocodeError, so the job is retried
+    latitude, longitude = geocode_address(property_item)
+
+    previous_version = property_item.last_updated or property_item.created_at
+    property_item.latitude = latitude
+    property_item.longitude = longitude
+    db.session.commit()
+    _invalidate_property(property_item, previous_version)
+    update_spatial_index(
+        property_item.id,
+        latitude,
+        longitude,
+        property_item.price,
+        property_item.status,
+    )
+
+
+def render_image(image_url):
+    """
+    Render and store an uploaded image's renditions.
+
+    Fills in every media row showing the image that doesn't have them
+    yet, and the card image of properties whose main image it is.
+    """
+    media_items = db.session.scalars(
+        select(PropertyMedia).where(
+            PropertyMedia.image_url == image_url,
+            PropertyMedia.card_url.is_(None),
+        )
+    ).all()
+    if not media_items:
+        # Already rendered, or no listing shows it any more
+        return
+
+    blob_service = get_blob_service()
+    image_data = blob_service.download_image(image_url)
+    blob_names = rendition_blob_names(image_url.rsplit("/", 1)[-1])
+    renditions = {}
+    for name, (data, width, height) in render_derivatives(image_data).items():
+        # Named by the original's digest, so a retry skips those stored
+        renditions[name] = blob_service.upload_image(
+            data,
+            ImageInfo("image/webp", "webp", width, height),
+            blob_name=blob_names[name],
+        )
+
+    for media in media_items:
+        media.thumbnail_url = renditions.get("thumbnail")
+        media.card_url = renditions.get("card")
+        media.full_url = renditions.get("full")
+
+    properties = db.session.scalars(
+        select(Property).where(
+            Property.main_image_url == image_url,
+            Property.main_image_card_url.is_(None),
+        )
+    ).all()
+    previous_versions = {}
+    for property_item in properties:
+        previous_versions[property_item.id] = (
+            property_item.last_updated or property_item.created_at
+        )
+        property_item.main_image_card_url = renditions.get("card")
+    db.session.commit()
+
+    for property_item in properties:
+        _invalidate_property(
+            property_item, previous_versions[property_item.id]
+        )
+
+
+def delete_images(images):
+    """
+    Delete the blobs of a deleted listing's images no other listing uses.
+
+    Args:
+        images: [image_url, {rendition name: url}] per original
+    """
+    delete_unreferenced_images(
+        get_blob_service(),
+        [UploadedImage(url, renditions) for url, renditions in images],
+    )
+
+
+HANDLERS = {
+    "geocode_property": geocode_property,
+    "render_image": render_image,
+    "delete_images": delete_images,
+}
@@ -0,0 +1,311 @@
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from tempfile import SpooledTemporaryFile
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.models import PropertyMedia
+from app.blob_storage import content_digest, RECENTLY_MODIFIED
+from app.image_validation import inspect_image, MAX_IMAGE_BYTES
+from app.image_derivatives import RENDITIONS
+from app.exceptions import BlobStorageError, ImageValidationError
+
+# Spooled uploads stay in memory up to this size, then move to a temp file
+SPOOL_MEMORY_LIMIT = 1024 * 1024
+COPY_CHUNK_SIZE = 64 * 1024
+
+# An uploaded original and its rendition URLs by name, empty until they
+# have been rendered
+UploadedImage = namedtuple("UploadedImage", ["url", "renditions"])
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_upload_executor():
+    """Return this process's shared upload pool, creating it on first use.
+
+    Checked by pid so that workers forked from a preloaded master each
+    build their own pool - threads don't survive fork.
+    """
+    global _executor, _executor_pid
+    if _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get(
+                        "UPLOAD_MAX_WORKERS", 8
+                    ),
+                    thread_name_prefix="image-upload",
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def rendition_blob_names(blob_name):
+    """
+    Name the renditions of an original after its blob.
+
+    Originals are named by content digest, so the renditions of a photo
+    that was uploaded before can be found without rendering it again.
+
+    Args:
+        blob_name: Blob name of the original
+
+    Returns:
+        dict: Rendition name -> blob name
+    """
+    stem = blob_name.rsplit(".", 1)[0]
+    return {name: f"{stem}-{name}.webp" for name, _ in RENDITIONS}
+
+
+def stored_image(media):
+    """Return the UploadedImage a PropertyMedia row refers to"""
+    renditions = {}
+    for name, _ in RENDITIONS:
+        image_url = getattr(media, f"{name}_url")
+        if image_url:
+            renditions[name] = image_url
+    return UploadedImage(media.image_url, renditions)
+
+
+def delete_unreferenced_images(blob_service, images, grace=True):
+    """
+    Delete the blobs of images that no PropertyMedia row refers to.
+
+    Blobs are named by content, so one photo uploaded to several listings
+    is stored once; its media rows are its reference count, and the blob
+    only goes when the last of them has. Call this after the rows are
+    deleted or were never committed.
+
+    A blob another listing reused while its rows are still being saved
+    has no rows yet either, so only blobs unmodified for
+    IMAGE_DELETE_GRACE_SECONDS are deleted - reuse touches the blob, and
+    blob storage checks the time as it deletes. Blobs kept this way are
+    left to scripts/cleanup_blob_storage.py.
+
+    Args:
+        blob_service: Service holding the blobs
+        images: UploadedImage per original; its renditions go with it
+        grace: False to delete regardless of age, for blobs the caller
+            has just created itself rather than reused
+
+    Raises:
+        BlobStorageError: If any blob couldn't be deleted, after trying
+            the rest; deleting again is safe
+    """
+    images = {image.url: image for image in images}
+    if not images:
+        return
+
+    referenced = set(
+        db.session.scalars(
+            select(PropertyMedia.image_url)
+            .where(PropertyMedia.image_url.in_(images))
+            .distinct()
+        )
+    )
+
+    blob_urls = [
+        blob_url
+        for image_url, image in images.items()
+        if image_url not in referenced
+        for blob_url in [image_url, *image.renditions.values()]
+    ]
+    if not blob_urls:
+        return
+
+    if_unmodified_since = None
+    if grace:
+        if_unmodified_since = datetime.now(timezone.utc) - timedelta(
+            seconds=current_app.config.get("IMAGE_DELETE_GRACE_SECONDS", 3600)
+        )
+    results = blob_service.delete_images(
+        blob_urls, if_unmodified_since=if_unmodified_since
+    )
+    errors = [
+        error
+        for error in results.values()
+        if error and error != RECENTLY_MODIFIED
+    ]
+    if errors:
+        raise BlobStorageError(
+            f"Failed to delete {len(errors)} images: {errors[0]}"
+        )
+
+
+def spool_upload(file, max_size=MAX_IMAGE_BYTES):
+    """
+    Copy an uploaded file into a private spool, chunk by chunk.
+
+    The spool outlives the request, so it can be handed to a worker
+    thread, and only the first SPOOL_MEMORY_LIMIT bytes are held in memory.
+
+    Args:
+        file: Werkzeug FileStorage
+        max_size: Largest upload accepted, in bytes
+
+    Returns:
+        SpooledTemporaryFile: Positioned at the start; the caller closes it
+
+    Raises:
+        ValueError: If the upload is larger than max_size
+    """
+    spool = SpooledTemporaryFile(max_size=SPOOL_MEMORY_LIMIT)
+    size = 0
+    while True:
+        chunk = file.stream.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        # Stop reading as soon as the limit is passed
+        if size > max_size:
+            spool.close()
+            raise ValueError("Image size exceeds 10MB limit")
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+class UploadBatch:
+    """Validate and upload one request's images on the shared pool.
+
+    Results are collected in submission order, so display order and
+    warnings come out exactly as they would from uploading one by one.
+    """
+
+    def __init__(self, blob_service):
+        self.blob_service = blob_service
+        self.app = current_app._get_current_object()
+        # (future, spool, warning) per file; future and spool are None
+        # for skipped files
+        self._entries = []
+        # URLs of originals this batch stored, as opposed to reused
+        self._created = set()
+
+    def submit(self, file):
+        """Spool an uploaded file and queue it for validation and upload"""
+        try:
+            spool = spool_upload(file)
+        except ValueError as e:
+            self.skip(f"Skipped image {file.filename}: {str(e)}")
+            return
+
+        future = get_upload_executor().submit(
+            self._upload, file.filename, spool
+        )
+        self._entries.append((future, spool, None))
+
+    def skip(self, warning):
+        """Record a file that won't be uploaded, keeping its position"""
+        self._entries.append((None, None, warning))
+
+    def _upload(self, filename, spool):
+        with spool, self.app.app_context():
+            # Trust the file's own header, not the client's content type
+            try:
+                image_info = inspect_image(spool)
+            except ImageValidationError as e:
+                return None, f"Skipped image {filename}: {str(e)}"
+
+            # A photo uploaded before already has its renditions; new ones
+            # are rendered by a background job once the listing is saved
+            blob_name = f"{content_digest(spool)}.{image_info.extension}"
+            renditions = self._find_renditions(blob_name)
+
+            try:
+                image_url = self.blob_service.touch_image(blob_name)
+                if image_url is None:
+                    current_app.logger.debug(f"Uploading file: {filename}")
+                    image_url = self.blob_service.upload_image(
+                        spool, image_info, blob_name=blob_name, reuse=False
+                    )
+                    self._created.add(image_url)
+                    current_app.logger.debug(
+                        f"Upload successful, URL: {image_url}"
+                    )
+            except Exception as e:
+                current_app.logger.error(f"Upload failed: {str(e)}")
+                return None, f"Failed to upload {filename}: {str(e)}"
+
+            return UploadedImage(image_url, renditions), None
+
+    def _find_renditions(self, blob_name):
+        """Return stored rendition URLs by name, or {} if any is missing
+
+        Each one found is touched, like a reused original, so a pending
+        delete doesn't remove it before the listing is saved.
+        """
+        renditions = {}
+        try:
+            for name, rendition_name in rendition_blob_names(
+                blob_name
+            ).items():
+                image_url = self.blob_service.touch_image(rendition_name)
+                if image_url is None:
+                    return {}
+                renditions[name] = image_url
+        except Exception as e:
+            current_app.logger.warning(f"Failed to look up renditions: {e}")
+            return {}
+        return renditions
+
+    def results(self):
+        """
+        Wait for every upload to finish.
+
+        Returns:
+            tuple: (uploaded, warnings), both in submission order, where
+                uploaded is a list of UploadedImage
+        """
+        uploaded = []
+        warnings = []
+        for future, _, warning in self._entries:
+            if future is not None:
+                image, warning = future.result()
+                if image:
+                    uploaded.append(image)
+            if warning:
+                warnings.append(warning)
+        return uploaded, warnings
+
+    def discard(self):
+        """Cancel queued uploads and delete blobs that were already stored.
+
+        Doesn't block: uploads still in flight delete their blob when they
+        finish. Blobs another listing refers to are kept. Blobs this batch
+        reused rather than stored only go once past
+        delete_unreferenced_images' grace period, as another listing may
+        be reusing them too; the cleanup script removes those later.
+        """
+        for future, spool, _ in self._entries:
+            if future is None:
+                continue
+            if future.cancel():
+                # Never started, so its spool is still open
+                spool.close()
+            else:
+                future.add_done_callback(self._delete_uploaded)
+
+    def _delete_uploaded(self, future):
+        if future.exception() is not None:
+            return
+        image, _ = future.result()
+        if image is None:
+            return
+
+        with self.app.app_context():
+            try:
+                delete_unreferenced_images(
+                    self.blob_service,
+                    [image],
+                    grace=image.url not in self._created,
+                )
+            except Exception as e:
+                current_app.logger.error(
+                    f"Failed to delete discarded upload: {str(e)}"
+                )
@@ -9,6 +9,14 @@ from app.models import (
     OfferTransaction,
     TransactionProgress,
 )
+from app.dashboard import (
+    DashboardBuilder,
+    get_cached_dashboard,
+    set_cached_dashboard,
+    invalidate_dashboards,
+    property_dashboard_user_ids,
+    user_dashboard_user_ids,
+)
 from app.schemas import (
     UserSchema,
     UserCreateSchema,
@@ -110,6 +118,8 @@ def update_user(user_id):
             setattr(user, key, value)
 
         db.session.commit()
+        # Their name also shows on their negotiation partners' dashboards
+        invalidate_dashboards(*user_dashboard_user_ids(user_id))
         return jsonify(
             {"message": "User updated successfully", "user": schema.dump(user)}
         )
@@ -128,292 +138,14 @@ def get_user_dashboard(user_id):
     """Get a user's dashboard data including their properties,
     offers, and saved listings"""
 
-    # Get the user and verify they exist
-    user = User.query.get_or_404(user_id)
-
-    # Build dashboard data
-    dashboard_data = {
-        "user": {
-            "id": user.id,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "email": user.email,
-            "phone_number": user.phone_number,
-        },
-        "roles": [{"role_type": role.role_type} for role in user.roles],
-        "listed_properties": [],
-        "saved_properties": [],
-        "negotiations_as_buyer": [],
-        "negotiations_as_seller": [],
-        "offered_properties": [],
-    }
-
-    # If user is a seller, get their listed properties and negotiations
-    if any(role.role_type == "seller" for role in user.roles):
-        properties = Property.query.filter_by(seller_id=user_id).all()
-
-        dashboard_data["listed_properties"] = [
-            {
-                "property_id": str(p.id),
-                "price": p.price,
-                "main_image_url": p.main_image_url,
-                "created_at": (
-                    p.created_at.isoformat() if p.created_at else None
-                ),
-                "seller_id": p.seller_id,
-                "status": p.status,
-                "address": {
-                    "house_number": p.house_number,
-                    "street": p.street,
-                    "city": p.city,
-                    "postcode": p.postcode,
-                    "latitude": p.latitude,
-                    "longitude": p.longitude,
-                },
-                "specs": {
-                    "bedrooms": p.bedrooms,
-                    "bathrooms": p.bathrooms,
-                    "property_type": p.property_type,
-                    "square_footage": (
-                        float(p.square_footage) if p.square_footage else None
-                    ),
-                },
-            }
-            for p in properties
-        ]
-
-        dashboard_data["total_properties_listed"] = len(properties)
-
-        # Get negotiations where they are the seller
-        seller_negotiations = (
-            PropertyNegotiation.query.join(Property)
-            .filter(Property.seller_id == user_id)
-            .options(
-                db.joinedload(PropertyNegotiation.transactions),
-                db.joinedload(PropertyNegotiation.buyer),
-            )
-            .all()
-        )
-
-        # For seller negotiations, also include buyer information
-        dashboard_data["negotiations_as_seller"] = [
-            {
-                "negotiation_id": str(neg.id),
-                "property_id": str(neg.property_id),
-                "buyer_id": str(neg.buyer_id),
-                "buyer_name": f"{neg.buyer.first_name} {neg.buyer.last_name}",
-                "status": neg.status,
-                "created_at": (
-                    neg.created_at.isoformat() if neg.created_at else None
-                ),
-                "last_offer_by": str(neg.last_offer_by),
-                "current_offer": (
-                    neg.transactions[-1].offer_amount
-                    if neg.transactions
-                    else None
-                ),
-                "last_updated": (
-                    neg.updated_at.isoformat() if neg.updated_at else None
-                ),
-                # Add buyer information fields
-                "buyer_status": neg.buyer_status,
-                "preferred_move_in_date": neg.preferred_move_in_date,
-                "payment_method": neg.payment_method,
-                "mortgage_status": neg.mortgage_status,
-                "additional_notes": neg.additional_notes,
-                "transaction_history": (
-                    [
-                        {
-                            "offer_amount": trans.offer_amount,
-                            "made_by": str(trans.made_by),
-                            "created_at": (
-                                trans.created_at.isoformat()
-                                if trans.created_at
-                                else None
-                            ),
-                        }
-                        for trans in sorted(
-                            neg.transactions, key=lambda x: x.created_at
-                        )
-                    ]
-                    if neg.transactions
-                    else []
-                ),
-            }
-            for neg in seller_negotiations
-        ]
-
-    # If user is a buyer, get their saved properties and negotiations
-    if any(role.role_type == "buyer" for role in user.roles):
-        saved = SavedProperty.query.filter_by(user_id=user_id).all()
-        saved_properties = []
-
-        for save in saved:
-            property = Property.query.filter_by(id=save.property_id).first()
-            if property:
-                saved_properties.append(
-                    {
-                        "property_id": str(property.id),
-                        "price": property.price,
-                        "main_image_url": property.main_image_url,
-                        "created_at": (
-                            property.created_at.isoformat()
-                            if property.created_at
-                            else None
-                        ),
-                        "seller_id": property.seller_id,
-                        "status": property.status,
-                        "address": {
-                            "house_number": property.house_number,
-                            "street": property.street,
-                            "city": property.city,
-                            "postcode": property.postcode,
-                            "latitude": property.latitude,
-                            "longitude": property.longitude,
-                        },
-                        "specs": {
-                            "bedrooms": property.bedrooms,
-                            "bathrooms": property.bathrooms,
-                            "property_type": property.property_type,
-                            "square_footage": (
-                                float(property.square_footage)
-                                if property.square_footage
-                                else None
-                            ),
-                        },
-                        "notes": save.notes,
-                        "saved_at": (
-                            save.created_at.isoformat()
-                            if save.created_at
-                            else None
-                        ),
-                    }
-                )
-
-        dashboard_data["saved_properties"] = saved_properties
-        dashboard_data["total_saved_properties"] = len(saved_properties)
-
-        # Get negotiations where they are the buyer
-        buyer_negotiations = (
-            PropertyNegotiation.query.filter_by(buyer_id=user_id)
-            .options(
-                db.joinedload(PropertyNegotiation.transactions),
-                db.joinedload(PropertyNegotiation.property).joinedload(
-                    Property.seller
-                ),
-            )
-            .all()
+    dashboard_data = get_cached_dashboard(user_id)
+    if dashboard_data is None:
+        # Get the user and verify they exist
+        user = User.query.options(db.selectinload(User.roles)).get_or_404(
+            user_id
         )
-
-        dashboard_data["negotiations_as_buyer"] = [
-            {
-                "negotiation_id": str(neg.id),
-                "property_id": str(neg.property_id),
-                "seller_id": str(neg.property.seller_id),
-                "seller_name": (
-                    f"{neg.property.seller.first_name} "
-                    f"{neg.property.seller.last_name}"
-                    if neg.property.seller
-                    else None
-                ),
-                "status": neg.status,
-                "created_at": (
-                    neg.created_at.isoformat() if neg.created_at else None
-                ),
-                "last_offer_by": str(neg.last_offer_by),
-                "current_offer": (
-                    neg.transactions[-1].offer_amount
-                    if neg.transactions
-                    else None
-                ),
-                "last_updated": (
-                    neg.updated_at.isoformat() if neg.updated_at else None
-                ),
-                # Add buyer information fields
-                "buyer_status": neg.buyer_status,
-                "preferred_move_in_date": neg.preferred_move_in_date,
-                "payment_method": neg.payment_method,
-                "mortgage_status": neg.mortgage_status,
-                "additional_notes": neg.additional_notes,
-                "transaction_history": (
-                    [
-                        {
-                            "offer_amount": trans.offer_amount,
-                            "made_by": str(trans.made_by),
-                            "created_at": (
-                                trans.created_at.isoformat()
-                                if trans.created_at
-                                else None
-                            ),
-                        }
-                        for trans in sorted(
-                            neg.transactions, key=lambda x: x.created_at
-                        )
-                    ]
-                    if neg.transactions
-                    else []
-                ),
-            }
-            for neg in buyer_negotiations
-        ]
-
-        # Add offered properties
-        offered_properties = []
-        for neg in buyer_negotiations:
-            property = neg.property
-            if property:
-                latest_transaction = (
-                    sorted(neg.transactions, key=lambda x: x.created_at)[-1]
-                    if neg.transactions
-                    else None
-                )
-                offered_properties.append(
-                    {
-                        "property_id": str(property.id),
-                        "price": property.price,
-                        "main_image_url": property.main_image_url,
-                        "created_at": (
-                            property.created_at.isoformat()
-                            if property.created_at
-                            else None
-                        ),
-                        "seller_id": property.seller_id,
-                        "status": property.status,
-                        "address": {
-                            "house_number": property.house_number,
-                            "street": property.street,
-                            "city": property.city,
-                            "postcode": property.postcode,
-                            "latitude": property.latitude,
-                            "longitude": property.longitude,
-                        },
-                        "specs": {
-                            "bedrooms": property.bedrooms,
-                            "bathrooms": property.bathrooms,
-                            "property_type": property.property_type,
-                            "square_footage": (
-                                float(property.square_footage)
-                                if property.square_footage
-                                else None
-                            ),
-                        },
-                        "latest_offer": {
-                            "amount": (
-                                latest_transaction.offer_amount
-                                if latest_transaction
-                                else None
-                            ),
-                            "status": neg.status,
-                            "last_updated": (
-                                neg.updated_at.isoformat()
-                                if neg.updated_at
-                                else None
-                            ),
-                        },
-                    }
-                )
-
-        dashboard_data["offered_properties"] = offered_properties
+        dashboard_data = DashboardBuilder(user).build()
+        set_cached_dashboard(user_id, dashboard_data)
 
     return jsonify(dashboard_data)
 
@@ -463,6 +195,7 @@ def save_property(user_id):
 
         db.session.add(saved_property)
         db.session.commit()
+        invalidate_dashboards(user_id)
 
         return (
             jsonify(
@@ -514,6 +247,7 @@ def remove_saved_property(user_id, property_id):
         # Remove the saved property
         db.session.delete(saved_property)
         db.session.commit()
+        invalidate_dashboards(user_id)
 
         return jsonify(
             {
@@ -566,6 +300,7 @@ def update_saved_property_notes(user_id, property_id):
         # Update the notes
         saved_property.notes = data["notes"]
         db.session.commit()
+        invalidate_dashboards(user_id)
 
         return jsonify(
             {
@@ -739,6 +474,7 @@ def create_offer(user_id):
             db.session.add(transaction)
 
         db.session.commit()
+        invalidate_dashboards(negotiation.buyer_id, property.seller_id)
 
         return (
             jsonify(
@@ -922,6 +658,9 @@ def update_offer_status(user_id, negotiation_id):
                 property_item.status = "for_sale"
 
             db.session.commit()
+            invalidate_dashboards(
+                *property_dashboard_user_ids(property_item.id)
+            )
 
             time_remaining = cooling_off_period - time_since_acceptance
 
@@ -1047,6 +786,9 @@ def update_offer_status(user_id, negotiation_id):
 
         db.session.commit()
 
+        # Property status and sibling negotiations may have changed too
+        invalidate_dashboards(*property_dashboard_user_ids(property_item.id))
+
         # Get the current active offer for the response
         current_offer = (
             OfferTransaction.query.filter_by(negotiation_id=negotiation_id)
@@ -6,6 +6,35 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev')
 
+    # Cache - SimpleCache is per-process; set CACHE_TYPE to RedisCache or
+    # app.cache_backends.TwoTierCache (with CACHE_REDIS_URL) to share the
+    # cache between gunicorn workers
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'SimpleCache')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+    CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_KEY_PREFIX = 'maison:'
+    # Size and timeout of the per-process tier in TwoTierCache
+    CACHE_LOCAL_SIZE = int(os.getenv('CACHE_LOCAL_SIZE', '256'))
+    CACHE_LOCAL_TIMEOUT = int(os.getenv('CACHE_LOCAL_TIMEOUT', '30'))
+
+    # Image uploads share one thread pool per worker process; this bounds
+    # how many blob uploads run at once across all requests
+    UPLOAD_MAX_WORKERS = int(os.getenv('UPLOAD_MAX_WORKERS', '8'))
+    # Keep-alive connections held open to blob storage per worker process
+    BLOB_CONNECTION_POOL_SIZE = int(
+        os.getenv('BLOB_CONNECTION_POOL_SIZE', '16')
+    )
+    # Unreferenced blobs written more recently than this aren't deleted:
+    # another listing may have just reused them and not be saved yet
+    IMAGE_DELETE_GRACE_SECONDS = int(
+        os.getenv('IMAGE_DELETE_GRACE_SECONDS', '3600')
+    )
+
+    # "nominatim", or "local" for the offline stand-in in app.geocoding
+    GEOCODER = os.getenv('GEOCODER', 'nominatim')
+    # Seconds between Nominatim requests per process; its policy is 1/s
+    GEOCODE_MIN_INTERVAL = float(os.getenv('GEOCODE_MIN_INTERVAL', '1.0'))
+
 class ProductionConfig(Config):
     """Production config."""
     FLASK_ENV = 'production'
@@ -25,4 +54,6 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///:memory:'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    WTF_CSRF_ENABLED = False 
\ No newline at end of file
+    WTF_CSRF_ENABLED = False
+    CACHE_TYPE = 'SimpleCache'
+    GEOCODER = 'local'
@@ -0,0 +1,94 @@
+"""Add foreign key indexes
+
+Revision ID: 1b37cab0ad53
+Revises: be921ebcb03f
+Create Date: 2026-10-17 10:03:17.554120
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '1b37cab0ad53'
+down_revision = 'be921ebcb03f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_roles_user_id', 'user_roles', ['user_id'])
+    op.create_index(
+        'ix_property_details_property_id', 'property_details', ['property_id']
+    )
+    op.create_index(
+        'ix_property_features_property_id',
+        'property_features',
+        ['property_id'],
+    )
+    op.create_index(
+        'ix_property_media_property_id_display_order',
+        'property_media',
+        ['property_id', 'display_order'],
+    )
+    op.create_index(
+        'ix_saved_properties_user_id_created_at',
+        'saved_properties',
+        ['user_id', 'created_at'],
+    )
+    op.create_index(
+        'ix_property_negotiations_buyer_id',
+        'property_negotiations',
+        ['buyer_id'],
+    )
+    op.create_index(
+        'ix_property_negotiations_property_id',
+        'property_negotiations',
+        ['property_id'],
+    )
+    op.create_index(
+        'ix_offer_transactions_negotiation_id_created_at',
+        'offer_transactions',
+        ['negotiation_id', 'created_at'],
+    )
+    # Fails if a negotiation already has more than one progress row; those
+    # need merging by hand before upgrading
+    op.create_index(
+        'ix_transaction_progress_negotiation_id',
+        'transaction_progress',
+        ['negotiation_id'],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        'ix_transaction_progress_negotiation_id',
+        table_name='transaction_progress',
+    )
+    op.drop_index(
+        'ix_offer_transactions_negotiation_id_created_at',
+        table_name='offer_transactions',
+    )
+    op.drop_index(
+        'ix_property_negotiations_property_id',
+        table_name='property_negotiations',
+    )
+    op.drop_index(
+        'ix_property_negotiations_buyer_id',
+        table_name='property_negotiations',
+    )
+    op.drop_index(
+        'ix_saved_properties_user_id_created_at',
+        table_name='saved_properties',
+    )
+    op.drop_index(
+        'ix_property_media_property_id_display_order',
+        table_name='property_media',
+    )
+    op.drop_index(
+        'ix_property_features_property_id', table_name='property_features'
+    )
+    op.drop_index(
+        'ix_property_details_property_id', table_name='property_details'
+    )
+    op.drop_index('ix_user_roles_user_id', table_name='user_roles')
@@ -0,0 +1,32 @@
+"""Add geocode cache
+
+Revision ID: 7c2d9e14b8f3
+Revises: 3e9b51f0a6c4
+Create Date: 2026-10-17 18:12:47.204915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2d9e14b8f3'
+down_revision = '3e9b51f0a6c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'geocode_cache',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('latitude', sa.Float(), nullable=True),
+        sa.Column('longitude', sa.Float(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('key'),
+    )
+
+
+def downgrade():
+    op.drop_table('geocode_cache')
@@ -0,0 +1,38 @@
+"""Add image rendition URLs
+
+Revision ID: 85c12f136716
+Revises: 1b37cab0ad53
+Create Date: 2026-10-17 14:22:41.318904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '85c12f136716'
+down_revision = '1b37cab0ad53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column('main_image_card_url', sa.String(length=500), nullable=True)
+        )
+
+    with op.batch_alter_table('property_media', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('thumbnail_url', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('card_url', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('full_url', sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('property_media', schema=None) as batch_op:
+        batch_op.drop_column('full_url')
+        batch_op.drop_column('card_url')
+        batch_op.drop_column('thumbnail_url')
+
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.drop_column('main_image_card_url')
@@ -0,0 +1,66 @@
+"""Add property geohash
+
+Revision ID: a81f3c6d2e57
+Revises: 7c2d9e14b8f3
+Create Date: 2026-10-17 19:03:26.551870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.geo import encode_geohash
+
+
+# revision identifiers, used by Alembic.
+revision = 'a81f3c6d2e57'
+down_revision = '7c2d9e14b8f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'properties', sa.Column('geohash', sa.String(length=12), nullable=True)
+    )
+
+    # Fill in the geohash of every property that already has coordinates
+    connection = op.get_bind()
+    properties = sa.table(
+        'properties',
+        sa.column('id'),
+        sa.column('latitude', sa.Float),
+        sa.column('longitude', sa.Float),
+        sa.column('geohash', sa.String),
+    )
+    rows = connection.execute(
+        sa.select(properties.c.id, properties.c.latitude, properties.c.longitude)
+        .where(properties.c.latitude.isnot(None))
+        .where(properties.c.longitude.isnot(None))
+    ).all()
+    if rows:
+        connection.execute(
+            properties.update()
+            .where(properties.c.id == sa.bindparam('property_id'))
+            .values(geohash=sa.bindparam('property_geohash')),
+            [
+                {
+                    'property_id': row.id,
+                    'property_geohash': encode_geohash(
+                        row.latitude, row.longitude
+                    ),
+                }
+                for row in rows
+            ],
+        )
+
+    op.create_index(
+        'ix_properties_geohash',
+        'properties',
+        ['geohash'],
+        postgresql_ops={'geohash': 'varchar_pattern_ops'},
+    )
+
+
+def downgrade():
+    op.drop_index('ix_properties_geohash', table_name='properties')
+    op.drop_column('properties', 'geohash')
@@ -0,0 +1,61 @@
+"""Add property search indexes
+
+Revision ID: be921ebcb03f
+Revises: 4262a4e673d7
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'be921ebcb03f'
+down_revision = '4262a4e673d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Every search index ends in (price DESC, id DESC) to match the keyset
+    # order of GET /api/properties
+    op.create_index(
+        'ix_properties_price_id',
+        'properties',
+        [sa.text('price DESC'), sa.text('id DESC')],
+    )
+    op.create_index(
+        'ix_properties_for_sale_price_id',
+        'properties',
+        [sa.text('price DESC'), sa.text('id DESC')],
+        postgresql_where=sa.text("status = 'for_sale'"),
+    )
+    op.create_index(
+        'ix_properties_status_price_id',
+        'properties',
+        ['status', sa.text('price DESC'), sa.text('id DESC')],
+    )
+    op.create_index(
+        'ix_properties_bedrooms_price_id',
+        'properties',
+        ['bedrooms', sa.text('price DESC'), sa.text('id DESC')],
+    )
+    op.create_index(
+        'ix_properties_property_type_price_id',
+        'properties',
+        ['property_type', sa.text('price DESC'), sa.text('id DESC')],
+    )
+    op.create_index(
+        'ix_properties_seller_id', 'properties', ['seller_id']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_properties_seller_id', table_name='properties')
+    op.drop_index(
+        'ix_properties_property_type_price_id', table_name='properties'
+    )
+    op.drop_index('ix_properties_bedrooms_price_id', table_name='properties')
+    op.drop_index('ix_properties_status_price_id', table_name='properties')
+    op.drop_index('ix_properties_for_sale_price_id', table_name='properties')
+    op.drop_index('ix_properties_price_id', table_name='properties')
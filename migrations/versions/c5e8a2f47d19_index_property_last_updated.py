@@ -0,0 +1,25 @@
+"""Index property last_updated
+
+Revision ID: c5e8a2f47d19
+Revises: a81f3c6d2e57
+Create Date: 2026-10-17 20:26:53.118402
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e8a2f47d19'
+down_revision = 'a81f3c6d2e57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_properties_last_updated', 'properties', ['last_updated']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_properties_last_updated', table_name='properties')
@@ -0,0 +1,25 @@
+"""Index property media image URL
+
+Revision ID: d4a7e2c91b05
+Revises: 85c12f136716
+Create Date: 2026-10-17 15:08:52.207361
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a7e2c91b05'
+down_revision = '85c12f136716'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_property_media_image_url', 'property_media', ['image_url']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_property_media_image_url', table_name='property_media')
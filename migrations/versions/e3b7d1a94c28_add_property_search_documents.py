@@ -0,0 +1,92 @@
+"""Add property search documents
+
+Revision ID: e3b7d1a94c28
+Revises: c5e8a2f47d19
+Create Date: 2026-10-17 21:14:08.402977
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b7d1a94c28'
+down_revision = 'c5e8a2f47d19'
+branch_labels = None
+depends_on = None
+
+
+def pg_trgm_available():
+    return op.get_bind().execute(
+        sa.text(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+    ).first() is not None
+
+
+def upgrade():
+    # Generated columns are filled in for existing rows as they're added
+    op.add_column(
+        'properties',
+        sa.Column(
+            'search_document',
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('english', coalesce(street, '') "
+                "|| ' ' || coalesce(city, '') || ' ' || "
+                "coalesce(postcode, '')), 'A')",
+                persisted=True,
+            ),
+        ),
+    )
+    op.add_column(
+        'property_details',
+        sa.Column(
+            'search_document',
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('english', coalesce(description, "
+                "'')), 'B')",
+                persisted=True,
+            ),
+        ),
+    )
+    op.create_index(
+        'ix_properties_search_document',
+        'properties',
+        ['search_document'],
+        postgresql_using='gin',
+    )
+    op.create_index(
+        'ix_property_details_search_document',
+        'property_details',
+        ['search_document'],
+        postgresql_using='gin',
+    )
+
+    # Partial matches still work without these, by scanning the table
+    if pg_trgm_available():
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index(
+            'ix_properties_street_trgm',
+            'properties',
+            ['street'],
+            postgresql_using='gin',
+            postgresql_ops={'street': 'gin_trgm_ops'},
+        )
+        op.execute(
+            "CREATE INDEX ix_properties_postcode_trgm ON properties "
+            "USING gin (replace(postcode, ' ', '') gin_trgm_ops)"
+        )
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_properties_postcode_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_properties_street_trgm')
+    op.drop_index(
+        'ix_property_details_search_document', table_name='property_details'
+    )
+    op.drop_index('ix_properties_search_document', table_name='properties')
+    op.drop_column('property_details', 'search_document')
+    op.drop_column('properties', 'search_document')
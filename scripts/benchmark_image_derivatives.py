@@ -0,0 +1,68 @@
+"""
+
+Benchmark rendition rendering over the files in Image Examples/.
+
+For each photo, prints how long rendering takes and how many bytes each
+rendition weighs against the original.
+
+python scripts/benchmark_image_derivatives.py
+
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.image_derivatives import RENDITIONS, render_derivatives
+
+EXAMPLES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "Image Examples",
+)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp")
+
+
+def find_images():
+    for root, _, files in os.walk(EXAMPLES_DIR):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def benchmark():
+    images = []
+    for path in find_images():
+        with open(path, "rb") as f:
+            images.append((os.path.relpath(path, EXAMPLES_DIR), f.read()))
+
+    names = [name for name, _ in RENDITIONS]
+    print(
+        f"{'file':<40}{'original':>10}"
+        + "".join(f"{name:>11}" for name in names)
+        + f"{'ms':>9}"
+    )
+    serial_total = 0.0
+    for name, data in images:
+        start = time.perf_counter()
+        renditions = render_derivatives(data)
+        elapsed = (time.perf_counter() - start) * 1000
+        serial_total += elapsed
+
+        if len(name) > 38:
+            name = name[:35] + "..."
+        print(
+            f"{name:<40}{len(data) // 1024:>8}KB"
+            + "".join(
+                f"{len(renditions[rendition][0]) // 1024:>9}KB"
+                for rendition in names
+            )
+            + f"{elapsed:>9.1f}"
+        )
+
+    print(f"\n{len(images)} images: {serial_total:.0f}ms")
+
+
+if __name__ == "__main__":
+    benchmark()
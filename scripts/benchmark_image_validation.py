@@ -0,0 +1,88 @@
+"""
+
+Micro-benchmark image validation over the files in Image Examples/.
+
+Compares the previous approach - read the whole upload into bytes, wrap
+it in BytesIO and open it with Pillow - against the header-only
+inspect_image reading straight from the file.
+
+python scripts/benchmark_image_validation.py
+python scripts/benchmark_image_validation.py --iterations 2000
+
+"""
+
+import os
+import sys
+import time
+from io import BytesIO
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from app.image_validation import inspect_image
+
+EXAMPLES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "Image Examples",
+)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp")
+
+
+def pillow_validate(path):
+    """The previous path: buffer the whole file, then let Pillow parse it"""
+    with open(path, "rb") as f:
+        image_data = f.read()
+    img = Image.open(BytesIO(image_data))
+    return img.size
+
+
+def header_validate(path):
+    with open(path, "rb") as f:
+        info = inspect_image(f)
+    return info.width, info.height
+
+
+def time_per_call(func, path, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(path)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def find_images():
+    for root, _, files in os.walk(EXAMPLES_DIR):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def benchmark(iterations):
+    print(f"{'file':<48}{'size':>10}{'pillow us':>12}{'header us':>12}")
+    totals = [0.0, 0.0]
+    for path in find_images():
+        assert pillow_validate(path) == header_validate(path), path
+        pillow_us = time_per_call(pillow_validate, path, iterations)
+        header_us = time_per_call(header_validate, path, iterations)
+        totals[0] += pillow_us
+        totals[1] += header_us
+
+        name = os.path.relpath(path, EXAMPLES_DIR)
+        if len(name) > 46:
+            name = name[:43] + "..."
+        print(
+            f"{name:<48}{os.path.getsize(path) // 1024:>8}KB"
+            f"{pillow_us:>12.1f}{header_us:>12.1f}"
+        )
+
+    print(f"{'total':<58}{totals[0]:>12.1f}{totals[1]:>12.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark image validation")
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    benchmark(args.iterations)
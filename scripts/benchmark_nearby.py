@@ -0,0 +1,117 @@
+"""
+
+Benchmark nearest-neighbour lookups: in-process spatial index vs SQL.
+
+Fills the TEST_DATABASE_URL database with properties scattered over Great
+Britain, then times the k nearest properties to random points through
+the GridIndex used by /api/properties/<id>/nearby, and through the
+geohash-bounded distance query used by GET /api/properties. The tables
+are dropped afterwards, so never point it at a database you need.
+
+TEST_DATABASE_URL=postgresql://... python scripts/benchmark_nearby.py
+
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+
+from app import create_app, db
+from app.geo import encode_geohash, nearest_properties_page, parse_geo_search
+from app.models import Property, User
+from app.serializers import select_property_summaries
+from app.spatial_index import PropertySpatialIndex
+
+# Roughly the bounds of Great Britain
+MIN_LAT, MAX_LAT = 49.9, 58.7
+MIN_LNG, MAX_LNG = -8.0, 1.8
+
+
+def seed(count, rng):
+    db.session.add(
+        User(id="benchmark", first_name="B", last_name="M", email="b@m")
+    )
+    db.session.commit()
+    for start in range(0, count, 10000):
+        rows = []
+        for _ in range(min(10000, count - start)):
+            latitude = rng.uniform(MIN_LAT, MAX_LAT)
+            longitude = rng.uniform(MIN_LNG, MAX_LNG)
+            rows.append(
+                {
+                    "price": rng.randrange(100000, 1000000),
+                    "seller_id": "benchmark",
+                    "status": "for_sale",
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "geohash": encode_geohash(latitude, longitude),
+                }
+            )
+        db.session.execute(insert(Property), rows)
+        db.session.commit()
+
+
+def benchmark(count, queries, k, radius_km):
+    rng = random.Random(1)
+    app = create_app("testing")
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        try:
+            seed(count, rng)
+
+            start = time.perf_counter()
+            index = PropertySpatialIndex()
+            index.refresh(force=True)
+            print(
+                f"{count} properties, index built in "
+                f"{time.perf_counter() - start:.2f}s"
+            )
+
+            points = [
+                (rng.uniform(MIN_LAT, MAX_LAT), rng.uniform(MIN_LNG, MAX_LNG))
+                for _ in range(queries)
+            ]
+
+            start = time.perf_counter()
+            for latitude, longitude in points:
+                index.grid.nearest(latitude, longitude, k, max_km=radius_km)
+            index_ms = (time.perf_counter() - start) * 1000 / queries
+
+            start = time.perf_counter()
+            for latitude, longitude in points:
+                search = parse_geo_search(
+                    {
+                        "lat": str(latitude),
+                        "lng": str(longitude),
+                        "radius_km": str(radius_km),
+                    }
+                )
+                nearest_properties_page(
+                    select_property_summaries(), search, None, k
+                )
+            sql_ms = (time.perf_counter() - start) * 1000 / queries
+
+            print(f"{k} nearest within {radius_km}km, {queries} queries:")
+            print(f"  spatial index  {index_ms:8.3f}ms per query")
+            print(f"  SQL            {sql_ms:8.3f}ms per query")
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--radius-km", type=float, default=10.0)
+    args = parser.parse_args()
+
+    benchmark(args.count, args.queries, args.k, args.radius_km)
@@ -0,0 +1,148 @@
+"""
+
+Benchmark loading a property for the detail view: lazy relationship loads
+against the eager detail loader.
+
+Creates a throwaway property with details, features and media, reads it
+both ways with an empty session each time, prints query counts and
+latency, then deletes the property again.
+
+python scripts/benchmark_property_detail.py
+python scripts/benchmark_property_detail.py --media 30 --iterations 500
+
+Runs against the testing database (TEST_DATABASE_URL) unless --config says
+otherwise.
+
+"""
+
+import os
+import sys
+import statistics
+import time
+from uuid import uuid4
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import (
+    Property,
+    PropertyDetail,
+    PropertyFeatures,
+    PropertyMedia,
+    User,
+)
+from app.property_detail import (
+    load_property_detail,
+    property_detail_from_model,
+)
+
+
+def lazy_load(property_id):
+    """The previous path: get the row, let each relation lazy load"""
+    return property_detail_from_model(db.session.get(Property, property_id))
+
+
+def eager_load(property_id):
+    return property_detail_from_model(load_property_detail(property_id))
+
+
+def create_sample_property(media_count):
+    seller = User(
+        id=f"benchmark-{uuid4()}",
+        email=f"benchmark-{uuid4()}@example.com",
+        first_name="Benchmark",
+        last_name="Seller",
+    )
+    property_item = Property(
+        id=uuid4(),
+        price=350000,
+        seller=seller,
+        house_number="1",
+        street="Benchmark Street",
+        city="London",
+        postcode="SW1 1AA",
+        bedrooms=3,
+        bathrooms=2,
+        reception_rooms=1,
+        square_footage=1200.0,
+        property_type="semi-detached",
+        epc_rating="B",
+    )
+    property_item.details = PropertyDetail(
+        description="Benchmark", construction_year=1930, heating_type="gas"
+    )
+    property_item.features = PropertyFeatures(has_garden=True)
+    property_item.media = [
+        PropertyMedia(
+            image_url=f"https://example.com/{idx}.jpg",
+            image_type="floorplan" if idx == media_count - 1 else "interior",
+            display_order=idx,
+        )
+        for idx in range(media_count)
+    ]
+    db.session.add(property_item)
+    db.session.commit()
+    return property_item.id, seller.id
+
+
+def run(loader, property_id, iterations):
+    """Return (queries per call, list of per-call latencies in ms)"""
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    timings = []
+    event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        for _ in range(iterations):
+            db.session.expunge_all()
+            start = time.perf_counter()
+            loader(property_id)
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+    return len(statements) / iterations, timings
+
+
+def benchmark(config_name, media_count, iterations):
+    app = create_app(config_name)
+
+    with app.app_context():
+        db.create_all()
+        property_id, seller_id = create_sample_property(media_count)
+        try:
+            # Warm up connections and statement caches before timing
+            run(lazy_load, property_id, 10)
+            run(eager_load, property_id, 10)
+
+            print(f"{media_count} media rows, {iterations} iterations\n")
+            print(f"{'path':<8}{'queries':>10}{'median ms':>12}{'p95 ms':>10}")
+            for name, loader in (("lazy", lazy_load), ("eager", eager_load)):
+                queries, timings = run(loader, property_id, iterations)
+                p95 = statistics.quantiles(timings, n=20)[-1]
+                print(
+                    f"{name:<8}{queries:>10.0f}"
+                    f"{statistics.median(timings):>12.3f}{p95:>10.3f}"
+                )
+        finally:
+            db.session.rollback()
+            db.session.delete(db.session.get(Property, property_id))
+            db.session.delete(db.session.get(User, seller_id))
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark property detail loading"
+    )
+    parser.add_argument("--config", default="testing")
+    parser.add_argument("--media", type=int, default=15)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    benchmark(args.config, args.media, args.iterations)
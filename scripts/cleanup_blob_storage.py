@@ -1,108 +1,258 @@
-'''
+"""
 
 This script is used to cleanup orphaned images in blob storage.
 
-It will find all images in blob storage that don't exist in the database and delete them.
+It will find all images in blob storage that don't exist in the database and
+delete them.
+
+Blobs are listed a page at a time and merged against the database's image
+names, streamed in the same order, so memory stays flat however many blobs
+there are. Blobs changed in the last --min-age-hours are left alone: their
+listing may not be saved yet. Reusing a blob touches it, and deletes are
+conditional on the blob being unchanged since the cutoff, so one reused
+after it was listed is kept too.
 
 *** DRY RUN ***
 
-python scripts/cleanup_blob_storage.py 
+python scripts/cleanup_blob_storage.py
 
 *** ACTUALLY DELETES THE IMAGES ***
 
 python scripts/cleanup_blob_storage.py --execute
 
-'''
-
+A run with --execute records its progress in a checkpoint file after every
+page. Running it again resumes where it stopped; --restart starts over.
 
+"""
 
+import json
 import os
 import sys
+from datetime import datetime, timedelta, timezone
+
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy import func, select, union
+
 from app import create_app, db
 from app.models import Property, PropertyMedia
-from app.blob_storage import BlobStorageService
-from urllib.parse import urlparse
-
-def get_all_property_image_urls():
-    """Get all image URLs from the database"""
-    # Get main image URLs
-    main_images = db.session.query(Property.main_image_url).filter(
-        Property.main_image_url.isnot(None)
-    ).all()
-    
-    # Get additional image URLs
-    additional_images = db.session.query(PropertyMedia.image_url).filter(
-        PropertyMedia.image_url.isnot(None)
-    ).all()
-    
-    # Combine and flatten the lists
-    all_urls = [url[0] for url in main_images + additional_images if url[0]]
-    
-    # Extract just the blob names from the URLs
-    blob_names = set()
-    for url in all_urls:
-        try:
-            # Parse the URL and get the path
-            path = urlparse(url).path
-            # The blob name is the last part of the path
-            blob_name = path.split('/')[-1]
-            blob_names.add(blob_name)
-        except Exception as e:
-            print(f"Error parsing URL {url}: {e}")
+from app.blob_storage import get_blob_service, RECENTLY_MODIFIED
+
+DEFAULT_CHECKPOINT = ".cleanup_blob_storage.checkpoint.json"
+
+# Every column holding a blob URL: originals and their renditions
+IMAGE_URL_COLUMNS = [
+    Property.main_image_url,
+    PropertyMedia.image_url,
+    PropertyMedia.thumbnail_url,
+    PropertyMedia.card_url,
+    PropertyMedia.full_url,
+]
+
+
+def referenced_blob_names(after=""):
+    """
+    Stream the blob names the database refers to, in listing order.
+
+    Names are compared byte by byte (the "C" collation), which is the order
+    blob storage lists them in, and streamed through a server-side cursor.
+
+    Args:
+        after: Only names sorting after this one
+
+    Yields:
+        str: Distinct blob names, ascending
+    """
+    names = union(
+        *(
+            select(
+                func.regexp_replace(column, "^.*/", "").label("name")
+            ).where(column.isnot(None))
+            for column in IMAGE_URL_COLUMNS
+        )
+    ).subquery()
+    name = names.c.name.collate("C")
+    query = select(names.c.name).where(name > after).order_by(name)
+    yield from db.session.execute(
+        query, execution_options={"yield_per": 10000}
+    ).scalars()
+
+
+class ReferenceStream:
+    """The reference name stream, with the next name held in current"""
+
+    def __init__(self, names):
+        self.names = iter(names)
+        self.advance()
+
+    def advance(self):
+        self.current = next(self.names, None)
+
+
+def find_orphans(blobs, references, cutoff):
+    """
+    Merge one page of blobs against the sorted reference stream.
+
+    Args:
+        blobs: (name, last_modified) pairs, ascending by name
+        references: ReferenceStream over referenced_blob_names, advanced
+            past every name this page covers
+        cutoff: Blobs modified after this are never orphans
+
+    Returns:
+        list: Names of the page's orphaned blobs
+    """
+    orphans = []
+    for name, last_modified in blobs:
+        while references.current is not None and references.current < name:
+            references.advance()
+        if references.current == name or last_modified > cutoff:
             continue
-    
-    return blob_names
+        orphans.append(name)
+    return orphans
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {"continuation_token": None, "last_blob": ""}
+    with open(path) as f:
+        return json.load(f)
+
 
-def cleanup_orphaned_images(dry_run=True):
+def save_checkpoint(path, continuation_token, last_blob):
+    # Write then rename, so an interrupted save keeps the old checkpoint
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(
+            {"continuation_token": continuation_token, "last_blob": last_blob},
+            f,
+        )
+    os.replace(f"{path}.tmp", path)
+
+
+def cleanup_orphaned_images(
+    dry_run=True,
+    checkpoint_path=DEFAULT_CHECKPOINT,
+    restart=False,
+    page_size=5000,
+    min_age_hours=24,
+):
     """Delete blob storage images that don't exist in the database"""
-    app = create_app('development')  # or whatever config you want to use
-    
+    app = create_app("development")  # or whatever config you want to use
+
     with app.app_context():
         try:
-            # Get all image URLs from database
-            db_blob_names = get_all_property_image_urls()
-            print(f"Found {len(db_blob_names)} images in database")
-            
-            # Get all blobs from storage
-            blob_service = BlobStorageService()
-            all_blobs = blob_service.list_all_blobs()
-            print(f"Found {len(all_blobs)} images in blob storage")
-            
-            # Find orphaned blobs
-            orphaned_blobs = [
-                blob for blob in all_blobs 
-                if blob not in db_blob_names
-            ]
-            
-            print(f"Found {len(orphaned_blobs)} orphaned images")
-            
+            checkpoint = {"continuation_token": None, "last_blob": ""}
+            if not dry_run and not restart:
+                checkpoint = load_checkpoint(checkpoint_path)
+                if checkpoint["last_blob"]:
+                    print(f"Resuming after {checkpoint['last_blob']}")
+
+            blob_service = get_blob_service()
+            references = ReferenceStream(
+                referenced_blob_names(checkpoint["last_blob"])
+            )
+            cutoff = datetime.now(timezone.utc) - timedelta(
+                hours=min_age_hours
+            )
+
             if dry_run:
-                print("\nDRY RUN - No images will be deleted")
+                print("DRY RUN - No images will be deleted")
                 print("\nOrphaned images that would be deleted:")
-                for blob in orphaned_blobs:
-                    print(f"- {blob}")
-            else:
-                print("\nDeleting orphaned images...")
-                for blob in orphaned_blobs:
-                    try:
-                        blob_service.delete_image(blob)
-                        print(f"Deleted {blob}")
-                    except Exception as e:
-                        print(f"Error deleting {blob}: {e}")
-                
-                print(f"\nSuccessfully cleaned up {len(orphaned_blobs)} orphaned images")
-            
+
+            scanned = orphaned = deleted = kept = failed = 0
+            for blobs, continuation_token in blob_service.list_blob_pages(
+                checkpoint["continuation_token"], page_size
+            ):
+                if not blobs:
+                    continue
+                orphans = find_orphans(blobs, references, cutoff)
+                scanned += len(blobs)
+                orphaned += len(orphans)
+
+                if dry_run:
+                    for blob in orphans:
+                        print(f"- {blob}")
+                elif orphans:
+                    # Deleted in batches of up to 256 per request
+                    results = blob_service.delete_images(
+                        orphans, if_unmodified_since=cutoff
+                    )
+                    for blob, error in results.items():
+                        if error == RECENTLY_MODIFIED:
+                            kept += 1
+                        elif error:
+                            failed += 1
+                            print(f"Error deleting {blob}: {error}")
+                        else:
+                            deleted += 1
+
+                if not dry_run:
+                    save_checkpoint(
+                        checkpoint_path, continuation_token, blobs[-1][0]
+                    )
+                print(
+                    f"Scanned {scanned} images, found {orphaned} orphaned",
+                    file=sys.stderr,
+                )
+
+            print(f"\nFound {orphaned} orphaned images in {scanned} scanned")
+            if not dry_run:
+                print(
+                    f"Successfully cleaned up {deleted} orphaned images"
+                    + (f", {kept} reused since listed" if kept else "")
+                    + (f", {failed} failed" if failed else "")
+                )
+                # Finished, so the next run starts from the beginning
+                if os.path.exists(checkpoint_path):
+                    os.remove(checkpoint_path)
+
         except Exception as e:
             print(f"Error during cleanup: {e}")
             sys.exit(1)
 
+
 if __name__ == "__main__":
     import argparse
-    parser = argparse.ArgumentParser(description='Clean up orphaned images in blob storage')
-    parser.add_argument('--execute', action='store_true', 
-                      help='Actually delete the orphaned images. Without this flag, will only do a dry run.')
+
+    parser = argparse.ArgumentParser(
+        description="Clean up orphaned images in blob storage"
+    )
+    parser.add_argument(
+        "--execute",
+        action="store_true",
+        help=(
+            "Actually delete the orphaned images. Without this flag, will "
+            "only do a dry run."
+        ),
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=DEFAULT_CHECKPOINT,
+        help="File recording progress, so an interrupted run can resume.",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore any checkpoint and scan from the first blob.",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=5000,
+        help="Blobs listed per request (at most 5000).",
+    )
+    parser.add_argument(
+        "--min-age-hours",
+        type=float,
+        default=24,
+        help="Leave blobs changed more recently than this alone.",
+    )
     args = parser.parse_args()
-    
-    cleanup_orphaned_images(dry_run=not args.execute) 
\ No newline at end of file
+
+    cleanup_orphaned_images(
+        dry_run=not args.execute,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart,
+        page_size=args.page_size,
+        min_age_hours=args.min_age_hours,
+    )
@@ -6,6 +6,8 @@ from app.models import (
     PropertyMedia,
 )
 from datetime import datetime, UTC
+from contextlib import contextmanager
+from sqlalchemy import event
 from unittest.mock import patch
 from app.blob_storage import MockBlobStorageService
 from uuid import uuid4
@@ -189,13 +191,14 @@ def mock_services(monkeypatch):
     # Create an instance of MockBlobStorageService
     mock_service = MockBlobStorageService()
 
-    # Replace the BlobStorageService class with our mock instance
+    # Hand out our mock instance in place of the shared service
     monkeypatch.setattr(
-        "app.properties.BlobStorageService",
+        "app.properties.get_blob_service",
         lambda: mock_service,
     )
+    monkeypatch.setattr("app.tasks.get_blob_service", lambda: mock_service)
 
-    with patch("app.utils.geocode_address") as mock_geocode:
+    with patch("app.tasks.geocode_address") as mock_geocode:
         mock_geocode.return_value = (51.5074, -0.1278)  # London coordinates
         yield mock_geocode
 
@@ -234,3 +237,25 @@ def test_property(session, test_seller):
     session.add(property)
     session.commit()
     return property
+
+
+@pytest.fixture(scope="function")
+def count_queries(app):
+    """Count the SQL statements executed inside a ``with`` block."""
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(
+                db.engine, "before_cursor_execute", before_cursor_execute
+            )
+
+    return counter
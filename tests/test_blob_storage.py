@@ -0,0 +1,513 @@
+import hashlib
+import re
+import threading
+import time
+from io import BytesIO
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from uuid import uuid4
+import pytest
+from PIL import Image
+import app.blob_storage as blob_storage
+from app.blob_storage import (
+    RECENTLY_MODIFIED,
+    BlobStorageService,
+    get_blob_service,
+)
+from app.uploads import UploadedImage, delete_unreferenced_images
+
+# The well-known development account key used by Azurite
+ACCOUNT_NAME = "devstoreaccount1"
+ACCOUNT_KEY = (
+    "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/"
+    "K1SZFPTOtr/KBHBeksoGMGw=="
+)
+
+pytestmark = pytest.mark.usefixtures("app")
+
+
+def make_png(color="red"):
+    buffer = BytesIO()
+    Image.new("RGB", (4, 4), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeBlobStore:
+    """State behind the stand-in server, plus counters for assertions."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.containers = set()
+        self.blobs = {}
+        self.content_types = {}
+        self.modified = {}
+        self.staged = {}
+        self.requests = []
+        self.connections = 0
+        self.container_checks = 0
+
+
+class BlobRequestHandler(BaseHTTPRequestHandler):
+    """Just enough of the Blob REST API for BlobStorageService."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.store.lock:
+            self.server.store.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _parse(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/", 2)
+        container = parts[1] if len(parts) > 1 else None
+        blob = parts[2] if len(parts) > 2 else None
+        return container, blob, parse_qs(url.query)
+
+    def _respond(self, status, error_code=None):
+        self.send_response(status)
+        self.send_header("x-ms-request-id", str(uuid4()))
+        self.send_header("x-ms-version", "2021-12-02")
+        self.send_header("ETag", f'"{uuid4().hex}"')
+        self.send_header("Last-Modified", formatdate(usegmt=True))
+        if error_code:
+            self.send_header("x-ms-error-code", error_code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _list_blobs(self, container, query):
+        """List blobs in name order; the marker is the next name due"""
+        store = self.server.store
+        marker = query.get("marker", [""])[0]
+        max_results = int(query.get("maxresults", ["5000"])[0])
+        with store.lock:
+            store.requests.append(("GET", "list", 0))
+            names = sorted(
+                name
+                for stored, name in store.blobs
+                if stored == container and name >= marker
+            )
+            entries = "".join(
+                f"<Blob><Name>{name}</Name><Properties>"
+                "<Last-Modified>"
+                f"{formatdate(store.modified[(container, name)], usegmt=True)}"
+                "</Last-Modified>"
+                "<BlobType>BlockBlob</BlobType>"
+                "</Properties></Blob>"
+                for name in names[:max_results]
+            )
+        next_marker = names[max_results] if len(names) > max_results else ""
+        payload = (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            f'<EnumerationResults ContainerName="{container}">'
+            f"<MaxResults>{max_results}</MaxResults>"
+            f"<Blobs>{entries}</Blobs>"
+            f"<NextMarker>{next_marker}</NextMarker>"
+            "</EnumerationResults>"
+        ).encode()
+
+        self.send_response(200)
+        self.send_header("x-ms-request-id", str(uuid4()))
+        self.send_header("x-ms-version", "2021-12-02")
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        store = self.server.store
+        container, blob, query = self._parse()
+        if query.get("comp") == ["list"] and blob is None:
+            self._list_blobs(container, query)
+        elif query.get("restype") == ["container"] and blob is None:
+            with store.lock:
+                store.container_checks += 1
+                exists = container in store.containers
+            if exists:
+                self._respond(200)
+            else:
+                self._respond(404, "ContainerNotFound")
+        else:
+            self._respond(400, "UnsupportedOperation")
+
+    def do_HEAD(self):
+        store = self.server.store
+        container, blob, _ = self._parse()
+        with store.lock:
+            store.requests.append(("HEAD", None, 0))
+            found = (container, blob) in store.blobs
+        if found:
+            self._respond(200)
+        else:
+            self._respond(404, "BlobNotFound")
+
+    def do_PUT(self):
+        store = self.server.store
+        container, blob, query = self._parse()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        comp = query.get("comp", [None])[0]
+        with store.lock:
+            store.requests.append(("PUT", comp, len(body)))
+            if blob is None:
+                if container in store.containers:
+                    self._respond(409, "ContainerAlreadyExists")
+                    return
+                store.containers.add(container)
+            elif container not in store.containers:
+                self._respond(404, "ContainerNotFound")
+                return
+            elif comp == "block":
+                block_id = query["blockid"][0]
+                store.staged[(container, blob, block_id)] = body
+            elif comp == "metadata":
+                if (container, blob) not in store.blobs:
+                    self._respond(404, "BlobNotFound")
+                    return
+                store.modified[(container, blob)] = time.time()
+                self._respond(200)
+                return
+            else:
+                if comp == "blocklist":
+                    block_ids = re.findall(
+                        r"<Latest>(.*?)</Latest>", body.decode()
+                    )
+                    body = b"".join(
+                        store.staged.pop((container, blob, block_id))
+                        for block_id in block_ids
+                    )
+                store.blobs[(container, blob)] = body
+                store.modified[(container, blob)] = time.time()
+                store.content_types[(container, blob)] = self.headers.get(
+                    "x-ms-blob-content-type"
+                )
+        self._respond(201)
+
+    def do_POST(self):
+        """Blob batch: run each DELETE sub-request, answer as multipart"""
+        store = self.server.store
+        container, _, query = self._parse()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        subrequests = re.findall(
+            r"^DELETE (\S+) HTTP/1.1\r\n((?:.+\r\n)*)", body.decode(), re.M
+        )
+        boundary = f"batchresponse_{uuid4()}"
+        parts = []
+        with store.lock:
+            store.requests.append(("POST", query["comp"][0], len(subrequests)))
+            for content_id, (path, headers) in enumerate(subrequests):
+                blob = urlparse(path).path.rsplit("/", 1)[-1]
+                since = re.search(
+                    r"^If-Unmodified-Since: (.+)\r$", headers, re.M | re.I
+                )
+                modified = store.modified.get((container, blob), 0)
+                if (container, blob) in store.blobs and (
+                    since
+                    and int(modified)
+                    > parsedate_to_datetime(since.group(1)).timestamp()
+                ):
+                    status = (
+                        "412 The condition specified using HTTP "
+                        "conditional header(s) is not met.\r\n"
+                        "x-ms-error-code: ConditionNotMet\r\n"
+                    )
+                elif store.blobs.pop((container, blob), None) is not None:
+                    status = "202 Accepted\r\n"
+                else:
+                    status = (
+                        "404 The specified blob does not exist.\r\n"
+                        "x-ms-error-code: BlobNotFound\r\n"
+                    )
+                parts.append(
+                    f"--{boundary}\r\n"
+                    "Content-Type: application/http\r\n"
+                    f"Content-ID: {content_id}\r\n\r\n"
+                    f"HTTP/1.1 {status}"
+                    f"x-ms-request-id: {uuid4()}\r\n"
+                    "Content-Length: 0\r\n\r\n"
+                )
+        payload = ("".join(parts) + f"--{boundary}--\r\n").encode()
+
+        self.send_response(202)
+        self.send_header("x-ms-request-id", str(uuid4()))
+        self.send_header("x-ms-version", "2021-12-02")
+        self.send_header(
+            "Content-Type", f"multipart/mixed; boundary={boundary}"
+        )
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_DELETE(self):
+        store = self.server.store
+        container, blob, _ = self._parse()
+        with store.lock:
+            found = store.blobs.pop((container, blob), None) is not None
+        if found:
+            self._respond(202)
+        else:
+            self._respond(404, "BlobNotFound")
+
+
+@pytest.fixture
+def blob_server():
+    """Azurite-style local stand-in for the Blob service."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BlobRequestHandler)
+    server.daemon_threads = True
+    server.store = FakeBlobStore()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def connection_string(blob_server, monkeypatch):
+    host, port = blob_server.server_address
+    value = (
+        "DefaultEndpointsProtocol=http;"
+        f"AccountName={ACCOUNT_NAME};AccountKey={ACCOUNT_KEY};"
+        f"BlobEndpoint=http://{host}:{port}/{ACCOUNT_NAME};"
+    )
+    monkeypatch.setenv("AZURE_STORAGE_CONNECTION_STRING", value)
+    # Start every test without a process-wide service
+    monkeypatch.setattr(blob_storage, "_blob_service", None)
+    monkeypatch.setattr(blob_storage, "_blob_service_pid", None)
+    return value
+
+
+def test_container_is_checked_once(blob_server, connection_string):
+    """Test the container is created on first upload and not rechecked."""
+    service = BlobStorageService(connection_string)
+
+    urls = [
+        service.upload_image(make_png(color))
+        for color in ["red", "green", "blue"]
+    ]
+
+    store = blob_server.store
+    assert store.container_checks == 1
+    assert store.containers == {blob_storage.CONTAINER_NAME}
+    assert len(store.blobs) == 3
+    assert all(url.endswith(".png") for url in urls)
+
+
+def test_existing_container_is_not_recreated(blob_server, connection_string):
+    """Test a container made by another worker is picked up as-is."""
+    blob_server.store.containers.add(blob_storage.CONTAINER_NAME)
+    service = BlobStorageService(connection_string)
+
+    service.upload_image(make_png("red"))
+    service.upload_image(make_png("green"))
+
+    assert blob_server.store.container_checks == 1
+    assert len(blob_server.store.blobs) == 2
+
+
+def test_blob_service_is_shared_and_reuses_connections(
+    blob_server, connection_string
+):
+    """Test every caller gets one service whose connections are pooled."""
+    service = get_blob_service()
+    assert get_blob_service() is service
+
+    url = service.upload_image(make_png("red"))
+    get_blob_service().upload_image(make_png("green"))
+    get_blob_service().delete_image(url)
+
+    store = blob_server.store
+    assert len(store.blobs) == 1
+    # Container check, create, two lookups, two uploads and a delete, all
+    # on one socket
+    assert store.connections == 1
+
+
+def test_small_stream_is_uploaded_in_one_request(
+    blob_server, connection_string
+):
+    """Test a stream that fits in one block skips block staging."""
+    service = BlobStorageService(connection_string)
+
+    url = service.upload_image(BytesIO(make_png()))
+
+    store = blob_server.store
+    key = (blob_storage.CONTAINER_NAME, url.rsplit("/", 1)[-1])
+    assert store.blobs[key] == make_png()
+    assert store.content_types[key] == "image/png"
+    puts = [comp for method, comp, _ in store.requests if method == "PUT"]
+    # Container create, the touch that finds no blob, then the upload
+    assert puts == [None, "metadata", None]
+
+
+def test_large_stream_is_uploaded_in_blocks(
+    blob_server, connection_string, monkeypatch
+):
+    """Test a stream bigger than a block is staged block by block."""
+    monkeypatch.setattr(blob_storage, "BLOCK_SIZE", 1024)
+    data = make_png()
+    data += bytes(2560 - len(data))
+    service = BlobStorageService(connection_string)
+
+    url = service.upload_image(BytesIO(data))
+
+    store = blob_server.store
+    key = (blob_storage.CONTAINER_NAME, url.rsplit("/", 1)[-1])
+    assert store.blobs[key] == data
+    assert store.content_types[key] == "image/png"
+    blocks = [size for _, comp, size in store.requests if comp == "block"]
+    assert blocks == [1024, 1024, 512]
+    assert store.staged == {}
+
+
+def test_upload_uses_detected_type_not_client_type(
+    blob_server, connection_string
+):
+    """Test the blob name and content type come from the image header."""
+    buffer = BytesIO()
+    Image.new("RGB", (4, 4)).save(buffer, format="GIF")
+    service = BlobStorageService(connection_string)
+
+    url = service.upload_image(buffer.getvalue())
+
+    key = (blob_storage.CONTAINER_NAME, url.rsplit("/", 1)[-1])
+    assert url.endswith(".gif")
+    assert blob_server.store.content_types[key] == "image/gif"
+
+
+def test_identical_images_are_stored_once(blob_server, connection_string):
+    """Test blobs are named by content and repeat uploads are skipped."""
+    data = make_png()
+    service = BlobStorageService(connection_string)
+
+    urls = {service.upload_image(data) for _ in range(2)}
+    urls.add(service.upload_image(BytesIO(data)))
+
+    (url,) = urls
+    assert url.endswith(f"/{hashlib.sha256(data).hexdigest()}.png")
+    store = blob_server.store
+    assert len(store.blobs) == 1
+    # Only the first upload sent the image; the other requests are empty
+    sent = [size for method, _, size in store.requests if size]
+    assert sent == [len(data)]
+    assert service.touch_image(url.rsplit("/", 1)[-1]) == url
+    assert service.touch_image("missing.png") is None
+
+
+def test_delete_images_batches_deletes(
+    blob_server, connection_string, monkeypatch
+):
+    """Test blobs are deleted in batch requests with per-image results."""
+    monkeypatch.setattr(blob_storage, "DELETE_BATCH_SIZE", 2)
+    service = BlobStorageService(connection_string)
+    urls = [
+        service.upload_image(make_png(color))
+        for color in ["red", "green", "blue"]
+    ]
+    missing = urls[0].rsplit("/", 1)[0] + "/missing.png"
+
+    results = service.delete_images(urls + [missing])
+
+    store = blob_server.store
+    assert results == {url: None for url in urls + [missing]}
+    assert store.blobs == {}
+    batches = [
+        count for method, _, count in store.requests if method == "POST"
+    ]
+    assert batches == [2, 2]
+
+
+def test_list_blob_pages_resumes_from_continuation_token(
+    blob_server, connection_string
+):
+    """Test blobs are listed a page at a time, in name order."""
+    service = BlobStorageService(connection_string)
+    names = sorted(
+        service.upload_image(make_png(color)).rsplit("/", 1)[-1]
+        for color in ["red", "green", "blue", "white", "black"]
+    )
+
+    pages = list(service.list_blob_pages(page_size=2))
+
+    assert [[name for name, _ in blobs] for blobs, _ in pages] == [
+        names[:2],
+        names[2:4],
+        names[4:],
+    ]
+    assert pages[-1][1] is None
+    assert all(modified is not None for name, modified in pages[0][0])
+
+    resumed = list(service.list_blob_pages(pages[0][1], page_size=2))
+    assert [name for blobs, _ in resumed for name, _ in blobs] == names[2:]
+
+
+def backdate(store, url, hours):
+    key = (blob_storage.CONTAINER_NAME, url.rsplit("/", 1)[-1])
+    store.modified[key] -= hours * 3600
+
+
+def test_reused_blob_survives_a_racing_delete(
+    blob_server, connection_string, monkeypatch
+):
+    """Test a delete that checked references before a reuse keeps it."""
+    data = make_png("red")
+    service = BlobStorageService(connection_string)
+    url = service.upload_image(data)
+    other = service.upload_image(make_png("green"))
+    for stored in (url, other):
+        backdate(blob_server.store, stored, 2)
+
+    delete_images = service.delete_images
+
+    def reuse_then_delete(*args, **kwargs):
+        # Another listing reuses the photo after the reference check, and
+        # its media row isn't committed yet
+        assert service.upload_image(data) == url
+        return delete_images(*args, **kwargs)
+
+    monkeypatch.setattr(service, "delete_images", reuse_then_delete)
+    delete_unreferenced_images(
+        service, [UploadedImage(url, {}), UploadedImage(other, {})]
+    )
+
+    names = {name for _, name in blob_server.store.blobs}
+    assert names == {url.rsplit("/", 1)[-1]}
+
+
+def test_blob_deleted_before_reuse_is_uploaded_again(
+    blob_server, connection_string
+):
+    """Test a reuse that finds its blob gone stores the image again."""
+    data = make_png("red")
+    service = BlobStorageService(connection_string)
+    url = service.upload_image(data)
+    backdate(blob_server.store, url, 2)
+    delete_unreferenced_images(service, [UploadedImage(url, {})])
+    assert blob_server.store.blobs == {}
+
+    assert service.upload_image(data) == url
+
+    key = (blob_storage.CONTAINER_NAME, url.rsplit("/", 1)[-1])
+    assert blob_server.store.blobs[key] == data
+
+
+def test_delete_images_keeps_blobs_touched_since_cutoff(
+    blob_server, connection_string
+):
+    """Test a blob reused after it was listed as an orphan is kept."""
+    service = BlobStorageService(connection_string)
+    url = service.upload_image(make_png("red"))
+    backdate(blob_server.store, url, 48)
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=24)
+    ((blobs, _),) = service.list_blob_pages()
+    assert blobs[0][1] < cutoff
+
+    service.touch_image(url.rsplit("/", 1)[-1])
+    results = service.delete_images([url], if_unmodified_since=cutoff)
+
+    assert results == {url: RECENTLY_MODIFIED}
+    assert len(blob_server.store.blobs) == 1
@@ -0,0 +1,96 @@
+import time
+import pytest
+import fakeredis
+from app.cache_backends import LocalLRUCache, TwoTierCache
+
+# The autouse service mocks need an application context
+pytestmark = pytest.mark.usefixtures("app")
+
+
+def wait_for(condition, timeout=3.0):
+    """Poll until condition() is true or the timeout passes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+@pytest.fixture
+def redis_server():
+    """In-process stand-in for a shared Redis server."""
+    return fakeredis.FakeServer()
+
+
+def make_worker(redis_server, **kwargs):
+    """Create a TwoTierCache as one gunicorn worker would see it."""
+    client = fakeredis.FakeRedis(server=redis_server)
+    return TwoTierCache(client, key_prefix="test:", **kwargs)
+
+
+def test_local_lru_evicts_least_recently_used():
+    """Test the local tier stays bounded and keeps recently used keys."""
+    lru = LocalLRUCache(max_size=2, timeout=30)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+
+    assert lru.get("a") == (True, 1)
+    assert lru.get("b") == (False, None)
+    assert lru.get("c") == (True, 3)
+    assert len(lru) == 2
+
+
+def test_local_lru_never_outlives_local_timeout():
+    """Test local entries expire after the local timeout at the latest."""
+    lru = LocalLRUCache(max_size=2, timeout=0.05)
+    lru.set("a", 1, timeout=300)
+    time.sleep(0.1)
+
+    assert lru.get("a") == (False, None)
+
+
+def test_two_tier_shares_values_between_workers(redis_server):
+    """Test a value set by one worker is visible to another."""
+    worker_a = make_worker(redis_server)
+    worker_b = make_worker(redis_server)
+
+    worker_a.set("dashboard:1", {"saved": 1})
+
+    assert worker_b.get("dashboard:1") == {"saved": 1}
+    # Second read is served from worker B's local tier
+    assert worker_b.local.get("dashboard:1") == (True, {"saved": 1})
+
+
+def test_two_tier_broadcasts_invalidations(redis_server):
+    """Test a delete on one worker drops other workers' local copies."""
+    worker_a = make_worker(redis_server)
+    worker_b = make_worker(redis_server)
+
+    worker_a.set("dashboard:1", {"saved": 1})
+    assert worker_b.get("dashboard:1") == {"saved": 1}
+
+    worker_a.delete("dashboard:1")
+
+    assert wait_for(lambda: not worker_b.local.get("dashboard:1")[0])
+    assert worker_b.get("dashboard:1") is None
+
+
+def test_two_tier_broadcasts_overwrites_and_clear(redis_server):
+    """Test sets and clears also reach other workers' local tiers."""
+    worker_a = make_worker(redis_server)
+    worker_b = make_worker(redis_server)
+
+    worker_a.set("dashboard:1", {"saved": 1})
+    worker_b.get("dashboard:1")
+    worker_a.set("dashboard:1", {"saved": 2})
+
+    assert wait_for(lambda: worker_b.get("dashboard:1") == {"saved": 2})
+
+    worker_b.get("dashboard:1")
+    worker_a.clear()
+
+    assert wait_for(lambda: len(worker_b.local) == 0)
+    assert worker_b.get("dashboard:1") is None
@@ -0,0 +1,95 @@
+import math
+import pytest
+from app.geo import (
+    EARTH_RADIUS_KM,
+    bounds_around,
+    encode_geohash,
+    geohash_cover,
+    haversine_km,
+    parse_geo_search,
+)
+
+pytestmark = pytest.mark.usefixtures("app")
+
+
+def test_encode_geohash():
+    assert encode_geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert encode_geohash(51.5074, -0.1278).startswith("gcpvj")
+
+
+@pytest.mark.parametrize(
+    "bounds",
+    [
+        (51.45, -0.2, 51.55, -0.05),
+        (49.9, -8.2, 58.7, 1.8),
+        # Straddles the equator and the prime meridian
+        (-0.01, -0.01, 0.01, 0.01),
+        (89.0, 179.0, 90.0, 180.0),
+    ],
+)
+def test_geohash_cover_contains_every_point(bounds):
+    cover = geohash_cover(bounds)
+    assert 0 < len(cover) <= 16
+
+    min_lat, min_lng, max_lat, max_lng = bounds
+    for i in range(11):
+        for j in range(11):
+            geohash = encode_geohash(
+                min_lat + (max_lat - min_lat) * i / 10,
+                min_lng + (max_lng - min_lng) * j / 10,
+            )
+            assert any(geohash.startswith(prefix) for prefix in cover)
+
+
+def test_bounds_around_contains_the_circle():
+    """Test every point 10km from the centre lies inside the box."""
+    latitude, longitude = 51.5, -0.12
+    min_lat, min_lng, max_lat, max_lng = bounds_around(latitude, longitude, 10)
+
+    angular = 10 / EARTH_RADIUS_KM
+    lat1 = math.radians(latitude)
+    for degrees in range(0, 360, 5):
+        bearing = math.radians(degrees)
+        lat2 = math.asin(
+            math.sin(lat1) * math.cos(angular)
+            + math.cos(lat1) * math.sin(angular) * math.cos(bearing)
+        )
+        lng2 = math.radians(longitude) + math.atan2(
+            math.sin(bearing) * math.sin(angular) * math.cos(lat1),
+            math.cos(angular) - math.sin(lat1) * math.sin(lat2),
+        )
+        point = math.degrees(lat2), math.degrees(lng2)
+        assert haversine_km(latitude, longitude, *point) == pytest.approx(10)
+        assert min_lat - 1e-9 <= point[0] <= max_lat + 1e-9
+        assert min_lng <= point[1] <= max_lng
+
+
+@pytest.mark.parametrize(
+    "args,error",
+    [
+        ({"lat": "51.5", "lng": "-0.12"}, "given together"),
+        ({"lat": "91", "lng": "0", "radius_km": "1"}, "lat must be"),
+        ({"lat": "51", "lng": "0", "radius_km": "5000"}, "radius_km"),
+        ({"lat": "x", "lng": "0", "radius_km": "1"}, "lat must be"),
+        ({"bbox": "1,2,3"}, "bbox must be"),
+        ({"bbox": "1,52,0,51"}, "bbox must be"),
+    ],
+)
+def test_parse_geo_search_rejects_bad_filters(args, error):
+    with pytest.raises(ValueError, match=error):
+        parse_geo_search(args)
+
+
+def test_parse_geo_search_intersects_radius_and_bbox():
+    assert parse_geo_search({}) is None
+
+    search = parse_geo_search({"bbox": "-1,51,1,52"})
+    assert (search.latitude, search.longitude) == (51.5, 0)
+    assert search.radius_km is None
+    assert search.bounds == (51, -1, 52, 1)
+
+    search = parse_geo_search(
+        {"lat": "51.5", "lng": "0", "radius_km": "100", "bbox": "-1,51,1,52"}
+    )
+    assert search.radius_km == 100
+    assert search.bounds == (51, -1, 52, 1)
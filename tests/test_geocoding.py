@@ -0,0 +1,195 @@
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+from types import SimpleNamespace
+import pytest
+from geopy.exc import GeocoderServiceError
+from app import db
+from app.exceptions import GeocodeError
+from app.geocoding import (
+    LocalGeocoder,
+    geocode_address,
+    local_cache,
+    normalise_address,
+)
+from app.manage import geocode_backfill
+from app.models import GeocodeCacheEntry, Property, UserRole
+from app.spatial_index import get_spatial_index
+
+LOCATIONS = {
+    "123 Test Street, London, SW1 1AA": (51.5074, -0.1278),
+    "SW1 1AA": (51.5, -0.13),
+}
+
+
+def make_address(house_number="123", street="Test Street", postcode="SW1 1AA"):
+    return SimpleNamespace(
+        house_number=house_number,
+        street=street,
+        city="London",
+        postcode=postcode,
+    )
+
+
+@pytest.fixture
+def geocoder(session, monkeypatch):
+    geocoder = LocalGeocoder(LOCATIONS)
+    monkeypatch.setattr("app.geocoding.get_geocoder", lambda: geocoder)
+    local_cache.clear()
+    yield geocoder
+    local_cache.clear()
+
+
+def test_repeat_address_is_served_from_cache(geocoder):
+    assert geocode_address(make_address()) == (51.5074, -0.1278)
+    assert len(geocoder.queries) == 1
+
+    # Case, spacing and punctuation don't matter
+    same = make_address(street="test  street.", postcode="sw11aa")
+    assert normalise_address(same) == normalise_address(make_address())
+    assert geocode_address(same) == (51.5074, -0.1278)
+    assert len(geocoder.queries) == 1
+
+    # Another worker process only has the table
+    local_cache.clear()
+    assert geocode_address(make_address()) == (51.5074, -0.1278)
+    assert len(geocoder.queries) == 1
+
+
+def test_unknown_address_falls_back_to_postcode(geocoder):
+    """Test misses are cached and the postcode is looked up once."""
+    assert geocode_address(make_address(house_number="1")) == (51.5, -0.13)
+    assert geocoder.queries == ["1 Test Street, London, SW1 1AA", "SW1 1AA"]
+
+    assert geocode_address(make_address(house_number="1")) == (51.5, -0.13)
+    assert geocode_address(make_address(house_number="2")) == (51.5, -0.13)
+    assert geocoder.queries[2:] == ["2 Test Street, London, SW1 1AA"]
+
+
+def test_miss_is_cached_when_the_caller_rolls_back(geocoder, session):
+    address = make_address(house_number="1", postcode="ZZ1 1ZZ")
+    with pytest.raises(GeocodeError, match="Could not geocode"):
+        geocode_address(address)
+    session.rollback()
+    local_cache.clear()
+
+    entry = db.session.get(GeocodeCacheEntry, normalise_address(address))
+    assert (entry.latitude, entry.longitude) == (None, None)
+    with pytest.raises(GeocodeError, match="Could not geocode"):
+        geocode_address(address)
+    assert len(geocoder.queries) == 2
+
+
+def test_expired_entry_is_looked_up_again(geocoder, session):
+    geocode_address(make_address())
+    entry = db.session.get(
+        GeocodeCacheEntry, normalise_address(make_address())
+    )
+    entry.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    session.commit()
+    local_cache.clear()
+
+    geocode_address(make_address())
+
+    assert len(geocoder.queries) == 2
+
+
+def test_service_errors_are_not_cached(geocoder, monkeypatch):
+    def unavailable(query):
+        raise GeocoderServiceError("503")
+
+    monkeypatch.setattr(geocoder, "geocode", unavailable)
+    with pytest.raises(GeocodeError, match="Geocoding service error"):
+        geocode_address(make_address())
+    monkeypatch.undo()
+    monkeypatch.setattr("app.geocoding.get_geocoder", lambda: geocoder)
+
+    assert geocode_address(make_address()) == (51.5074, -0.1278)
+
+
+def test_backfill_geocodes_each_address_once(app, geocoder, test_user):
+    """Test shared addresses are looked up once and misses are skipped."""
+    properties = [
+        Property(
+            id=UUID(int=i + 1),
+            price=350000,
+            seller_id=test_user.id,
+            house_number=house_number,
+            street="Test Street",
+            city="London",
+            postcode=postcode,
+        )
+        for i, (house_number, postcode) in enumerate(
+            [
+                ("123", "SW1 1AA"),
+                ("123", "sw1 1aa"),
+                ("1", "ZZ1 1ZZ"),
+                ("123", "SW1 1AA"),
+            ]
+        )
+    ]
+    properties[3].latitude, properties[3].longitude = 1.0, 2.0
+    db.session.add_all(properties)
+    db.session.commit()
+    versions = [p.last_updated for p in properties]
+
+    result = app.test_cli_runner().invoke(
+        geocode_backfill, ["--batch-size", "2"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "properties/s" in result.output
+    assert f"last id {properties[2].id}" in result.output
+    assert "Done: 2 of 3 properties geocoded" in result.output
+    assert geocoder.queries == [
+        "123 Test Street, London, SW1 1AA",
+        "1 Test Street, London, ZZ1 1ZZ",
+        "ZZ1 1ZZ",
+    ]
+
+    db.session.expire_all()
+    coordinates = [
+        (p.latitude, p.longitude) for p in Property.query.order_by(Property.id)
+    ]
+    assert coordinates == [
+        (51.5074, -0.1278),
+        (51.5074, -0.1278),
+        (None, None),
+        (1.0, 2.0),
+    ]
+    assert properties[0].last_updated > versions[0]
+
+    # Resumes after the given id
+    result = app.test_cli_runner().invoke(
+        geocode_backfill, ["--after", str(properties[2].id)]
+    )
+    assert "Done: 0 of 0 properties geocoded" in result.output
+
+
+def test_backfill_refreshes_dashboards_and_spatial_index(
+    app, client, geocoder, test_user
+):
+    """Test backfilled coordinates reach cached dashboards and the index."""
+    db.session.add(UserRole(user_id=test_user.id, role_type="seller"))
+    property_item = Property(
+        price=350000,
+        seller_id=test_user.id,
+        house_number="123",
+        street="Test Street",
+        city="London",
+        postcode="SW1 1AA",
+    )
+    db.session.add(property_item)
+    db.session.commit()
+    url = f"/api/users/{test_user.id}/dashboard"
+    (listed,) = client.get(url).json["listed_properties"]
+    assert listed["address"]["latitude"] is None
+    index = get_spatial_index()
+    assert index.grid.position(property_item.id) is None
+
+    result = app.test_cli_runner().invoke(geocode_backfill)
+
+    assert result.exit_code == 0, result.output
+    (listed,) = client.get(url).json["listed_properties"]
+    assert listed["address"]["latitude"] == 51.5074
+    # Updated in place, without waiting for a refresh
+    assert index.grid.position(property_item.id) == (51.5074, -0.1278)
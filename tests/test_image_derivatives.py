@@ -0,0 +1,44 @@
+from io import BytesIO
+import pytest
+from PIL import Image
+from app.image_derivatives import RENDITIONS, render_derivatives
+
+# The autouse service mocks need an application context
+pytestmark = pytest.mark.usefixtures("app")
+
+
+def encode(size, image_format="JPEG", **kwargs):
+    buffer = BytesIO()
+    Image.new("RGB", size, "red").save(buffer, format=image_format, **kwargs)
+    return buffer.getvalue()
+
+
+def test_render_derivatives_fits_each_rendition():
+    """Test each rendition is WebP and fits its box, keeping aspect."""
+    renditions = render_derivatives(encode((4000, 2000)))
+
+    assert set(renditions) == {name for name, _ in RENDITIONS}
+    for name, size in RENDITIONS:
+        data, width, height = renditions[name]
+        assert (width, height) == (size, size // 2)
+        with Image.open(BytesIO(data)) as img:
+            assert img.format == "WEBP"
+            assert img.size == (width, height)
+
+
+def test_render_derivatives_never_upscales():
+    """Test images smaller than a rendition keep their own size."""
+    renditions = render_derivatives(encode((500, 400), "PNG"))
+
+    assert renditions["full"][1:] == (500, 400)
+    assert renditions["card"][1:] == (500, 400)
+    assert renditions["thumbnail"][1:] == (320, 256)
+
+
+def test_render_derivatives_applies_exif_orientation():
+    """Test photos taken in portrait come out the right way up."""
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotated 90 degrees clockwise
+    renditions = render_derivatives(encode((1000, 500), exif=exif))
+
+    assert renditions["card"][1:] == (400, 800)
@@ -0,0 +1,114 @@
+import os
+import struct
+import zlib
+from io import BytesIO
+import pytest
+from PIL import Image
+from app.exceptions import ImageValidationError
+from app.image_validation import (
+    MAX_IMAGE_BYTES,
+    inspect_image,
+    validate_image,
+)
+
+EXAMPLES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "Image Examples",
+)
+
+# The autouse service mocks need an application context
+pytestmark = pytest.mark.usefixtures("app")
+
+
+def encode(size, image_format, **kwargs):
+    buffer = BytesIO()
+    Image.new("RGB", size, "red").save(buffer, format=image_format, **kwargs)
+    return buffer.getvalue()
+
+
+def png_header(width, height):
+    """A PNG signature and IHDR claiming any size, with no pixel data."""
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    crc = zlib.crc32(b"IHDR" + ihdr)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + struct.pack(">I", len(ihdr))
+        + b"IHDR"
+        + ihdr
+        + struct.pack(">I", crc)
+    )
+
+
+@pytest.mark.parametrize(
+    "image_format,kwargs,mime_type,extension",
+    [
+        ("JPEG", {}, "image/jpeg", "jpg"),
+        ("JPEG", {"progressive": True}, "image/jpeg", "jpg"),
+        ("PNG", {}, "image/png", "png"),
+        ("GIF", {}, "image/gif", "gif"),
+        ("WEBP", {}, "image/webp", "webp"),
+        ("WEBP", {"lossless": True}, "image/webp", "webp"),
+        ("WEBP", {"exif": b"Exif\0\0"}, "image/webp", "webp"),
+    ],
+)
+def test_inspect_image_reads_header(
+    image_format, kwargs, mime_type, extension
+):
+    """Test format and dimensions are read from each supported header."""
+    info = inspect_image(encode((301, 157), image_format, **kwargs))
+
+    assert info.mime_type == mime_type
+    assert info.extension == extension
+    assert (info.width, info.height) == (301, 157)
+
+
+def test_inspect_image_matches_pillow_on_examples():
+    """Test the sample photos, EXIF segments and all, parse like Pillow."""
+    for name in sorted(os.listdir(EXAMPLES_DIR)):
+        path = os.path.join(EXAMPLES_DIR, name)
+        if not name.lower().endswith((".jpg", ".jpeg")):
+            continue
+        with open(path, "rb") as f:
+            info = inspect_image(f)
+            assert f.tell() == 0
+        with Image.open(path) as img:
+            assert (info.width, info.height) == img.size
+        assert info.mime_type == "image/jpeg"
+
+
+def test_inspect_image_rejects_decompression_bomb_from_header():
+    """Test a tiny file claiming huge dimensions is rejected unread."""
+    bomb = png_header(50000, 50000)
+
+    with pytest.raises(ImageValidationError, match="8192x8192"):
+        inspect_image(bomb)
+
+
+def test_inspect_image_rejects_oversized_files():
+    data = encode((4, 4), "PNG") + bytes(MAX_IMAGE_BYTES)
+
+    with pytest.raises(ImageValidationError, match="10MB"):
+        inspect_image(data)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"not an image at all",
+        b"%PDF-1.7 pretending",
+        b"\xff\xd8\xff\xe0\x00\x10JFIF truncated",
+        png_header(0, 10),
+    ],
+)
+def test_inspect_image_rejects_unreadable_data(data):
+    with pytest.raises(ImageValidationError, match="Invalid image"):
+        inspect_image(data)
+
+
+def test_validate_image_returns_result_tuple():
+    assert validate_image(encode((10, 10), "PNG")) == (True, None)
+
+    is_valid, error = validate_image(png_header(9000, 10))
+    assert not is_valid
+    assert error == "Image dimensions exceed 8192x8192 limit"
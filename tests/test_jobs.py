@@ -0,0 +1,138 @@
+from datetime import datetime, timezone
+from sqlalchemy import select
+from app import db
+from app.exceptions import GeocodeError
+from app.jobs import (
+    LEASE_TIMEOUT,
+    MAX_ATTEMPTS,
+    RETRY_MAX_DELAY,
+    claim_job,
+    enqueue,
+    retry_delay,
+    run_pending,
+)
+from app.models import Job, Property
+from app.tasks import HANDLERS
+
+
+def test_job_runs_once_and_is_removed(session):
+    calls = []
+    enqueue("record", value=1)
+    enqueue("record", value=2)
+    session.commit()
+
+    assert run_pending({"record": lambda value: calls.append(value)}) == 2
+
+    assert calls == [1, 2]
+    assert Job.query.count() == 0
+
+
+def test_job_is_not_queued_when_its_write_rolls_back(session):
+    enqueue("record", value=1)
+    session.rollback()
+
+    assert Job.query.count() == 0
+
+
+def test_failing_job_backs_off_then_fails_for_good(session):
+    """Test retries are delayed exponentially, up to MAX_ATTEMPTS."""
+
+    def broken():
+        raise RuntimeError("service unavailable")
+
+    job = enqueue("broken")
+    session.commit()
+    job_id = job.id
+
+    assert run_pending({"broken": broken}) == 1
+    job = db.session.get(Job, job_id)
+    assert job.status == "pending"
+    assert job.attempts == 1
+    assert job.last_error == "service unavailable"
+    assert job.run_at > datetime.now(timezone.utc)
+    # Not due again yet
+    assert run_pending({"broken": broken}) == 0
+
+    assert retry_delay(2) == 2 * retry_delay(1)
+    assert retry_delay(100) == RETRY_MAX_DELAY
+    for _ in range(MAX_ATTEMPTS - 1):
+        job.run_at = datetime.now(timezone.utc)
+        session.commit()
+        run_pending({"broken": broken})
+        job = db.session.get(Job, job_id)
+
+    assert job.status == "failed"
+    assert job.attempts == MAX_ATTEMPTS
+    assert claim_job() is None
+
+
+def test_claim_skips_jobs_locked_by_another_worker(app, session):
+    """Test a second worker takes the next job instead of waiting."""
+    first = enqueue("record", value=1)
+    second = enqueue("record", value=2)
+    session.commit()
+    first_id, second_id = first.id, second.id
+
+    with db.engine.connect() as other_worker:
+        other_worker.execute(
+            select(Job.id)
+            .where(Job.id == first_id)
+            .with_for_update(skip_locked=True)
+        )
+
+        job = claim_job()
+
+        assert job.id == second_id
+        other_worker.rollback()
+
+
+def test_job_abandoned_by_dead_worker_is_reclaimed(session):
+    job = enqueue("record", value=1)
+    session.commit()
+    claimed = claim_job()
+    assert claimed.id == job.id
+    assert claim_job() is None
+
+    claimed.locked_at = datetime.now(timezone.utc) - LEASE_TIMEOUT
+    session.commit()
+
+    reclaimed = claim_job()
+    assert reclaimed.id == job.id
+    assert reclaimed.attempts == 2
+
+
+def test_create_property_geocodes_in_background(
+    client, test_property_data, mock_services
+):
+    """Test the listing is saved first and geocoded by the worker."""
+    response = client.post("/api/properties", json=test_property_data)
+    assert response.status_code == 201
+    mock_services.assert_not_called()
+
+    property_id = response.json["property_id"]
+    assert db.session.get(Property, property_id).latitude is None
+
+    assert run_pending(HANDLERS) == 1
+    db.session.expire_all()
+    property_item = db.session.get(Property, property_id)
+    assert (property_item.latitude, property_item.longitude) == (
+        51.5074,
+        -0.1278,
+    )
+    mock_services.assert_called_once()
+
+
+def test_geocoding_failure_is_retried(
+    client, test_property_data, mock_services
+):
+    mock_services.side_effect = GeocodeError("Geocoding service error")
+    response = client.post("/api/properties", json=test_property_data)
+    assert response.status_code == 201
+
+    run_pending(HANDLERS)
+
+    job = Job.query.one()
+    assert job.kind == "geocode_property"
+    assert job.status == "pending"
+    assert job.last_error == "Geocoding service error"
+    assert job.run_at <= datetime.now(timezone.utc) + retry_delay(1)
@@ -1,5 +1,11 @@
 import pytest
-from app.models import Property  # Remove Address and PropertySpecs imports
+from uuid import uuid4
+from app.models import (  # Remove Address and PropertySpecs imports
+    Property,
+    PropertyDetail,
+    PropertyFeatures,
+)
+from app.pagination import encode_cursor
 
 
 @pytest.fixture
@@ -65,6 +71,42 @@ def test_get_property_detail(client, init_database):
     assert data["specs"]["property_type"] == "semi-detached"
 
 
+def test_property_detail_query_count(
+    client, init_database, session, count_queries
+):
+    """Test a cold detail read loads all relations in a fixed query count."""
+    property_id = init_database.id
+    session.add_all(
+        [
+            PropertyDetail(
+                property_id=property_id,
+                description="Bright family home",
+                construction_year=1930,
+                heating_type="gas",
+            ),
+            PropertyFeatures(
+                property_id=property_id,
+                has_garden=True,
+                parking_spaces=2,
+            ),
+        ]
+    )
+    session.commit()
+    session.expunge_all()
+
+    with count_queries() as statements:
+        response = client.get(f"/api/properties/{property_id}")
+
+    assert response.status_code == 200
+    # Version lookup, property with details and features, then media
+    assert len(statements) == 3
+    data = response.json
+    assert data["details"]["heating_type"] == "gas"
+    assert data["features"]["parking_spaces"] == 2
+    assert len(data["image_urls"]) == 2
+    assert data["floorplan_url"] == "https://example.com/floorplan.pdf"
+
+
 def test_get_property_without_media(client, test_user, session):
     """Test getting property without any media."""
     property = Property(
@@ -166,6 +208,325 @@ def test_filter_properties(client, init_database):
     assert all(p["price"] >= 300000 for p in response.json)
 
 
+def test_list_view_fields(client, init_database):
+    """Test the projected list view emits the full summary shape."""
+    response = client.get("/api/properties")
+    assert response.status_code == 200
+    item = response.json[0]
+
+    assert item["property_id"] == str(init_database.id)
+    assert item["seller_id"] == init_database.seller_id
+    assert item["main_image_url"] == init_database.main_image_url
+    assert item["address"] == {
+        "house_number": "123",
+        "street": "Test Street",
+        "city": "London",
+        "postcode": "SW1 1AA",
+        "latitude": 51.5074,
+        "longitude": -0.1278,
+    }
+    assert item["specs"] == {
+        "bedrooms": 3,
+        "bathrooms": 2.0,
+        "property_type": "semi-detached",
+        "square_footage": 1200.0,
+    }
+
+
+def test_list_view_prefers_card_rendition(client, init_database, session):
+    """Test list items point at the small rendition once it exists."""
+    response = client.get("/api/properties")
+    # No rendition yet - fall back to the original
+    assert (
+        response.json[0]["main_image_card_url"] == init_database.main_image_url
+    )
+
+    init_database.main_image_card_url = "https://example.com/card.webp"
+    session.commit()
+
+    item = client.get("/api/properties").json[0]
+    assert item["main_image_card_url"] == "https://example.com/card.webp"
+    assert item["main_image_url"] == init_database.main_image_url
+
+
+def test_properties_keyset_pagination(client, test_user, session):
+    """Test walking the property list page by page with the cursor."""
+    for price in [100000, 200000, 200000, 300000, 400000]:
+        session.add(
+            Property(
+                price=price,
+                seller_id=test_user.id,
+                status="for_sale",
+                house_number="1",
+                street="Page Street",
+                city="London",
+                postcode="SW1 1AA",
+            )
+        )
+    session.commit()
+
+    seen = []
+    url = "/api/properties?limit=2"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert len(response.json) <= 2
+        seen.extend(response.json)
+        cursor = response.headers.get("X-Next-Cursor")
+        url = f"/api/properties?limit=2&cursor={cursor}" if cursor else None
+
+    assert len(seen) == 5
+    assert len({p["property_id"] for p in seen}) == 5
+    assert [p["price"] for p in seen] == [
+        400000,
+        300000,
+        200000,
+        200000,
+        100000,
+    ]
+
+
+def test_properties_page_size_is_capped(client, test_user, session):
+    """Test the page size never exceeds the server-side maximum."""
+    from app.pagination import MAX_PAGE_SIZE
+
+    session.add_all(
+        [
+            Property(price=100000 + i, seller_id=test_user.id)
+            for i in range(MAX_PAGE_SIZE + 1)
+        ]
+    )
+    session.commit()
+
+    response = client.get(f"/api/properties?limit={MAX_PAGE_SIZE * 10}")
+    assert response.status_code == 200
+    assert len(response.json) == MAX_PAGE_SIZE
+    assert "X-Next-Cursor" in response.headers
+
+
+def test_properties_invalid_pagination_params(client, session):
+    """Test malformed limit and cursor values are rejected."""
+    assert client.get("/api/properties?limit=0").status_code == 400
+    assert client.get("/api/properties?limit=abc").status_code == 400
+    assert client.get("/api/properties?cursor=not-a-cursor").status_code == 400
+
+
+def add_located_properties(session, seller_id):
+    """Add properties at increasing distances north of central London."""
+    # Each 0.01 degree of latitude is about 1.1km
+    properties = [
+        Property(
+            price=100000 + i,
+            seller_id=seller_id,
+            latitude=51.5 + offset,
+            longitude=-0.12,
+        )
+        for i, offset in enumerate([0.03, 0.0, 0.01, 0.5, 0.02])
+    ]
+    properties.append(Property(price=999999, seller_id=seller_id))
+    session.add_all(properties)
+    session.commit()
+    return properties
+
+
+def test_properties_radius_search(client, test_user, session):
+    """Test a radius search lists nearby properties nearest first."""
+    properties = add_located_properties(session, test_user.id)
+    prices = {p.price: p for p in properties}
+
+    seen = []
+    url = "/api/properties?lat=51.5&lng=-0.12&radius_km=5&limit=2"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        seen.extend(response.json)
+        cursor = response.headers.get("X-Next-Cursor")
+        url = (
+            "/api/properties?lat=51.5&lng=-0.12&radius_km=5&limit=2"
+            f"&cursor={cursor}"
+            if cursor
+            else None
+        )
+
+    assert [p["price"] for p in seen] == [100001, 100002, 100004, 100000]
+    assert [p["distance_km"] for p in seen] == [0.0, 1.112, 2.224, 3.336]
+    assert prices[100000].geohash.startswith("gcpv")
+
+
+def test_properties_bbox_search(client, test_user, session):
+    add_located_properties(session, test_user.id)
+
+    response = client.get(
+        "/api/properties?bbox=-0.2,51.505,0,51.6&min_price=100003"
+    )
+
+    assert response.status_code == 200
+    assert [p["price"] for p in response.json] == [100004]
+
+    # Combined with a radius, both must match
+    response = client.get(
+        "/api/properties?bbox=-0.2,51.505,0,51.6"
+        "&lat=51.5&lng=-0.12&radius_km=2.5"
+    )
+    assert [p["price"] for p in response.json] == [100002, 100004]
+
+
+def test_properties_invalid_geo_params(client, session):
+    assert client.get("/api/properties?lat=51.5&lng=0").status_code == 400
+    assert client.get("/api/properties?bbox=a,b,c,d").status_code == 400
+    # A price cursor doesn't page a geographic search
+    cursor = encode_cursor(100000, uuid4())
+    response = client.get(
+        f"/api/properties?lat=51.5&lng=0&radius_km=1&cursor={cursor}"
+    )
+    assert response.status_code == 400
+
+
+def add_searchable_properties(session, seller_id):
+    """Add properties whose address or description mention gardens."""
+    listings = [
+        # price, status, street, city, postcode, description
+        (300000, "for_sale", "Garden Row", "London", "SE1 6HX", None),
+        (250000, "for_sale", "High Street", "Leeds", "LS1 4AP", "Big garden"),
+        (400000, "sold", "Garden Lane", "Bath", "BA1 1AA", "A garden flat"),
+        (350000, "for_sale", "Mill Road", "Cambridge", "CB1 2AZ", "Loft"),
+        (200000, "for_sale", "Gardens Court", "York", "YO1 7HH", None),
+    ]
+    properties = []
+    for price, status, street, city, postcode, description in listings:
+        property = Property(
+            price=price,
+            seller_id=seller_id,
+            status=status,
+            street=street,
+            city=city,
+            postcode=postcode,
+        )
+        if description:
+            property.details = PropertyDetail(description=description)
+        properties.append(property)
+    session.add_all(properties)
+    session.commit()
+    return properties
+
+
+def test_properties_text_search(client, test_user, session):
+    """Test q matches addresses and descriptions, best match first."""
+    add_searchable_properties(session, test_user.id)
+
+    response = client.get("/api/properties?q=garden")
+
+    assert response.status_code == 200
+    # Address matches outrank description matches, and the stemmed
+    # "Gardens" matches too; ties are in no particular order
+    prices = [p["price"] for p in response.json]
+    assert prices[0] == 400000
+    assert set(prices[1:3]) == {300000, 200000}
+    assert prices[3:] == [250000]
+
+    response = client.get(
+        "/api/properties?q=garden&status=for_sale&max_price=280000"
+    )
+    assert [p["price"] for p in response.json] == [200000, 250000]
+
+    response = client.get('/api/properties?q="garden flat" bath')
+    assert [p["price"] for p in response.json] == [400000]
+
+    response = client.get("/api/properties?q=nothing+matches")
+    assert response.json == []
+
+
+def test_properties_partial_text_search(client, test_user, session):
+    """Test fragments of postcodes and street names match."""
+    add_searchable_properties(session, test_user.id)
+
+    response = client.get("/api/properties?q=cb12")
+    assert [p["price"] for p in response.json] == [350000]
+
+    response = client.get("/api/properties?q=igh stre")
+    assert [p["price"] for p in response.json] == [250000]
+
+    # Too short to match part of a word
+    response = client.get("/api/properties?q=ml")
+    assert response.json == []
+
+
+def test_properties_text_search_pagination(client, test_user, session):
+    """Test walking ranked results page by page with the cursor."""
+    add_searchable_properties(session, test_user.id)
+    expected = [
+        p["property_id"] for p in client.get("/api/properties?q=garden").json
+    ]
+
+    seen = []
+    url = "/api/properties?q=garden&limit=1"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        seen.extend(p["property_id"] for p in response.json)
+        cursor = response.headers.get("X-Next-Cursor")
+        url = (
+            f"/api/properties?q=garden&limit=1&cursor={cursor}"
+            if cursor
+            else None
+        )
+
+    assert seen == expected
+
+    # A price cursor doesn't page a text search
+    cursor = encode_cursor(100000, uuid4())
+    response = client.get(f"/api/properties?q=garden&cursor={cursor}")
+    assert response.status_code == 400
+    response = client.get(f"/api/properties?q={'a' * 201}")
+    assert response.status_code == 400
+
+
+def test_property_detail_conditional_get(client, init_database, count_queries):
+    """Test revalidation is answered with 304 from a single lookup."""
+    url = f"/api/properties/{init_database.id}"
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+    assert not etag.startswith("W/")
+    assert "no-cache" in response.headers["Cache-Control"]
+
+    with count_queries() as statements:
+        by_etag = client.get(url, headers={"If-None-Match": etag})
+    assert by_etag.status_code == 304
+    assert by_etag.data == b""
+    assert by_etag.headers["ETag"] == etag
+    assert len(statements) == 1
+
+    by_date = client.get(url, headers={"If-Modified-Since": last_modified})
+    assert by_date.status_code == 304
+
+    stale = client.get(url, headers={"If-None-Match": '"not-the-etag"'})
+    assert stale.status_code == 200
+    assert stale.json["property_id"] == str(init_database.id)
+
+
+def test_property_detail_is_cached_per_version(
+    client, init_database, count_queries
+):
+    """Test repeat reads hit the cache and updates change the ETag."""
+    url = f"/api/properties/{init_database.id}"
+    first = client.get(url)
+
+    with count_queries() as statements:
+        second = client.get(url)
+    assert second.json == first.json
+    assert len(statements) == 1
+
+    response = client.put(url, json={"price": 400000})
+    assert response.status_code == 200
+
+    updated = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert updated.status_code == 200
+    assert updated.json["price"] == 400000
+    assert updated.headers["ETag"] != first.headers["ETag"]
+
+
 def test_get_user_properties(client, test_seller, test_property):
     """Test getting properties for a specific user."""
     # Verify the property is associated with the test seller
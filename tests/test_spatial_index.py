@@ -0,0 +1,258 @@
+import random
+import statistics
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+import pytest
+from app.geo import haversine_km
+from app.models import Property
+from app.spatial_index import (
+    GridIndex,
+    cluster_cell_count,
+    cluster_degrees,
+    get_spatial_index,
+)
+
+
+@pytest.fixture
+def located(session, test_user):
+    """Properties at increasing distances north of central London."""
+    properties = [
+        Property(
+            price=100000 + i,
+            seller_id=test_user.id,
+            latitude=51.5 + offset,
+            longitude=-0.12,
+        )
+        for i, offset in enumerate([0.0, 0.03, 0.01, 0.5, 0.02])
+    ]
+    properties.append(Property(price=999999, seller_id=test_user.id))
+    session.add_all(properties)
+    session.commit()
+    return properties
+
+
+@pytest.mark.usefixtures("app")
+@pytest.mark.parametrize(
+    "point", [(51.5, -0.12), (55.0, -3.0), (0.0, 0.0), (89.9, 179.9)]
+)
+def test_grid_nearest_matches_brute_force(point):
+    rng = random.Random(1)
+    points = {
+        i: (rng.uniform(49.9, 58.7), rng.uniform(-8.0, 1.8))
+        for i in range(2000)
+    }
+    grid = GridIndex()
+    for i, (latitude, longitude) in points.items():
+        grid.add(i, latitude, longitude)
+
+    expected = sorted(
+        (haversine_km(*point, *position), i) for i, position in points.items()
+    )
+    assert grid.nearest(*point, 10) == expected[:10]
+    assert grid.nearest(*point, 10, exclude=expected[0][1]) == expected[1:11]
+    within = [pair for pair in expected if pair[0] <= 20][:5]
+    assert grid.nearest(*point, 5, max_km=20) == within
+
+
+@pytest.mark.usefixtures("app")
+def test_grid_moves_and_removes_properties():
+    grid = GridIndex()
+    grid.add("a", 51.5, -0.12)
+    grid.add("b", 51.6, -0.12)
+    grid.add("a", 52.5, -0.12)
+
+    assert len(grid) == 2
+    assert [i for _, i in grid.nearest(51.5, -0.12, 2)] == ["b", "a"]
+
+    grid.remove("b")
+    grid.remove("missing")
+    assert [i for _, i in grid.nearest(51.5, -0.12, 2)] == ["a"]
+    # Across the antimeridian
+    grid.add("c", 10.0, -179.99)
+    assert grid.nearest(10.0, 179.99, 1)[0][1] == "c"
+
+
+def test_nearby_endpoint(client, located):
+    origin = located[0]
+
+    response = client.get(f"/api/properties/{origin.id}/nearby?limit=3")
+
+    assert response.status_code == 200
+    assert [p["price"] for p in response.json] == [100002, 100004, 100001]
+    assert [p["distance_km"] for p in response.json] == [1.112, 2.224, 3.336]
+
+    response = client.get(f"/api/properties/{origin.id}/nearby?radius_km=2.5")
+    assert [p["price"] for p in response.json] == [100002, 100004]
+
+
+def test_nearby_endpoint_errors(client, located):
+    response = client.get(f"/api/properties/{uuid4()}/nearby")
+    assert response.status_code == 404
+
+    response = client.get(f"/api/properties/{located[-1].id}/nearby")
+    assert response.status_code == 400
+
+    response = client.get(f"/api/properties/{located[0].id}/nearby?limit=0")
+    assert response.status_code == 400
+
+
+def test_index_follows_writes(client, located, session, monkeypatch):
+    """Test deletes apply at once and other processes' writes on refresh."""
+    origin = located[0]
+    assert len(get_spatial_index().grid) == 5
+
+    assert client.delete(f"/api/properties/{located[2].id}").status_code == 200
+    assert get_spatial_index().grid.position(located[2].id) is None
+
+    # Geocoded by the job worker, in another process
+    located[-1].latitude, located[-1].longitude = 51.5001, -0.12
+    session.commit()
+    response = client.get(f"/api/properties/{origin.id}/nearby?limit=1")
+    assert response.json[0]["price"] == 100004
+
+    monkeypatch.setattr("app.spatial_index.REFRESH_INTERVAL", 0)
+    response = client.get(f"/api/properties/{origin.id}/nearby?limit=1")
+    assert response.json[0]["price"] == 999999
+
+
+def test_index_drops_rows_deleted_elsewhere(client, located, session):
+    origin = located[0]
+    get_spatial_index()
+
+    session.delete(located[2])
+    session.commit()
+    response = client.get(f"/api/properties/{origin.id}/nearby?limit=2")
+
+    assert [p["price"] for p in response.json] == [100004]
+    assert get_spatial_index().grid.position(located[2].id) is None
+
+
+def test_index_rereads_recent_changes(app, located, session):
+    """Test rows committed with a slightly older last_updated are read."""
+    index = get_spatial_index()
+    located[-1].latitude, located[-1].longitude = 51.5001, -0.12
+    session.commit()
+    # Committed late, stamped before the newest change the index has seen
+    located[-1].last_updated = datetime.now(timezone.utc) - timedelta(
+        seconds=30
+    )
+    session.commit()
+
+    index.refresh(force=True)
+
+    assert index.grid.position(located[-1].id) == (51.5001, -0.12)
+
+
+@pytest.mark.usefixtures("app")
+@pytest.mark.parametrize("degrees", [0.4, 0.05, 0.03, 0.7])
+def test_grid_clusters_match_brute_force(degrees):
+    rng = random.Random(2)
+    grid = GridIndex()
+    points = {}
+    for i in range(3000):
+        point = (
+            rng.uniform(49.9, 58.7),
+            rng.uniform(-8.0, 1.8),
+            rng.randrange(100000, 1000000),
+            rng.choice(["for_sale", "sold"]),
+        )
+        points[i] = point
+        grid.add(i, *point)
+    bounds = (50.3, -6.1, 57.2, 0.9)
+
+    # Twice, the second time with some cells' summaries dropped
+    for _ in range(2):
+        expected = {}
+        for i, (lat, lng, price, status) in points.items():
+            if status != "for_sale" or not (
+                bounds[0] <= lat <= bounds[2] and bounds[1] <= lng <= bounds[3]
+            ):
+                continue
+            key = (int((lat + 90) // degrees), int((lng + 180) // degrees))
+            expected.setdefault(key, []).append((lat, lng, price, i))
+
+        clusters = grid.clusters(bounds, degrees, status="for_sale")
+        assert len(clusters) == len(expected)
+        by_centroid = {
+            (round(c.latitude, 9), round(c.longitude, 9)): c for c in clusters
+        }
+        for members in expected.values():
+            latitude = sum(m[0] for m in members) / len(members)
+            longitude = sum(m[1] for m in members) / len(members)
+            prices = [m[2] for m in members]
+            cluster = by_centroid[(round(latitude, 9), round(longitude, 9))]
+            assert cluster.count == len(members)
+            assert cluster.min_price == min(prices)
+            assert cluster.max_price == max(prices)
+            assert cluster.median_price == statistics.median(prices)
+            if len(members) == 1:
+                assert cluster.property_id == members[0][3]
+
+        for i in range(0, 3000, 7):
+            lat, lng, price, _ = points[i]
+            points[i] = (lat, lng, price + 1, "for_sale")
+            grid.add(i, *points[i])
+
+
+@pytest.mark.usefixtures("app")
+def test_cluster_sizes_follow_the_screen():
+    # A 1920 x 1080 pixel map of the UK holds the same number of squares
+    # at every zoom
+    for zoom in range(4, 19):
+        degrees = cluster_degrees(zoom)
+        width = 1920 * 360 / 256 / 2**zoom
+        height = 1080 * 360 / 256 / 2**zoom
+        bounds = (54 - height / 2, -2 - width / 2, 54 + height / 2, -2 + width)
+        assert cluster_cell_count(bounds, degrees) <= 4096
+
+    assert cluster_degrees(0) == 0.05 * 2**10
+    assert cluster_degrees(10) == 0.05
+    assert cluster_degrees(12) == 360 / 2**12 / 4
+
+
+def test_clusters_endpoint(client, located, session):
+    located[3].status = "sold"
+    session.commit()
+
+    response = client.get("/api/properties/clusters?bbox=-1,51,1,53&zoom=5")
+
+    assert response.status_code == 200
+    assert response.json["total"] == 5
+    [cluster] = response.json["clusters"]
+    assert cluster["count"] == 5
+    assert cluster["latitude"] == pytest.approx(51.612)
+    assert (cluster["min_price"], cluster["max_price"]) == (100000, 100004)
+    assert cluster["median_price"] == 100002
+    assert cluster["property_id"] is None
+
+    response = client.get(
+        "/api/properties/clusters?bbox=-1,51,1,53&zoom=10&status=sold"
+    )
+    assert response.json["clusters"] == [
+        {
+            "count": 1,
+            "latitude": 52.0,
+            "longitude": -0.12,
+            "min_price": 100003,
+            "max_price": 100003,
+            "median_price": 100003,
+            "property_id": str(located[3].id),
+        }
+    ]
+
+
+@pytest.mark.parametrize(
+    "query,error",
+    [
+        ("zoom=5", "bbox is required"),
+        ("bbox=-1,51,1&zoom=5", "bbox must be"),
+        ("bbox=-1,51,1,53", "zoom must be"),
+        ("bbox=-1,51,1,53&zoom=21", "zoom must be"),
+        ("bbox=-1,51,1,53&zoom=5&status=gone", "status must be"),
+        ("bbox=-180,-90,180,90&zoom=8", "too large"),
+    ],
+)
+def test_clusters_endpoint_errors(client, query, error):
+    response = client.get(f"/api/properties/clusters?{query}")
+    assert response.status_code == 400
+    assert error in response.json["error"]
@@ -0,0 +1,320 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+import pytest
+from PIL import Image
+from app.blob_storage import RECENTLY_MODIFIED
+from app.image_validation import MAX_IMAGE_BYTES
+from app.jobs import run_pending
+from app.models import Job, PropertyMedia
+from app.tasks import HANDLERS
+
+
+def blob_url(image_data):
+    return f"https://example.com/{hashlib.sha256(image_data).hexdigest()}.png"
+
+
+class SlowBlobStorageService:
+    """Blob service stand-in that records how many uploads overlap."""
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.stored = {}
+        self.modified = {}
+        self.uploaded = []
+        self.renditions = []
+        self.deleted = []
+
+    def upload_image(self, image, image_info=None, blob_name=None, reuse=True):
+        image_url = f"https://example.com/{blob_name}"
+        if reuse and self.touch_image(blob_name):
+            return image_url
+
+        if image_info and image_info.mime_type == "image/webp":
+            # Renditions arrive as bytes, from the job worker
+            with self.lock:
+                self.stored[image_url] = image
+                self.modified[image_url] = datetime.now(timezone.utc)
+                self.renditions.append(image_url)
+            return image_url
+
+        image_data = image.read()
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+            self.stored[image_url] = image_data
+            self.modified[image_url] = datetime.now(timezone.utc)
+            self.uploaded.append(image_url)
+        return image_url
+
+    def touch_image(self, blob_name):
+        image_url = f"https://example.com/{blob_name}"
+        with self.lock:
+            if image_url not in self.stored:
+                return None
+            self.modified[image_url] = datetime.now(timezone.utc)
+        return image_url
+
+    def age(self, seconds):
+        """Make every stored blob look last written seconds earlier"""
+        with self.lock:
+            for image_url in self.modified:
+                self.modified[image_url] -= timedelta(seconds=seconds)
+
+    def download_image(self, image_url):
+        return self.stored[image_url]
+
+    def delete_images(self, image_urls, if_unmodified_since=None):
+        results = {}
+        with self.lock:
+            for image_url in image_urls:
+                modified = self.modified.get(image_url)
+                if (
+                    if_unmodified_since is not None
+                    and modified is not None
+                    and modified > if_unmodified_since
+                ):
+                    results[image_url] = RECENTLY_MODIFIED
+                    continue
+                if self.stored.pop(image_url, None) is not None:
+                    self.modified.pop(image_url)
+                    self.deleted.append(image_url)
+                results[image_url] = None
+        return results
+
+
+@pytest.fixture
+def blob_service(monkeypatch):
+    service = SlowBlobStorageService()
+    monkeypatch.setattr("app.properties.get_blob_service", lambda: service)
+    monkeypatch.setattr("app.tasks.get_blob_service", lambda: service)
+    return service
+
+
+def make_image(color):
+    """Return a tiny PNG of one color."""
+    buffer = BytesIO()
+    Image.new("RGB", (4, 4), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def multipart_payload(property_data, images):
+    payload = {"data": json.dumps(property_data)}
+    main, *additional = images
+    payload["main_image"] = (BytesIO(main[1]), main[0])
+    payload["additional_image"] = [
+        (BytesIO(content), filename) for filename, content in additional
+    ]
+    return payload
+
+
+def test_create_property_uploads_in_parallel(
+    client, session, test_property_data, blob_service
+):
+    """Test uploads overlap but media and warnings keep file order."""
+    images = [
+        (f"photo{idx}.png", make_image(color))
+        for idx, color in enumerate(["red", "green", "blue", "white"])
+    ]
+    files = images[:2] + [("notes.txt", b"not an image")] + images[2:]
+
+    response = client.post(
+        "/api/properties",
+        data=multipart_payload(test_property_data, files),
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 201
+    assert blob_service.max_active > 1
+
+    expected_urls = [blob_url(content) for _, content in images]
+    assert response.json["image_urls"] == expected_urls
+    assert response.json["warnings"][0] == "Skipped invalid file: notes.txt"
+
+    media = (
+        PropertyMedia.query.filter_by(property_id=response.json["property_id"])
+        .order_by(PropertyMedia.display_order)
+        .all()
+    )
+    assert [item.image_url for item in media] == expected_urls
+    assert media[0].image_type == "main"
+    # Renditions are left to the job worker
+    assert blob_service.renditions == []
+    assert Job.query.filter_by(kind="render_image").count() == len(images)
+
+    run_pending(HANDLERS)
+
+    # Every original has its three renditions stored alongside it
+    assert len(blob_service.renditions) == 3 * len(images)
+    session.expire_all()
+    for item in media:
+        assert {item.thumbnail_url, item.card_url, item.full_url} <= set(
+            blob_service.renditions
+        )
+
+
+def test_create_property_reports_invalid_images_in_order(
+    client, session, test_property_data, blob_service
+):
+    """Test validation failures are reported per file, in file order."""
+    files = [
+        ("broken.png", b"\x89PNG not really"),
+        ("photo.png", make_image("red")),
+        ("broken.jpg", b"\xff\xd8 not really"),
+    ]
+
+    response = client.post(
+        "/api/properties",
+        data=multipart_payload(test_property_data, files),
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 201
+    assert len(response.json["image_urls"]) == 1
+    skipped = [
+        warning
+        for warning in response.json["warnings"]
+        if warning.startswith("Skipped image")
+    ]
+    assert [warning.split(":")[0] for warning in skipped] == [
+        "Skipped image broken.png",
+        "Skipped image broken.jpg",
+    ]
+
+
+def test_create_property_discards_uploads_when_commit_fails(
+    client, session, test_property_data, blob_service
+):
+    """Test blobs uploaded for a listing that fails to save are deleted."""
+    test_property_data["seller_id"] = "no-such-seller"
+    files = [
+        (f"photo{idx}.png", make_image(color))
+        for idx, color in enumerate(["red", "green", "blue"])
+    ]
+
+    response = client.post(
+        "/api/properties",
+        data=multipart_payload(test_property_data, files),
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 500
+    deadline = time.monotonic() + 3
+    while len(blob_service.deleted) < 3 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert len(blob_service.uploaded) == 3
+    assert sorted(blob_service.deleted) == sorted(blob_service.uploaded)
+    # No jobs were saved for the listing
+    assert Job.query.count() == 0
+
+
+def test_failed_create_keeps_photos_it_reused(
+    client, session, test_property_data, blob_service
+):
+    """Test a discarded upload only deletes the blobs it stored itself."""
+    reused, new = make_image("red"), make_image("green")
+    response = client.post(
+        "/api/properties",
+        data=multipart_payload(
+            dict(test_property_data), [("photo0.png", reused)]
+        ),
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 201
+    run_pending(HANDLERS)
+    blob_service.age(2 * 3600)
+    # Its blobs are unreferenced, but the delete job hasn't run yet
+    response = client.delete(f"/api/properties/{response.json['property_id']}")
+    assert response.status_code == 200
+
+    test_property_data["seller_id"] = "no-such-seller"
+    response = client.post(
+        "/api/properties",
+        data=multipart_payload(
+            test_property_data, [("photo0.png", reused), ("photo1.png", new)]
+        ),
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 500
+    run_pending(HANDLERS)
+
+    assert blob_service.deleted == [blob_url(new)]
+    assert blob_url(reused) in blob_service.stored
+
+
+def test_create_property_rejects_oversized_images_while_spooling(
+    client, session, test_property_data, blob_service
+):
+    """Test an image over the size limit is skipped without uploading."""
+    oversized = make_image("red") + b"\0" * MAX_IMAGE_BYTES
+    files = [("photo.png", make_image("blue")), ("huge.png", oversized)]
+
+    response = client.post(
+        "/api/properties",
+        data=multipart_payload(test_property_data, files),
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 201
+    assert len(response.json["image_urls"]) == 1
+    assert (
+        "Skipped image huge.png: Image size exceeds 10MB limit"
+        in response.json["warnings"]
+    )
+    assert len(blob_service.uploaded) == 1
+
+
+def test_reuploaded_photos_are_stored_once_and_deleted_with_last_listing(
+    client, session, test_property_data, blob_service
+):
+    """Test a photo shared by two listings is stored until both are gone."""
+    shared, first_only, second_only = (
+        make_image(color) for color in ["red", "green", "blue"]
+    )
+    property_ids = []
+    for images in [(shared, first_only), (shared, second_only)]:
+        files = [(f"photo{idx}.png", data) for idx, data in enumerate(images)]
+        response = client.post(
+            "/api/properties",
+            data=multipart_payload(dict(test_property_data), files),
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 201
+        assert response.json["image_urls"][0] == blob_url(shared)
+        property_ids.append(response.json["property_id"])
+        run_pending(HANDLERS)
+
+    # The shared photo was neither uploaded nor rendered a second time
+    assert len(blob_service.uploaded) == 3
+    assert len(blob_service.renditions) == 9
+    shared_media = PropertyMedia.query.filter_by(
+        image_url=blob_url(shared)
+    ).all()
+    shared_card_urls = {item.card_url for item in shared_media}
+    assert len(shared_card_urls) == 1
+
+    # Past the grace period, so unreferenced blobs can go
+    blob_service.age(2 * 3600)
+    response = client.delete(f"/api/properties/{property_ids[0]}")
+    assert response.status_code == 200
+    assert blob_service.deleted == []
+    run_pending(HANDLERS)
+    assert blob_url(first_only) in blob_service.deleted
+    assert blob_url(shared) not in blob_service.deleted
+    assert len(blob_service.deleted) == 4
+
+    response = client.delete(f"/api/properties/{property_ids[1]}")
+    assert response.status_code == 200
+    run_pending(HANDLERS)
+    assert blob_url(shared) in blob_service.deleted
+    assert shared_card_urls <= set(blob_service.deleted)
+    assert blob_service.stored == {}
@@ -1,5 +1,7 @@
 import pytest  # noqa: F401
-from app.models import UserRole
+from app import cache
+from app.dashboard import dashboard_cache_stats
+from app.models import Property, SavedProperty, UserRole
 
 
 def test_create_user(client):
@@ -251,3 +253,203 @@ def test_user_dashboard_with_activity(
     assert negotiation["status"] == "active"
     assert len(negotiation["transaction_history"]) > 0
     assert negotiation["transaction_history"][0]["offer_amount"] == 300000
+
+
+def test_dashboard_query_count_is_constant(
+    client, test_user, test_seller, session, count_queries
+):
+    """Test the dashboard query count doesn't grow with saved properties"""
+    session.add(UserRole(user_id=test_user.id, role_type="buyer"))
+    session.commit()
+
+    def save_properties(count):
+        for i in range(count):
+            property = Property(
+                price=300000 + i,
+                seller_id=test_seller.id,
+                house_number=str(i),
+                street="Saved Street",
+                city="London",
+                postcode="SW1 1AA",
+            )
+            session.add(property)
+            session.flush()
+            session.add(
+                SavedProperty(property_id=property.id, user_id=test_user.id)
+            )
+        session.commit()
+
+    def dashboard_statements():
+        session.expire_all()
+        cache.clear()
+        with count_queries() as statements:
+            response = client.get(f"/api/users/{test_user.id}/dashboard")
+        assert response.status_code == 200
+        return len(statements), len(response.json["saved_properties"])
+
+    save_properties(1)
+    few_statements, few_saved = dashboard_statements()
+
+    save_properties(20)
+    many_statements, many_saved = dashboard_statements()
+
+    assert (few_saved, many_saved) == (1, 21)
+    assert many_statements == few_statements
+
+
+def test_dashboard_offers_query_count_is_constant(
+    client, test_user, test_seller, session, count_queries
+):
+    """Test buyer offers add no per-negotiation queries to the dashboard"""
+    from app.models import OfferTransaction, PropertyNegotiation
+
+    session.add(UserRole(user_id=test_user.id, role_type="buyer"))
+    session.commit()
+
+    def make_offers(count):
+        for i in range(count):
+            property = Property(price=400000 + i, seller_id=test_seller.id)
+            session.add(property)
+            session.flush()
+            negotiation = PropertyNegotiation(
+                property_id=property.id,
+                buyer_id=test_user.id,
+                last_offer_by=test_user.id,
+            )
+            session.add(negotiation)
+            session.flush()
+            session.add_all(
+                [
+                    OfferTransaction(
+                        negotiation_id=negotiation.id,
+                        offer_amount=amount,
+                        made_by=test_user.id,
+                    )
+                    for amount in (380000, 390000)
+                ]
+            )
+            # Saving an offered property reuses its serialised summary
+            session.add(
+                SavedProperty(property_id=property.id, user_id=test_user.id)
+            )
+        session.commit()
+
+    def dashboard():
+        session.expire_all()
+        cache.clear()
+        with count_queries() as statements:
+            response = client.get(f"/api/users/{test_user.id}/dashboard")
+        assert response.status_code == 200
+        return len(statements), response.json
+
+    make_offers(1)
+    few_statements, _ = dashboard()
+
+    make_offers(10)
+    many_statements, data = dashboard()
+
+    assert many_statements == few_statements
+    assert len(data["negotiations_as_buyer"]) == 11
+    assert len(data["offered_properties"]) == 11
+    for offered in data["offered_properties"]:
+        assert offered["latest_offer"]["amount"] == 390000
+        saved = next(
+            s
+            for s in data["saved_properties"]
+            if s["property_id"] == offered["property_id"]
+        )
+        assert saved["address"] == offered["address"]
+        assert saved["specs"] == offered["specs"]
+
+
+def test_dashboard_cache_hits_and_invalidation(
+    client, test_user, test_property, session, count_queries
+):
+    """Test the dashboard is served from cache until a write changes it"""
+    session.add(UserRole(user_id=test_user.id, role_type="buyer"))
+    session.commit()
+    url = f"/api/users/{test_user.id}/dashboard"
+
+    before = dashboard_cache_stats.as_dict()
+    first = client.get(url)
+    with count_queries() as statements:
+        second = client.get(url)
+    after = dashboard_cache_stats.as_dict()
+
+    assert first.json == second.json
+    assert statements == []
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+    # Saving a property invalidates the buyer's dashboard
+    client.post(
+        f"/api/users/{test_user.id}/saved-properties",
+        json={"property_id": str(test_property.id), "notes": "first"},
+    )
+    assert len(client.get(url).json["saved_properties"]) == 1
+
+    # Notes updates are visible straight away
+    client.patch(
+        f"/api/users/{test_user.id}/saved-properties/"
+        f"{test_property.id}/notes",
+        json={"notes": "second"},
+    )
+    assert client.get(url).json["saved_properties"][0]["notes"] == "second"
+
+    # Seller-side changes to the property reach buyers who saved it
+    client.put(f"/api/properties/{test_property.id}", json={"price": 360000})
+    assert client.get(url).json["saved_properties"][0]["price"] == 360000
+
+    client.delete(
+        f"/api/users/{test_user.id}/saved-properties/{test_property.id}"
+    )
+    assert client.get(url).json["saved_properties"] == []
+
+    stats = client.get("/cache/stats")
+    assert stats.status_code == 200
+    assert stats.json["dashboard"] == dashboard_cache_stats.as_dict()
+
+
+def test_dashboard_cache_invalidated_by_offers(
+    client, test_user, test_property, test_seller, session
+):
+    """Test offers and their status changes refresh both parties' views"""
+    for user, role in [(test_user, "buyer"), (test_seller, "seller")]:
+        session.add(UserRole(user_id=user.id, role_type=role))
+    session.commit()
+    buyer_url = f"/api/users/{test_user.id}/dashboard"
+    seller_url = f"/api/users/{test_seller.id}/dashboard"
+
+    # Prime both caches
+    assert client.get(buyer_url).json["negotiations_as_buyer"] == []
+    assert client.get(seller_url).json["negotiations_as_seller"] == []
+
+    offer = client.post(
+        f"/api/users/{test_user.id}/offers",
+        json={"property_id": str(test_property.id), "offer_amount": 300000},
+    )
+    negotiation_id = offer.json["negotiation"]["negotiation_id"]
+
+    assert len(client.get(buyer_url).json["negotiations_as_buyer"]) == 1
+    assert len(client.get(seller_url).json["negotiations_as_seller"]) == 1
+
+    client.put(
+        f"/api/users/{test_seller.id}/offers/{negotiation_id}",
+        json={"action": "accept"},
+    )
+
+    buyer_view = client.get(buyer_url).json
+    assert buyer_view["negotiations_as_buyer"][0]["status"] == "accepted"
+    assert buyer_view["offered_properties"][0]["status"] == "under_offer"
+    seller_view = client.get(seller_url).json
+    assert seller_view["listed_properties"][0]["status"] == "under_offer"
+
+    # Renaming either party refreshes the other's view of their name
+    client.put(f"/api/users/{test_user.id}", json={"first_name": "Renamed"})
+    seller_view = client.get(seller_url).json
+    buyer_name = seller_view["negotiations_as_seller"][0]["buyer_name"]
+    assert buyer_name.startswith("Renamed ")
+    client.put(f"/api/users/{test_seller.id}", json={"last_name": "Moved"})
+    buyer_view = client.get(buyer_url).json
+    seller_name = buyer_view["negotiations_as_buyer"][0]["seller_name"]
+    assert seller_name.endswith(" Moved")